@@ -0,0 +1,163 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from urllib.request import urlopen
+from mock_server import add_server_arguments, start_server, state_from_arguments
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows
+    resource = None
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_client(client):
+    # The syncai package may not be installed, so put the repository root on the path.
+    sys.path.insert(0, ROOT)
+    from syncai.cli import load_client
+    return load_client(client)
+
+
+def make_jobs(client, n, output_dir):
+    jobs = []
+    for i in range(n):
+        job = {"language": "en-US", "text": f"Benchmark sentence number {i}.", "actor": "caprica" if client == "video" else "female"}
+        if client == "video":
+            job.update({"camera": 0, "output_file": os.path.join(output_dir, f"job_{i}.mp4")})
+        else:
+            job.update({"target_rig": "metahumans", "output_type": "csv", "output_file": os.path.join(output_dir, f"job_{i}.csv")})
+        jobs.append(job)
+    return jobs
+
+
+def serve(args, conn):
+    # runs the mock server in its own process so it does not count towards the client's memory use
+    server = start_server(state_from_arguments(args))
+    conn.send(server.server_address[1])
+    conn.recv()
+    server.shutdown()
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, int(round(q / 100 * len(values))) - 1))]
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+def run_single(sync_client, jobs):
+    # generate and download each job in turn, as single_request.py does
+    for job in jobs:
+        job = dict(job)
+        output_file = job.pop("output_file")
+        if "target_rig" not in job:
+            job["target_rig"] = "metahumans"
+        resp = sync_client.generate(**job)
+        if "jobId" in resp:
+            sync_client.download_content(resp["jobId"], output_file)
+
+
+def run_batch(sync_client, jobs, output_dir, concurrency, job_deadline=None):
+    input_file = os.path.join(output_dir, "inputs.jsonl")
+    with open(input_file, "w") as fp:
+        for job in jobs:
+            fp.write(json.dumps(job) + "\n")
+    sync_client.generate_and_download_from_file(input_file, concurrency=concurrency, job_deadline=job_deadline)
+
+
+def main(args):
+    SyncAiClient = load_client(args.client)
+
+    parent_conn, child_conn = multiprocessing.Pipe()
+    server = multiprocessing.Process(target=serve, args=(args, child_conn), daemon=True)
+    server.start()
+    port = parent_conn.recv()
+    url = f"http://127.0.0.1:{port}/lipsync/"
+
+    try:
+        with tempfile.TemporaryDirectory() as output_dir:
+            jobs = make_jobs(args.client, args.jobs, output_dir)
+            notifications = None
+            if args.notifications:
+                # load_client has put the repository root on the path
+                from syncai.notifications import CallbackTransport
+                notifications = CallbackTransport()
+            sync_client = SyncAiClient(token="benchmark", url=url, pool_size=max(10, args.concurrency), min_poll_interval=args.min_poll_interval, notifications=notifications, hedge_percentile=args.hedge_percentile)
+
+            started = time.monotonic()
+            if args.mode == "single":
+                run_single(sync_client, jobs)
+            else:
+                run_batch(sync_client, jobs, output_dir, args.concurrency, args.job_deadline)
+            elapsed = time.monotonic() - started
+            client_metrics = sync_client.metrics.summary()
+            sync_client.close()
+
+        with urlopen(f"http://127.0.0.1:{port}/stats") as resp:
+            stats = json.load(resp)
+    finally:
+        parent_conn.send("stop")
+        server.join(timeout=5)
+
+    latencies = stats.pop("latencies")
+    # callbacks are sent by the server, not the client
+    requests_sent = sum(count for name, count in stats["requests"].items() if name not in ("throttled", "callback"))
+    report = {
+        "client": args.client,
+        "mode": args.mode,
+        "notifications": args.notifications,
+        "jobs": args.jobs,
+        "concurrency": args.concurrency if args.mode == "batch" else 1,
+        "seconds": elapsed,
+        "jobs_per_second": args.jobs / elapsed,
+        "latency_p50": percentile(latencies, 50),
+        "latency_p95": percentile(latencies, 95),
+        "latency_p99": percentile(latencies, 99),
+        "http_requests_per_job": requests_sent / args.jobs,
+        "peak_rss_mb": peak_rss_mb(),
+        "hedged_requests": client_metrics.get("hedged_requests", 0),
+        "hedge_wins": client_metrics.get("hedge_wins", 0),
+        "server": stats,
+    }
+
+    if args.output:
+        with open(args.output, "w") as fp:
+            json.dump(report, fp, indent=4)
+
+    for key, value in report.items():
+        if key != "server":
+            print(f"{key:>22}: {value:.3f}" if isinstance(value, float) else f"{key:>22}: {value}")
+    print(f"{'server requests':>22}: {stats['requests']}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure client throughput, latency and request counts against the local mock server")
+    parser.add_argument('--client', type=str, default="video", choices=["video", "animation"], help='Client to benchmark')
+    parser.add_argument('--mode', type=str, default="batch", choices=["single", "batch"], help='single generates and downloads jobs one at a time, batch uses generate_and_download_from_file')
+    parser.add_argument('--jobs', type=int, default=50, help='Number of jobs to run')
+    parser.add_argument('--concurrency', type=int, default=8, help='Batch concurrency')
+    parser.add_argument('--min_poll_interval', type=float, default=0.1, help='Minimum status poll interval of the client')
+    parser.add_argument('--notifications', action='store_true', help='Receive completion notifications from the server instead of polling for them')
+    parser.add_argument('--hedge_percentile', type=float, default=None, help='Hedge status, download-URL and file requests slower than this latency percentile')
+    parser.add_argument('--job_deadline', type=float, default=None, help='Time budget of each job in batch mode, in seconds')
+    parser.add_argument('--output', type=str, default=None, help='Write the report to this json file')
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    main(args)
@@ -0,0 +1,69 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# modules the CLI must not import before a command needs them
+HEAVY_MODULES = ("requests", "urllib3", "tqdm", "numpy", "aiohttp", "multiprocessing", "email.utils")
+# commands that only need the standard library
+COMMANDS = {
+    "help": ["--help"],
+    "video validate": ["video", "validate", "--input_file", os.path.join(ROOT, "VideoGeneration", "inputs.json")],
+    "animation validate": ["animation", "validate", "--input_file", os.path.join(ROOT, "AnimationCurveGeneration", "inputs.jsonl")],
+}
+# runs a command in-process and prints the heavy modules it imported
+PROBE = """
+import contextlib, io, json, sys
+from syncai.cli import main
+with contextlib.redirect_stdout(io.StringIO()):
+    try:
+        main({argv!r})
+    except SystemExit:
+        pass
+print(json.dumps([name for name in {heavy!r} if name in sys.modules]))
+"""
+
+
+def run(argv):
+    # runs python with argv from the repository root, so syncai is importable without being installed
+    return subprocess.run([sys.executable] + argv, cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True).stdout
+
+
+def startup_ms(argv, repeat):
+    # median wall time of `python argv` over repeat runs, in milliseconds
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run(argv)
+        times.append((time.perf_counter() - started) * 1000)
+    return statistics.median(times)
+
+
+def main(args):
+    baseline = startup_ms(["-c", "pass"], args.repeat)
+    print(f"{'interpreter':>22}: {baseline:.1f} ms")
+
+    failed = False
+    for name, argv in COMMANDS.items():
+        overhead = startup_ms(["-m", "syncai"] + argv, args.repeat) - baseline
+        heavy = json.loads(run(["-c", PROBE.format(argv=argv, heavy=HEAVY_MODULES)]))
+        over = overhead > args.budget_ms
+        failed = failed or over or bool(heavy)
+        print(f"{name:>22}: {overhead:.1f} ms over the interpreter" + (" OVER BUDGET" if over else "") + (f", imported {heavy}" if heavy else ""))
+
+    print(f"{'budget':>22}: {args.budget_ms:.1f} ms, {'FAILED' if failed else 'ok'}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the start-up time of the syncai command against a budget")
+    parser.add_argument('--budget_ms', type=float, default=100.0, help='Maximum start-up time of each command above that of a bare interpreter, in milliseconds')
+    parser.add_argument('--repeat', type=int, default=15, help='Number of runs of each command, the median is compared to the budget')
+    args = parser.parse_args()
+
+    sys.exit(main(args))
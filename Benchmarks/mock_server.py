@@ -0,0 +1,321 @@
+import argparse
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+import urllib.request
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+# byte i of every generated file is i % 251, so a file assembled from the wrong ranges does not pass for a good one
+CONTENT_PERIOD = 251
+CONTENT_PATTERN = bytes(range(CONTENT_PERIOD)) * (64 * 1024 // CONTENT_PERIOD + 2)
+
+
+def file_content(start, length):
+    # The bytes start to start + length of a generated file, length at most 64 KiB.
+    offset = start % CONTENT_PERIOD
+    return CONTENT_PATTERN[offset:offset + length]
+
+
+class MockSyncAiState():
+    """
+    Jobs and counters of a local stand-in for the Sync-AI API.
+
+    - render_time is drawn per job from `render_distribution` ("constant", "uniform" or "lognormal")
+    around render_mean seconds with spread render_spread.
+    - failure_rate is the fraction of jobs that end with a 'failed' status.
+    - generate_rate_limit caps generate requests per second; requests above it get a 429 with a Retry-After header.
+    - bandwidth caps download speed in bytes per second per connection, file_size is the size of every output.
+    Files carry an ETag and honour Range and If-Range requests.
+    - jobs submitted with a callback_url get a POST of {"jobId", "status"} to it when they finish or fail.
+    - stall_rate is the fraction of status, download-URL and file requests that stall for stall_seconds before answering,
+    generate_stall_rate the fraction of generate requests that do.
+    """
+
+    def __init__(self, render_distribution="lognormal", render_mean=2.0, render_spread=0.5, failure_rate=0.0,
+                 generate_rate_limit=None, bandwidth=None, file_size=1024 * 1024, seed=None, stall_rate=0.0, stall_seconds=10.0, generate_stall_rate=0.0):
+        self.render_distribution = render_distribution
+        self.render_mean = render_mean
+        self.render_spread = render_spread
+        self.failure_rate = failure_rate
+        self.generate_rate_limit = generate_rate_limit
+        self.bandwidth = bandwidth
+        self.file_size = file_size
+        self.stall_rate = stall_rate
+        self.stall_seconds = stall_seconds
+        self.generate_stall_rate = generate_stall_rate
+        self.random = random.Random(seed)
+
+        self.lock = threading.Lock()
+        self.jobs = {}          # jobId -> {"submitted", "ready", "failed", "downloaded"}
+        self.counts = {"generate": 0, "status": 0, "download": 0, "file": 0, "throttled": 0, "callback": 0, "stalled": 0}
+        self.bytes_sent = 0
+        self.tokens = generate_rate_limit or 0
+        self.refilled = time.monotonic()
+
+    def render_time(self):
+        if self.render_distribution == "constant":
+            return self.render_mean
+        if self.render_distribution == "uniform":
+            return max(0.0, self.random.uniform(self.render_mean - self.render_spread, self.render_mean + self.render_spread))
+        # lognormal with the given mean, render_spread is the sigma of the underlying normal
+        mu = max(self.render_mean, 1e-6)
+        return self.random.lognormvariate(0, self.render_spread) * mu / math.exp(self.render_spread ** 2 / 2)
+
+    def take_generate_token(self):
+        # token bucket of generate_rate_limit requests per second, returns seconds to wait if empty
+        if not self.generate_rate_limit:
+            return 0
+        now = time.monotonic()
+        self.tokens = min(self.generate_rate_limit, self.tokens + (now - self.refilled) * self.generate_rate_limit)
+        self.refilled = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.generate_rate_limit
+
+    def submit(self, callback_url=None):
+        with self.lock:
+            self.counts["generate"] += 1
+            wait = self.take_generate_token()
+            if wait:
+                self.counts["throttled"] += 1
+                return None, wait
+            job_id = uuid.uuid4().hex
+            now = time.monotonic()
+            self.jobs[job_id] = {
+                "submitted": now,
+                "ready": now + self.render_time(),
+                "failed": self.random.random() < self.failure_rate,
+                "downloaded": None,
+            }
+            if callback_url:
+                timer = threading.Timer(self.jobs[job_id]["ready"] - now, self.callback, (job_id, callback_url))
+                timer.daemon = True
+                timer.start()
+            return job_id, 0
+
+    def callback(self, job_id, callback_url):
+        with self.lock:
+            self.counts["callback"] += 1
+            status = "failed" if self.jobs[job_id]["failed"] else "finished"
+        body = json.dumps({"jobId": job_id, "status": status}).encode("utf-8")
+        request = urllib.request.Request(callback_url, data=body, headers={"Content-Type": "application/json"})
+        try:
+            urllib.request.urlopen(request, timeout=5).close()
+        except OSError:
+            # a missed notification, the client falls back to polling
+            pass
+
+    def stall(self, rate=None):
+        # holds the request for stall_seconds, for `rate` (stall_rate by default) of the requests
+        rate = self.stall_rate if rate is None else rate
+        with self.lock:
+            stalled = rate and self.random.random() < rate
+            if stalled:
+                self.counts["stalled"] += 1
+        if stalled:
+            time.sleep(self.stall_seconds)
+
+    def status(self, job_id):
+        with self.lock:
+            self.counts["status"] += 1
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            if time.monotonic() < job["ready"]:
+                return "processing"
+            return "failed" if job["failed"] else "finished"
+
+    def stats(self):
+        with self.lock:
+            latencies = [job["downloaded"] - job["submitted"] for job in self.jobs.values() if job["downloaded"] is not None]
+            return {
+                "requests": dict(self.counts),
+                "jobs": len(self.jobs),
+                "jobs_downloaded": len(latencies),
+                "bytes_sent": self.bytes_sent,
+                "latencies": latencies,
+            }
+
+
+class MockSyncAiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # headers and body are written separately, without this delayed ACKs add ~40ms to every keep-alive request
+    disable_nagle_algorithm = True
+    state = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, code, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def read_body(self):
+        # Reads and discards the request body, returns its first megabyte.
+        head = b""
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            while True:
+                size = int(self.rfile.readline().split(b";")[0].strip(), 16)
+                data = self.rfile.read(size + 2)
+                if len(head) < 1024 * 1024:
+                    head += data[:size]
+                if size == 0:
+                    return head
+        length = int(self.headers.get("Content-Length") or 0)
+        while length > 0:
+            data = self.rfile.read(min(length, 1024 * 1024))
+            if len(head) < 1024 * 1024:
+                head += data
+            length -= len(data)
+        return head
+
+    def do_POST(self):
+        body = self.read_body()
+        url = urlparse(self.path)
+        if not url.path.endswith("/generate"):
+            return self.send_json(404, {"error": "not found"})
+        self.state.stall(self.state.generate_stall_rate)
+
+        # the job is the json body, or a part of a multipart body
+        callback_url = re.search(rb'"callback_url":\s*"([^"]+)"', body)
+        job_id, wait = self.state.submit(callback_url.group(1).decode("utf-8") if callback_url else None)
+        if job_id is None:
+            return self.send_json(429, {"error": "too many requests"}, {"Retry-After": str(max(1, round(wait)))})
+        self.send_json(200, {"jobId": job_id})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if url.path.endswith(("/status", "/download")) or url.path.startswith("/files/"):
+            self.state.stall()
+
+        if url.path.endswith("/status"):
+            status = self.state.status(query.get("jobId", [""])[0])
+            if status is None:
+                return self.send_json(404, {"status": "failed", "error": "unknown jobId"})
+            return self.send_json(200, {"status": status})
+
+        if url.path.endswith("/download"):
+            with self.state.lock:
+                self.state.counts["download"] += 1
+            file_name = query.get("fileName", [""])[0]
+            return self.send_json(200, {"url": f"http://{self.headers['Host']}/files/{file_name}"})
+
+        if url.path.startswith("/files/"):
+            return self.send_file(os.path.splitext(os.path.basename(url.path))[0])
+
+        if url.path == "/stats":
+            return self.send_json(200, self.state.stats())
+
+        self.send_json(404, {"error": "not found"})
+
+    def send_file(self, job_id):
+        state = self.state
+        size = state.file_size
+        start, end = 0, size - 1
+        etag = f'"{job_id}-{size}"'
+        range_header = self.headers.get("Range")
+        if_range = self.headers.get("If-Range")
+        if if_range is not None and if_range != etag:
+            # the client holds a different version of the file, send it whole
+            range_header = None
+        if range_header and range_header.startswith("bytes="):
+            first, _, last = range_header[len("bytes="):].partition("-")
+            start = int(first) if first else 0
+            end = min(int(last), size - 1) if last else size - 1
+            if start >= size:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        else:
+            self.send_response(200)
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", etag)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+
+        remaining = end - start + 1
+        started = time.monotonic()
+        sent = 0
+        while remaining > 0:
+            data = file_content(start + sent, min(remaining, 64 * 1024))
+            self.wfile.write(data)
+            remaining -= len(data)
+            sent += len(data)
+            if state.bandwidth:
+                ahead = sent / state.bandwidth - (time.monotonic() - started)
+                if ahead > 0:
+                    time.sleep(ahead)
+
+        with state.lock:
+            state.counts["file"] += 1
+            state.bytes_sent += sent
+            job = state.jobs.get(job_id)
+            if job is not None and end == size - 1:
+                job["downloaded"] = time.monotonic()
+
+
+def start_server(state, host="127.0.0.1", port=0):
+    # Starts the mock server in a background thread and returns it. The API url is
+    # f"http://{host}:{server.server_address[1]}/lipsync/"
+    handler = type("Handler", (MockSyncAiHandler,), {"state": state})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def add_server_arguments(parser):
+    parser.add_argument('--render_distribution', type=str, default="lognormal", choices=["constant", "uniform", "lognormal"], help='Distribution of mock render times')
+    parser.add_argument('--render_mean', type=float, default=2.0, help='Mean mock render time in seconds')
+    parser.add_argument('--render_spread', type=float, default=0.5, help='Half-width for uniform, sigma for lognormal render times')
+    parser.add_argument('--failure_rate', type=float, default=0.0, help='Fraction of jobs that fail')
+    parser.add_argument('--generate_rate_limit', type=float, default=None, help='Generate requests per second above which the server answers 429')
+    parser.add_argument('--bandwidth', type=float, default=None, help='Download bandwidth per connection in bytes per second')
+    parser.add_argument('--file_size', type=int, default=1024 * 1024, help='Size in bytes of every generated file')
+    parser.add_argument('--stall_rate', type=float, default=0.0, help='Fraction of status, download-URL and file requests that stall before answering')
+    parser.add_argument('--stall_seconds', type=float, default=10.0, help='Seconds a stalled request is held for')
+    parser.add_argument('--generate_stall_rate', type=float, default=0.0, help='Fraction of generate requests that stall before answering')
+    parser.add_argument('--seed', type=int, default=None, help='Random seed for render times and failures')
+
+
+def state_from_arguments(args):
+    return MockSyncAiState(render_distribution=args.render_distribution, render_mean=args.render_mean, render_spread=args.render_spread,
+                           failure_rate=args.failure_rate, generate_rate_limit=args.generate_rate_limit, bandwidth=args.bandwidth,
+                           file_size=args.file_size, seed=args.seed, stall_rate=args.stall_rate, stall_seconds=args.stall_seconds,
+                           generate_stall_rate=args.generate_stall_rate)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the Sync-AI generate, status and download endpoints")
+    parser.add_argument('--host', type=str, default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=8000)
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    server = start_server(state_from_arguments(args), args.host, args.port)
+    print(f"Mock Sync-AI API listening on http://{args.host}:{server.server_address[1]}/lipsync/")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
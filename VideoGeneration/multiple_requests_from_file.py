@@ -1,14 +1,8 @@
-import argparse
-from video_client import SyncAiVideoClient
-
-def main(args):
-    sync_client = SyncAiVideoClient(token=args.token)
-    sync_client.generate_and_download_from_file(args.input_file)
+# Kept so existing commands keep working, same as `syncai video batch`.
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from syncai.cli import main
 
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser()
-    parser.add_argument('--token', type=str, required=True, help='User token tied to the account - it is used to validate the user identity.')
-    parser.add_argument('--input_file', type=str, required=True, help='Path to json file containing inputs and job specifications')
-    args = parser.parse_args()
-
-    main(args)
+    sys.exit(main(["video", "batch"] + sys.argv[1:]))
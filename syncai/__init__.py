@@ -0,0 +1,21 @@
+# Client of the Emotech Sync-AI API, see README.md.
+# The clients are imported on first use, so `import syncai` and the `syncai` command start without loading requests.
+import importlib
+
+__version__ = "0.1.0"
+
+LAZY_ATTRIBUTES = {
+    "SyncAiClient": "client",
+    "SyncAiVideoClient": "video",
+    "SyncAiAnimationClient": "animation",
+    "AsyncSyncAiVideoClient": "async_client",
+    "AsyncSyncAiAnimationClient": "async_client",
+    "ClientDaemon": "client_daemon",
+    "DaemonClient": "daemon_client",
+}
+
+
+def __getattr__(name):
+    if name not in LAZY_ATTRIBUTES:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    return getattr(importlib.import_module("." + LAZY_ATTRIBUTES[name], __name__), name)
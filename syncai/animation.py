@@ -0,0 +1,170 @@
+import os
+import tempfile
+from .batch_journal import BatchJournal
+from .client import SyncAiClient, get_tts_params
+from .curve_segments import merge_curves, split_text
+from .result_cache import materialize
+
+
+def file_extension_from_output_type(output_type):
+    if output_type == "video":
+        return ".mp4"
+    elif output_type == "csv":
+        return ".csv"
+    elif output_type == "fbx":
+        return ".fbx"
+    return None
+
+def build_job(text, language, target_rig, tts_voice=None, tts_speed=None, audio_url=None, audio_file=None, emotion="", emotion_level=1, output_type="csv", actor=None):
+    # Builds the job dictionary sent to the generate endpoint for an animation curve request.
+    if output_type not in ["csv", "fbx"]:
+        raise Exception("Invalid output type. Must be either 'csv' or 'fbx'")
+
+    if audio_url and audio_file:
+        raise Exception("Only one of audio_file or audio_url should be supplied.")
+
+    if not actor and not tts_voice and not audio_url and not audio_file:
+        raise Exception("At least one of actor, tts_voice, audio_url, or audio_file must be supplied.")
+
+    is_ssml = False
+    if "<speak>" in text:
+        is_ssml = True
+
+    # set emotion and level
+    emotion_obj = None
+    if emotion:
+        emotion_obj = {
+            "level": emotion_level,
+            "expression": emotion
+        }
+
+    job = {
+        "target_rig": target_rig,
+        "text": text,
+        "language": language,
+        "tts_params": get_tts_params(tts_voice, tts_speed),
+        "actor": actor,
+        "output": {"type": output_type},
+        "is_ssml": is_ssml,
+        "wait_time": None,
+    }
+
+    if emotion_obj:
+        job["emotion"] = emotion_obj
+
+    if audio_url and audio_file:
+        raise Exception("Both audio_url and audio_path are given. Only one can be used.")
+    elif audio_url:
+        job["audio_url"] = audio_url
+
+    return job
+
+
+class SyncAiAnimationClient(SyncAiClient):
+    """
+    Client for animation curve generation, see SyncAiClient for the shared batch, polling and download machinery.
+
+    Batch input samples for generate_and_download_from_file look like
+        {"language": "en-US", "text": "I am powered by Emotech's revolutionary A.I. technology", "actor": "female", "target_rig": "metahumans", "output_type": "csv", "output_file": "animation_curve.csv"}
+        {"language": "ar", "text": "...", "actor": "male", "target_rig": "arkit", "output_type": "fbx", "output_file": "my_animation.fbx"}
+    """
+
+    default_url = "https://lipsync-ai.api.emotechlab.com/lipsync/"
+    default_output_type = "csv"
+    valid_fields = ['language', 'actor', 'text', 'camera', 'background_rgb', 'sentences_file', 'tts_voice', 'tts_speed', 'target_rig', 'audio_url', 'audio_file', 'emotion', 'emotion_level', 'token', 'output_type', 'video_resolution', 'output_dir']
+    build_job = staticmethod(build_job)
+
+    def __init__(self, token, **kwargs):
+        super().__init__(token, **kwargs)
+        self.archive = None  # CurveArchiveWriter of the running batch, if it writes to an archive
+
+    def download_content(self, job_id, save_file, curves_file=None, fps=60, deadline=None):
+        # wait for the poller to see a 'finished' status then download the content, see SyncAiClient.download_content
+        # if curves_file is given, a csv download is also converted to the binary format of animation_curves.py
+        status = super().download_content(job_id, save_file, deadline=deadline)
+        if status is None and curves_file:
+            # numpy is only needed for the conversion
+            from .animation_curves import convert_csv
+            convert_csv(save_file, curves_file, fps=fps)
+        return status
+
+    def download_output(self, job_id, output_file, key):
+        # download the output of a finished batch job, into the curve archive if the batch writes one
+        if self.archive is None or not output_file.endswith(".csv"):
+            return self.download_finished(job_id, output_file)
+
+        fd, csv_file = tempfile.mkstemp(suffix=".csv")
+        os.close(fd)
+        try:
+            self.download_finished(job_id, csv_file)
+            self.archive.add_csv(csv_file, job_id=job_id, job_hash=key, name=output_file)
+        finally:
+            os.remove(csv_file)
+
+    def copy_output(self, output_file, duplicate_file):
+        # give a duplicate batch job the output of the job it duplicates
+        clip_id = self.archive.find(output_file) if self.archive is not None else None
+        if clip_id is None:
+            materialize(output_file, duplicate_file, link=False)
+        else:
+            self.archive.link(clip_id, name=duplicate_file)
+
+    def generate(self, text, language, target_rig, tts_voice=None, tts_speed=None, audio_url=None, audio_file=None, emotion="", emotion_level=1, output_type="csv", actor=None, display=False, deadline=None):
+        # Sends a request to generate animation curves.
+        # deadline (a Deadline or seconds) is the time budget of the job, used by download_content as well
+        job = build_job(text, language, target_rig, tts_voice=tts_voice, tts_speed=tts_speed, audio_url=audio_url, audio_file=audio_file, emotion=emotion, emotion_level=emotion_level, output_type=output_type, actor=actor)
+        return self.submit(job, audio_file=audio_file, display=display, deadline=deadline)
+
+    def generate_and_download_segmented(self, output_file, text, language, target_rig, max_segment_chars=300, concurrency=8, fps=60, blend_frames=3, job_deadline=None, **kwargs):
+        """
+        Generates a csv animation curve for a long text as several jobs rendered in parallel.
+
+        The text is split at sentence (or top-level SSML <break>) boundaries into segments of about max_segment_chars
+        characters, up to `concurrency` segments are generated at once, and the downloaded curves are merged
+        into output_file with continuous timing and blended seams, see merge_curves. The other keyword arguments
+        are passed to generate for every segment. Audio input cannot be segmented since it must match the text.
+        job_deadline is the time budget in seconds of each segment job, see run_batch.
+        Returns the results of the segment jobs, keyed by segment index.
+        """
+        if kwargs.get("output_type", "csv") != "csv":
+            raise Exception("Segmented generation is only supported for csv output")
+        if kwargs.get("audio_url") or kwargs.get("audio_file"):
+            raise Exception("Segmented generation cannot be used with audio_url or audio_file")
+
+        segments = split_text(text, max_segment_chars)
+        with tempfile.TemporaryDirectory() as segment_dir:
+            segment_files = [os.path.join(segment_dir, f"segment_{i}.csv") for i in range(len(segments))]
+            jobs = [
+                dict(kwargs, text=segment, language=language, target_rig=target_rig, output_type="csv", output_file=segment_file)
+                for segment, segment_file in zip(segments, segment_files)
+            ]
+            journal = BatchJournal()
+            self.run_batch(jobs, concurrency=min(concurrency, len(jobs)), journal=journal, job_deadline=job_deadline)
+            results = dict(sorted(journal.iter_results()))
+
+            missing = [i for i, segment_file in enumerate(segment_files) if not os.path.exists(segment_file)]
+            if missing:
+                print("Segments {} failed, {} was not written".format(missing, output_file))
+                return results
+
+            merge_curves(segment_files, output_file, fps=fps, blend_frames=blend_frames)
+        return results
+
+    def generate_and_download_from_file(self, input_file, concurrency=1, resume=False, metrics_file=None, schedule="file", shard_index=0, shard_count=1, job_deadline=None, archive_file=None):
+        """
+        Runs the batch of input_file, see SyncAiClient.generate_and_download_from_file.
+
+        If archive_file is given, csv outputs are converted and appended to the curve archive at archive_file
+        instead of being written to their output files, and can be read back by output_file, jobId or job hash
+        with CurveArchive. See curve_archive.py.
+        """
+        if archive_file:
+            # numpy is only needed for the archive
+            from .curve_archive import CurveArchiveWriter
+            self.archive = CurveArchiveWriter(archive_file)
+        try:
+            return super().generate_and_download_from_file(input_file, concurrency=concurrency, resume=resume, metrics_file=metrics_file, schedule=schedule, shard_index=shard_index, shard_count=shard_count, job_deadline=job_deadline)
+        finally:
+            if self.archive is not None:
+                self.archive.close()
+                self.archive = None
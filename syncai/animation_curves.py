@@ -0,0 +1,181 @@
+import csv
+import json
+import mmap
+import struct
+import numpy as np
+from .curve_segments import TimeColumn
+
+
+MAGIC = b"SYNCCRV1"
+# magic, header length, frame count, channel count, fps, offset of times, offset of values
+HEADER = struct.Struct("<8sIQIdQQ")
+ALIGNMENT = 64
+
+
+class AnimationCurves():
+    """
+    Animation curves held as arrays: `times` (frames,) float64 seconds and `values` (frames, channels) float32,
+    with the channel names stored once in `channels`.
+
+    - from_csv() loads a curve csv downloaded by SyncAiAnimationClient. Every numeric column other than the
+    time column becomes a channel.
+    - resample() and reduce_keyframes() are vectorized over frames and channels.
+    - save() writes a binary file that load() maps into memory without parsing: a fixed header, the channel
+    names as json, then the times and values arrays aligned to 64 bytes.
+    """
+
+    def __init__(self, channels, times, values, fps=None):
+        self.channels = list(channels)
+        self.times = np.ascontiguousarray(times, dtype=np.float64)
+        self.values = np.ascontiguousarray(values, dtype=np.float32)
+        self.fps = fps
+        if self.values.shape != (len(self.times), len(self.channels)):
+            raise Exception("values must have shape (frames, channels), got {}".format(self.values.shape))
+
+    def __len__(self):
+        return len(self.times)
+
+    @property
+    def duration(self):
+        return float(self.times[-1] - self.times[0]) if len(self.times) else 0.0
+
+    def channel(self, name):
+        return self.values[:, self.channels.index(name)]
+
+    @classmethod
+    def from_csv(cls, path, fps=60):
+        # fps is the frame rate of the file, used for Timecode and frame number columns
+        with open(path, "r", newline="") as fp:
+            rows = [row for row in csv.reader(fp) if row]
+        header, rows = rows[0], rows[1:]
+        table = np.array(rows, dtype=str)
+
+        time_column = TimeColumn(header, fps)
+        if time_column.index is None:
+            times = np.arange(len(rows), dtype=np.float64) / fps
+        elif time_column.kind == "seconds":
+            times = table[:, time_column.index].astype(np.float64)
+        else:
+            times = np.array([time_column.read(row) for row in rows], dtype=np.float64) / fps
+
+        channels = []
+        columns = []
+        for j, name in enumerate(header):
+            if j == time_column.index:
+                continue
+            try:
+                columns.append(table[:, j].astype(np.float32))
+            except ValueError:
+                # non-numeric column
+                continue
+            channels.append(name)
+        values = np.stack(columns, axis=1) if columns else np.zeros((len(rows), 0), dtype=np.float32)
+        return cls(channels, times, values, fps)
+
+    def to_csv(self, path):
+        with open(path, "w", newline="") as fp:
+            writer = csv.writer(fp)
+            writer.writerow(["time"] + self.channels)
+            for t, row in zip(self.times, self.values):
+                writer.writerow([f"{t:.6f}"] + [f"{v:.6g}" for v in row])
+
+    def sample(self, times):
+        # Linearly interpolated values at the given times, shape (len(times), channels).
+        times = np.asarray(times, dtype=np.float64)
+        if len(self.times) == 1:
+            return np.repeat(self.values, len(times), axis=0)
+        right = np.clip(np.searchsorted(self.times, times, side="right"), 1, len(self.times) - 1)
+        left = right - 1
+        span = self.times[right] - self.times[left]
+        weight = np.clip((times - self.times[left]) / np.where(span > 0, span, 1.0), 0.0, 1.0)[:, None]
+        return (self.values[left] * (1 - weight) + self.values[right] * weight).astype(np.float32)
+
+    def resample(self, fps):
+        # New curves sampled every 1 / fps seconds over the same time range.
+        if not len(self.times):
+            return AnimationCurves(self.channels, self.times, self.values, fps)
+        count = int(np.floor(self.duration * fps + 1e-9)) + 1
+        times = self.times[0] + np.arange(count, dtype=np.float64) / fps
+        return AnimationCurves(self.channels, times, self.sample(times), fps)
+
+    def reduce_keyframes(self, tolerance=1e-3):
+        """
+        Drops frames that linear interpolation between the kept frames reproduces to within tolerance on every
+        channel (Ramer-Douglas-Peucker over all channels at once). The result has irregular times, so fps is None.
+        """
+        count = len(self.times)
+        if count <= 2:
+            return AnimationCurves(self.channels, self.times, self.values)
+
+        keep = np.zeros(count, dtype=bool)
+        keep[0] = keep[-1] = True
+        stack = [(0, count - 1)]
+        while stack:
+            start, end = stack.pop()
+            if end - start < 2:
+                continue
+            inner = np.arange(start + 1, end)
+            weight = ((self.times[inner] - self.times[start]) / (self.times[end] - self.times[start]))[:, None]
+            line = self.values[start] * (1 - weight) + self.values[end] * weight
+            error = np.abs(self.values[inner] - line).max(axis=1)
+            worst = int(np.argmax(error))
+            if error[worst] > tolerance:
+                split = int(inner[worst])
+                keep[split] = True
+                stack.append((start, split))
+                stack.append((split, end))
+        return AnimationCurves(self.channels, self.times[keep], self.values[keep])
+
+    def to_bytes(self):
+        # The binary format written by save(), with offsets relative to the start of the record.
+        names = json.dumps(self.channels).encode("utf-8")
+        times_offset = align(HEADER.size + len(names))
+        values_offset = align(times_offset + self.times.nbytes)
+        header = HEADER.pack(MAGIC, HEADER.size + len(names), len(self.times), len(self.channels), self.fps or 0.0, times_offset, values_offset)
+        return b"".join([
+            header,
+            names,
+            b"\0" * (times_offset - len(header) - len(names)),
+            self.times.tobytes(),
+            b"\0" * (values_offset - times_offset - self.times.nbytes),
+            self.values.tobytes(),
+        ])
+
+    def save(self, path):
+        with open(path, "wb") as fp:
+            fp.write(self.to_bytes())
+
+    @classmethod
+    def from_buffer(cls, buffer, offset=0):
+        # Curves stored at offset in buffer (eg. an mmap). The arrays are views of the buffer, nothing is copied.
+        magic, header_length, frames, channels, fps, times_offset, values_offset = HEADER.unpack_from(buffer, offset)
+        if magic != MAGIC:
+            raise Exception("No animation curves found at offset {}".format(offset))
+        names = json.loads(bytes(buffer[offset + HEADER.size:offset + header_length]).decode("utf-8"))
+        times = np.frombuffer(buffer, dtype=np.float64, count=frames, offset=offset + times_offset)
+        values = np.frombuffer(buffer, dtype=np.float32, count=frames * channels, offset=offset + values_offset).reshape(frames, channels)
+        curves = cls.__new__(cls)
+        curves.channels, curves.times, curves.values, curves.fps = names, times, values, fps or None
+        return curves
+
+    @classmethod
+    def load(cls, path):
+        # Maps a file written by save() into memory. The arrays are read-only views of the file.
+        with open(path, "rb") as fp:
+            buffer = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls.from_buffer(buffer)
+
+
+def align(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def convert_csv(csv_file, curves_file, fps=60, resample_fps=None, tolerance=None):
+    # Converts a downloaded curve csv to the binary format, optionally resampling and reducing keyframes.
+    curves = AnimationCurves.from_csv(csv_file, fps)
+    if resample_fps:
+        curves = curves.resample(resample_fps)
+    if tolerance:
+        curves = curves.reduce_keyframes(tolerance)
+    curves.save(curves_file)
+    return curves
@@ -0,0 +1,223 @@
+import asyncio
+import json
+import os
+import random
+import time
+import aiohttp
+from . import animation, video
+from .rate_control import RETRY_STATUSES, parse_retry_after
+from .status_poller import poll_interval
+
+
+class AsyncSyncAiClient():
+    """
+    asyncio version of SyncAiClient built on aiohttp, see AsyncSyncAiVideoClient and AsyncSyncAiAnimationClient.
+
+    All requests share one aiohttp session and its connection pool, so thousands of jobs can be in flight
+    on a single event loop without a thread per job. Use it as an async context manager so the session is closed:
+
+        async with AsyncSyncAiVideoClient(token) as client:
+            resp = await client.generate("Hello", "en-US", "metahumans", actor="caprica", camera=0)
+            await client.download_content(resp["jobId"], "hello.mp4")
+
+    - connect_timeout and read_timeout (seconds) bound connecting and each read of a response, with no limit on
+    the total time of a request, so large downloads are not cut off.
+    - Status checks follow the schedule of StatusPoller: jobs are polled around the render time observed for
+    previous jobs and back off exponentially from min_poll_interval to max_poll_interval once they run late.
+    - Connection errors and 429/5xx responses are retried up to `retries` times with jittered exponential backoff
+    from backoff_factor seconds, honouring Retry-After. Generate requests are not idempotent, so they are only
+    retried when the connection could not be made or on a 429.
+    - Downloads are written to `<save_file>.part` off the event loop and moved into place once complete.
+    """
+
+    default_url = video.SyncAiVideoClient.default_url
+
+    def __init__(self, token, url=None, pool_size=100, min_poll_interval=1.0, max_poll_interval=30.0, chunk_size=1024 * 1024, connect_timeout=5.0, read_timeout=30.0, retries=3, backoff_factor=0.5):
+        self.url = url or self.default_url
+        self.token = token
+        self.pool_size = pool_size
+        self.min_poll_interval = min_poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.chunk_size = chunk_size
+        self.timeout = aiohttp.ClientTimeout(total=None, sock_connect=connect_timeout, sock_read=read_timeout)
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.session = None
+
+        self.submitted = {}  # jobId -> time the generate response arrived, for jobs not yet finished
+        # exponential moving average of observed render times, see StatusPoller
+        self.render_time = None
+        self.render_time_weight = 0.2
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def open(self):
+        if self.session is None:
+            self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.pool_size), timeout=self.timeout)
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def backoff(self, attempt):
+        # jittered exponential backoff, see http_session.JitteredRetry
+        backoff = self.backoff_factor * 2 ** attempt
+        return backoff / 2 + random.uniform(0, backoff / 2)
+
+    async def request(self, method, url, idempotent=True, body=None, **kwargs):
+        # Sends a request, retrying connection errors and 429/5xx responses, and returns the response.
+        # body, if given, is called before every attempt for the data of the request, which cannot be sent twice.
+        # Requests that are not idempotent are only retried if nothing reached the server or on a 429.
+        await self.open()
+        for attempt in range(self.retries + 1):
+            last = attempt == self.retries
+            try:
+                resp = await self.session.request(method, url, **kwargs, **(body() if body is not None else {}))
+            except aiohttp.ClientConnectorError:
+                if last:
+                    raise
+                await asyncio.sleep(self.backoff(attempt))
+                continue
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                if last or not idempotent:
+                    raise
+                await asyncio.sleep(self.backoff(attempt))
+                continue
+
+            if last or resp.status not in RETRY_STATUSES or not (idempotent or resp.status == 429):
+                return resp
+            delay = parse_retry_after(resp.headers.get("Retry-After"))
+            resp.release()
+            await asyncio.sleep(self.backoff(attempt) if delay is None else delay)
+
+    async def get_json(self, url):
+        resp = await self.request("GET", url)
+        async with resp:
+            return await resp.json(content_type=None)
+
+    async def check_status(self, job_id):
+        return await self.get_json(os.path.join(self.url, f"status?jobId={job_id}&token={self.token}"))
+
+    async def download_content(self, job_id, save_file):
+        # poll the status of the job on the StatusPoller schedule until it has finished then download the content
+        # file extension of save_file must match the output type of the request
+        added = self.submitted.get(job_id, time.monotonic())
+        polls = 0
+        late_polls = 0
+        while True:
+            age = time.monotonic() - added
+            await asyncio.sleep(poll_interval(age, self.render_time, polls, late_polls, self.min_poll_interval, self.max_poll_interval))
+            if self.render_time is None or age >= self.render_time:
+                late_polls += 1
+            polls += 1
+
+            status = await self.check_status(job_id)
+            if status["status"] == "finished":
+                break
+            elif status["status"] == "failed":
+                self.submitted.pop(job_id, None)
+                print("Job {} failed with: {}".format(job_id, status))
+                return status
+
+        # the job finished by the time of this status response, measured from the generate response
+        if self.submitted.pop(job_id, None) is not None:
+            render_time = time.monotonic() - added
+            if self.render_time is None:
+                self.render_time = render_time
+            else:
+                self.render_time += self.render_time_weight * (render_time - self.render_time)
+
+        await self.download_finished(job_id, save_file)
+
+        return None
+
+    async def download_finished(self, job_id, save_file):
+        # download the output of a job that has already reached the 'finished' status
+        download_file = job_id + "." + save_file.split(".")[-1]
+        resp_json = await self.get_json(os.path.join(self.url, f"download?fileName={download_file}&token={self.token}"))
+
+        if "url" not in resp_json:
+            raise Exception("Download failed: ", resp_json)
+
+        loop = asyncio.get_running_loop()
+        part_file = save_file + ".part"
+        fp = await loop.run_in_executor(None, open, part_file, "wb")
+        try:
+            resp = await self.request("GET", resp_json["url"])
+            async with resp:
+                resp.raise_for_status()
+                # file writes run in the default executor so a slow disk does not stall the other jobs
+                async for chunk in resp.content.iter_chunked(self.chunk_size):
+                    await loop.run_in_executor(None, fp.write, chunk)
+        except BaseException:
+            await loop.run_in_executor(None, fp.close)
+            os.remove(part_file)
+            raise
+        await loop.run_in_executor(None, fp.close)
+        os.replace(part_file, save_file)
+
+    async def submit(self, job, audio_file=None, display=False):
+        # Sends a job built by build_job to the generate endpoint, with audio_file as a multipart upload if given.
+        generate_url = os.path.join(self.url, f"generate?token={self.token}")
+        if audio_file:
+            # Send multipart request if audio file is present
+            with open(audio_file, "rb") as fp:
+                def form():
+                    # a form can only be sent once, so every attempt gets its own
+                    fp.seek(0)
+                    form = aiohttp.FormData()
+                    form.add_field("audio", fp, filename=os.path.basename(audio_file))
+                    form.add_field("job", json.dumps(job, indent=2).encode('utf-8'), filename="job")
+                    return {"data": form}
+                resp = await self.request("POST", generate_url, idempotent=False, body=form)
+                async with resp:
+                    response = await resp.json(content_type=None) if resp.ok else {"error": "curl request failed"}
+        else:
+            resp = await self.request("POST", generate_url, idempotent=False, json=job)
+            async with resp:
+                response = await resp.json(content_type=None) if resp.ok else {"error": "curl request failed"}
+
+        if "jobId" in response:
+            self.submitted[response["jobId"]] = time.monotonic()
+
+        if display:
+            print(response)
+
+        return response
+
+    async def generate_and_download(self, output_file, **kwargs):
+        # Generates a single job and waits for it to be downloaded to output_file.
+        response = await self.generate(**kwargs)
+        if "jobId" not in response:
+            return response
+
+        status = await self.download_content(response["jobId"], output_file)
+        if status is not None:
+            return [response, status]
+        return response
+
+
+class AsyncSyncAiVideoClient(AsyncSyncAiClient):
+
+    default_url = video.SyncAiVideoClient.default_url
+
+    async def generate(self, text, language, target_rig, actor=None, camera=None, tts_voice=None, tts_speed=None, background_rgb=None, audio_url=None, audio_file=None, emotion="", emotion_level=1, frame_width=None, frame_height=None, display=False):
+        # Sends a request to generate a video.
+        job = video.build_job(text, language, target_rig, actor=actor, camera=camera, tts_voice=tts_voice, tts_speed=tts_speed, background_rgb=background_rgb, audio_url=audio_url, audio_file=audio_file, emotion=emotion, emotion_level=emotion_level, frame_width=frame_width, frame_height=frame_height)
+        return await self.submit(job, audio_file=audio_file, display=display)
+
+
+class AsyncSyncAiAnimationClient(AsyncSyncAiClient):
+
+    default_url = animation.SyncAiAnimationClient.default_url
+
+    async def generate(self, text, language, target_rig, tts_voice=None, tts_speed=None, audio_url=None, audio_file=None, emotion="", emotion_level=1, output_type="csv", actor=None, display=False):
+        # Sends a request to generate animation curves.
+        job = animation.build_job(text, language, target_rig, tts_voice=tts_voice, tts_speed=tts_speed, audio_url=audio_url, audio_file=audio_file, emotion=emotion, emotion_level=emotion_level, output_type=output_type, actor=actor)
+        return await self.submit(job, audio_file=audio_file, display=display)
@@ -0,0 +1,341 @@
+import binascii
+import collections
+import hashlib
+import itertools
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import wave
+
+
+class MultipartStream():
+    """
+    A multipart/form-data request body that is read from disk as it is sent.
+
+    fields is a list of (name, filename, value) where value is bytes or the path of a file. Files are
+    read in small blocks while the request is sent, so memory use does not depend on their size, and the
+    length of the body is known up front so it is sent with a Content-Length rather than chunked.
+    Pass it as `data` with `headers={"Content-Type": stream.content_type}`. The stream can be rewound
+    with seek(), which urllib3 does before retrying a request.
+    """
+
+    def __init__(self, fields, boundary=None, block_size=64 * 1024):
+        self.boundary = boundary or binascii.hexlify(os.urandom(16)).decode("ascii")
+        self.content_type = f"multipart/form-data; boundary={self.boundary}"
+        self.block_size = block_size
+        self.segments = []  # (start, length, bytes or path)
+        self.length = 0
+        for name, filename, value in fields:
+            self.add(f'--{self.boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n\r\n'.encode("utf-8"))
+            self.add(value)
+            self.add(b"\r\n")
+        self.add(f"--{self.boundary}--\r\n".encode("utf-8"))
+        self.position = 0
+        self.files = {}
+
+    def add(self, value):
+        length = len(value) if isinstance(value, bytes) else os.path.getsize(value)
+        self.segments.append((self.length, length, value))
+        self.length += length
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        while True:
+            block = self.read(self.block_size)
+            if not block:
+                return
+            yield block
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        for fp in self.files.values():
+            fp.close()
+        self.files = {}
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self.position
+        elif whence == os.SEEK_END:
+            offset += self.length
+        self.position = min(max(offset, 0), self.length)
+        return self.position
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.length - self.position
+        blocks = []
+        for start, length, value in self.segments:
+            if size <= 0:
+                break
+            if self.position >= start + length:
+                continue
+            offset = self.position - start
+            count = min(size, length - offset)
+            if isinstance(value, bytes):
+                block = value[offset:offset + count]
+            else:
+                if value not in self.files:
+                    self.files[value] = open(value, "rb")
+                fp = self.files[value]
+                fp.seek(offset)
+                block = fp.read(count)
+                if len(block) != count:
+                    raise Exception("{} changed size while it was being uploaded".format(value))
+            blocks.append(block)
+            self.position += count
+            size -= count
+        return b"".join(blocks)
+
+
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_IEEE_FLOAT = 3
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+def read_wav_header(path):
+    # Returns (format, channels, sample rate, sample width, offset of the samples, length of the samples) of a wav file,
+    # or None if path is not a wav file. Unlike the wave module, WAVE_FORMAT_EXTENSIBLE and float files are accepted.
+    with open(path, "rb") as fp:
+        riff = fp.read(12)
+        if len(riff) < 12 or riff[:4] != b"RIFF" or riff[8:] != b"WAVE":
+            return None
+        fmt = None
+        while True:
+            chunk = fp.read(8)
+            if len(chunk) < 8:
+                return None
+            name, length = struct.unpack("<4sI", chunk)
+            if name == b"fmt ":
+                body = fp.read(length)
+                if len(body) < 16:
+                    return None
+                format_tag, channels, sample_rate, _, _, bits = struct.unpack("<HHIIHH", body[:16])
+                if format_tag == WAVE_FORMAT_EXTENSIBLE and len(body) >= 26:
+                    # the first two bytes of the sub-format GUID are the actual format tag
+                    format_tag = struct.unpack("<H", body[24:26])[0]
+                fmt = (format_tag, channels, sample_rate, (bits + 7) // 8)
+                fp.seek(length % 2, os.SEEK_CUR)
+            elif name == b"data":
+                if fmt is None:
+                    return None
+                offset = fp.tell()
+                # files written by streaming encoders may leave the length unset
+                length = min(length, os.path.getsize(path) - offset)
+                return fmt + (offset, length)
+            else:
+                fp.seek(length + length % 2, os.SEEK_CUR)
+
+
+def lowpass(samples, cutoff, taps_per_zero=8):
+    # Windowed-sinc low-pass filter, cutoff in cycles per sample (0.5 is the Nyquist frequency).
+    import numpy as np
+
+    half = int(taps_per_zero / (2 * cutoff))
+    n = np.arange(-half, half + 1)
+    kernel = 2 * cutoff * np.sinc(2 * cutoff * n) * np.blackman(len(n))
+    kernel /= kernel.sum()
+    return np.convolve(samples, kernel.astype(np.float32), mode="same")
+
+
+def preprocess_wav(source, target, sample_rate=16000, sample_width=2, mono=True):
+    """
+    Writes the wav file source to target as PCM at sample_rate Hz with sample_width bytes per sample,
+    downmixed to one channel if mono is set. Returns target, or None if source is not a wav file or is
+    already no larger than that format, in which case source should be uploaded as it is.
+    Runs in the worker processes of AudioPreprocessor.
+    """
+    # numpy is only needed when audio is converted
+    import numpy as np
+
+    header = read_wav_header(source)
+    if header is None:
+        return None
+    format_tag, channels, rate, width, offset, length = header
+    if not channels or not (format_tag == WAVE_FORMAT_PCM and width in (1, 2, 3, 4) or format_tag == WAVE_FORMAT_IEEE_FLOAT and width == 4):
+        return None
+    out_channels = 1 if mono else channels
+    if format_tag == WAVE_FORMAT_PCM and rate <= sample_rate and width <= sample_width and channels <= out_channels:
+        return None
+    frames = length // (channels * width)
+    out_frames = int(round(frames * min(sample_rate, rate) / rate))
+    if out_frames * out_channels * sample_width >= length:
+        return None
+
+    data = np.memmap(source, dtype=np.uint8, mode="r", offset=offset, shape=(frames * channels * width,))
+    if format_tag == WAVE_FORMAT_IEEE_FLOAT:
+        samples = data.view("<f4").astype(np.float32)
+    elif width == 1:
+        samples = (data.astype(np.float32) - 128) / 128
+    elif width == 2:
+        samples = data.view("<i2").astype(np.float32) / 2 ** 15
+    elif width == 3:
+        triples = data.reshape(-1, 3).astype(np.int32)
+        values = triples[:, 0] | (triples[:, 1] << 8) | (triples[:, 2] << 16)
+        samples = (np.where(values >= 2 ** 23, values - 2 ** 24, values) / 2 ** 23).astype(np.float32)
+    else:
+        samples = data.view("<i4").astype(np.float32) / 2 ** 31
+    del data
+    samples = samples.reshape(frames, channels)
+    if mono and channels > 1:
+        samples = samples.mean(axis=1, keepdims=True)
+
+    if sample_rate < rate:
+        # filter out what the new rate cannot represent, then interpolate at the new sample times
+        positions = np.arange(out_frames) * (rate / sample_rate)
+        samples = np.stack([
+            np.interp(positions, np.arange(frames), lowpass(samples[:, c], 0.5 * sample_rate / rate * 0.95))
+            for c in range(samples.shape[1])
+        ], axis=1)
+        rate = sample_rate
+
+    scale = 2 ** (8 * sample_width - 1)
+    quantized = np.clip(np.round(samples * scale), -scale, scale - 1)
+    if sample_width == 1:
+        quantized = (quantized + 128).astype(np.uint8)
+    else:
+        quantized = quantized.astype({2: "<i2", 4: "<i4"}[sample_width])
+
+    os.makedirs(os.path.dirname(os.path.abspath(target)), exist_ok=True)
+    with wave.open(target + ".part", "wb") as fp:
+        fp.setnchannels(quantized.shape[1])
+        fp.setsampwidth(sample_width)
+        fp.setframerate(rate)
+        fp.writeframes(quantized.tobytes())
+    os.replace(target + ".part", target)
+    return target
+
+
+class AudioPreprocessor():
+    """
+    Converts audio files to a smaller wav format before they are uploaded, in a pool of worker processes.
+
+    Wav input (PCM or float, any sample width, including WAVE_FORMAT_EXTENSIBLE files) is downmixed to mono
+    if mono is set, low-pass filtered and resampled down to sample_rate, and re-quantized to sample_width bytes,
+    see preprocess_wav. Other files and files already in a smaller format are uploaded unchanged.
+    Converted files are written to output_dir (a temporary directory by default, removed by close()).
+
+    - submit(path) starts converting a file in the background and takes a reference to the conversion, which is
+    dropped with release(path). A file is converted once while it has references; once the last is dropped the
+    conversion is forgotten and the converted file removed, so memory and disk use follow the jobs in flight
+    rather than the size of the batch.
+    - prepare(path) takes a reference, waits for the conversion and returns (path to upload, size of the
+    original file). Release it once the file has been uploaded.
+    - ahead() converts the audio of the next jobs of a batch so that conversion runs in parallel with the uploads.
+    """
+
+    def __init__(self, sample_rate=16000, sample_width=2, mono=True, workers=None, output_dir=None):
+        if sample_width not in (1, 2, 4):
+            raise Exception("sample_width must be 1, 2 or 4 bytes")
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.mono = mono
+        self.workers = workers or os.cpu_count() or 1
+        self.temporary = output_dir is None
+        self.output_dir = output_dir or tempfile.mkdtemp(prefix="syncai_audio_")
+        self.pool = None
+        self.lock = threading.Lock()
+        self.futures = {}  # (path, size, mtime) -> [future of the converted path or None, number of references]
+
+    @staticmethod
+    def key(path):
+        stat = os.stat(path)
+        return (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+    def submit(self, path):
+        key = self.key(path)
+        with self.lock:
+            if key not in self.futures:
+                if self.pool is None:
+                    # multiprocessing is only imported once a file needs converting
+                    from concurrent.futures import ProcessPoolExecutor
+                    self.pool = ProcessPoolExecutor(max_workers=self.workers)
+                name = hashlib.sha256(repr(key + (self.sample_rate, self.sample_width, self.mono)).encode("utf-8")).hexdigest()[:32]
+                target = os.path.join(self.output_dir, name + ".wav")
+                self.futures[key] = [self.pool.submit(preprocess_wav, path, target, self.sample_rate, self.sample_width, self.mono), 0]
+            self.futures[key][1] += 1
+            return self.futures[key][0]
+
+    def release(self, path):
+        # Drops a reference taken by submit() or prepare(), removing the converted file once none are left.
+        try:
+            key = self.key(path)
+        except OSError:
+            return
+        with self.lock:
+            entry = self.futures.get(key)
+            if entry is None:
+                return
+            entry[1] -= 1
+            if entry[1] > 0:
+                return
+            del self.futures[key]
+        entry[0].add_done_callback(lambda future: self.remove_converted(key, future))
+
+    def remove_converted(self, key, future):
+        if future.cancelled() or future.exception() is not None or future.result() is None:
+            return
+        with self.lock:
+            if key in self.futures:
+                # submitted again since, the new conversion writes the same file
+                return
+            if os.path.exists(future.result()):
+                os.remove(future.result())
+
+    def prepare(self, path):
+        size = os.path.getsize(path)
+        future = self.submit(path)
+        try:
+            converted = future.result()
+        except BaseException:
+            self.release(path)
+            raise
+        return converted or path, size
+
+    def ahead(self, samples, depth=None):
+        # Yields the (index, job) samples of a batch unchanged while the audio_file of the next `depth` jobs
+        # (twice the number of workers by default) is being converted. The first job is yielded straight away:
+        # two samples are read for each one yielded until `depth` are waiting, so the window fills as the batch runs.
+        # The reference taken for a job is dropped once the next job is asked for, by when it has been uploaded.
+        depth = depth or 2 * self.workers
+        samples = iter(samples)
+        window = collections.deque()
+        while True:
+            for sample in itertools.islice(samples, 2 if len(window) < depth else 1):
+                audio_file = sample[1].get("audio_file")
+                try:
+                    if audio_file:
+                        self.submit(audio_file)
+                except OSError:
+                    # reported when the job is generated
+                    audio_file = None
+                window.append((sample, audio_file))
+            if not window:
+                return
+            sample, audio_file = window.popleft()
+            yield sample
+            if audio_file:
+                self.release(audio_file)
+
+    def close(self):
+        with self.lock:
+            futures, self.futures = self.futures, {}
+        if self.pool is not None:
+            # conversions that have not started are cancelled by hand, shutdown(cancel_futures=True) needs Python 3.9
+            for future, _ in futures.values():
+                future.cancel()
+            self.pool.shutdown()
+            self.pool = None
+        if self.temporary:
+            shutil.rmtree(self.output_dir, ignore_errors=True)
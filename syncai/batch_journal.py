@@ -0,0 +1,163 @@
+import collections
+import json
+import os
+
+
+class BatchJournal():
+    """
+    Append-only record of a batch run, one JSON event per line.
+
+    Events are written as each job is submitted, finishes rendering, fails or is downloaded:
+        {"event": "submitted", "index": 3, "jobId": "...", "response": {...}}
+        {"event": "generate_failed", "index": 4, "response": {...}}
+        {"event": "duplicate", "index": 5, "of": 3, "response": {...}}
+        {"event": "finished", "index": 3, "jobId": "..."}
+        {"event": "failed", "index": 3, "status": {...}}
+        {"event": "downloaded", "index": 3}
+        {"event": "download_failed", "index": 3, "error": "..."}
+        {"event": "completed", "index": null}
+    The "completed" event is written once every job of the run has an outcome, see completed().
+    Each line is flushed as it is written (and fsync'ed with fsync=True), so a crash loses at most the event
+    being written. With path=None the events are kept in memory instead. With read_only=True the journal
+    at path is only read, eg. while the batch that writes it is still running.
+    """
+
+    def __init__(self, path=None, resume=False, fsync=False, read_only=False):
+        self.path = path
+        self.fsync = fsync
+        self.events = [] if path is None else None
+        self.counts = collections.Counter()  # event -> number of times it was recorded by this instance
+        self.fp = None
+        if path is not None and not read_only:
+            self.fp = open(path, "a" if resume else "w", encoding="utf-8")
+            if resume and self.fp.tell() and not self.ends_with_newline(path):
+                # terminate a line cut short by a crash so the next event starts on its own line
+                self.fp.write("\n")
+
+    @staticmethod
+    def ends_with_newline(path):
+        with open(path, "rb") as fp:
+            fp.seek(-1, os.SEEK_END)
+            return fp.read(1) == b"\n"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self.fp is not None:
+            self.fp.close()
+            self.fp = None
+
+    def record(self, event, index, **fields):
+        if self.path is not None and self.fp is None:
+            raise Exception("Journal {} is not open for writing".format(self.path))
+        self.counts[event] += 1
+        entry = {"event": event, "index": index, **fields}
+        if self.fp is None:
+            self.events.append(entry)
+            return
+        self.fp.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self.fp.flush()
+        if self.fsync:
+            os.fsync(self.fp.fileno())
+
+    def read(self):
+        # Yields the recorded events in order. A line cut short by a crash is skipped.
+        if self.path is None:
+            yield from self.events
+            return
+        if self.fp is not None:
+            self.fp.flush()
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as fp:
+            for line in fp:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+    def completed(self):
+        # True if the last run of the batch recorded the outcome of every job, ie. the last event is "completed".
+        # A resumed run appends after it, so the journal is only complete again once that run finishes.
+        last = None
+        for entry in self.read():
+            last = entry
+        return last is not None and last["event"] == "completed"
+
+    def resume_state(self):
+        # Returns (done, submitted) for a previous run of the same batch:
+        # - done is the set of job indices whose output has been downloaded
+        # - submitted maps the index of each job that was submitted but not yet downloaded to (jobId, response)
+        # Jobs that failed are in neither, so they are generated again.
+        done = set()
+        submitted = {}
+        duplicates = {}
+        for entry in self.read():
+            i = entry["index"]
+            event = entry["event"]
+            if event == "submitted":
+                submitted[i] = (entry["jobId"], entry["response"])
+                done.discard(i)
+            elif event == "downloaded":
+                submitted.pop(i, None)
+                done.add(i)
+            elif event in ("failed", "download_failed", "generate_failed"):
+                submitted.pop(i, None)
+                done.discard(i)
+            elif event == "duplicate":
+                duplicates[i] = entry["of"]
+        # a duplicate whose own copy was never made but whose original is still in flight is re-attached to it
+        for i, of in duplicates.items():
+            if i not in done and i not in submitted and of in submitted:
+                submitted[i] = submitted[of]
+        return done, submitted
+
+    def iter_results(self):
+        # Yields (index, result) for the results file written to <input>_results.json: the generate response of
+        # each job, or [response, status] if it failed. A job is yielded once its outcome is final, so only the
+        # jobs in flight and the failed ones (which a resumed run may still retry) are held in memory.
+        responses = {}  # index -> generate response of a job in flight
+        failed = {}     # index -> result of a failed job
+        for entry in self.read():
+            i = entry["index"]
+            event = entry["event"]
+            if event == "submitted":
+                failed.pop(i, None)
+                responses[i] = entry["response"]
+            elif event == "duplicate":
+                failed.pop(i, None)
+                responses[i] = entry["response"] if "response" in entry else responses.get(entry["of"])
+            elif event == "generate_failed":
+                failed[i] = entry["response"]
+            elif event == "failed":
+                failed[i] = [responses.pop(i, None), entry["status"]]
+            elif event == "download_failed":
+                failed[i] = [responses.pop(i, None), {"status": "download_failed", "error": entry["error"]}]
+            elif event == "downloaded":
+                if i in responses:
+                    yield i, responses.pop(i)
+                elif i in failed:
+                    # downloaded by a later attempt after an earlier failure
+                    result = failed.pop(i)
+                    yield i, result[0] if isinstance(result, list) else result
+        # jobs that never completed, eg. in an interrupted run, then the failures
+        yield from responses.items()
+        yield from failed.items()
+
+
+def write_results(path, results):
+    # Writes (index, result) pairs as the json object of a results file one at a time, so the whole batch is
+    # never held in memory. The file is written next to path and moved into place once complete.
+    with open(path + ".part", "w", encoding="utf-8") as fp:
+        fp.write("{")
+        empty = True
+        for i, result in results:
+            fp.write("\n" if empty else ",\n")
+            fp.write("    {}: {}".format(json.dumps(str(i)), json.dumps(result, indent=4).replace("\n", "\n    ")))
+            empty = False
+        fp.write("}" if empty else "\n}")
+    os.replace(path + ".part", path)
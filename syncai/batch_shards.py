@@ -0,0 +1,67 @@
+import os
+from .batch_journal import BatchJournal, write_results
+from .job_input import read_jobs
+
+
+def check_shard(shard_index, shard_count):
+    if shard_count < 1:
+        raise Exception("shard_count must be at least 1")
+    if not 0 <= shard_index < shard_count:
+        raise Exception("shard_index must be between 0 and {}".format(shard_count - 1))
+
+
+def shard_of(key, shard_count):
+    # Shard a job belongs to, from its job key (a sha256 hex digest, see result_cache.job_key).
+    # Depends only on the job, so every process assigns every job to the same shard without coordinating,
+    # and identical jobs land in the same shard where they are submitted once.
+    return int(key[:16], 16) % shard_count
+
+
+def shard_prefix(input_file, shard_index=0, shard_count=1):
+    # Common prefix of the results and journal files written for a shard of input_file.
+    # A batch that is not sharded keeps the plain <input>_results.json and <input>_journal.jsonl names.
+    prefix = os.path.splitext(input_file)[0]
+    if shard_count > 1:
+        prefix += f"_shard{shard_index}of{shard_count}"
+    return prefix
+
+
+def merge_results(input_file, shard_count, partial=False):
+    """
+    Combines the results of every shard of input_file into <input>_results.json, the file an unsharded
+    run writes. The results of each shard are read from its journal, which is opened read-only so a shard that
+    is still running is not disturbed. A shard has finished once its journal ends with a "completed" event.
+    Raises if any shard has not finished, unless partial=True, in which case the finished shards are merged and
+    the jobs of the others are reported missing. Raises if no shard of input_file has finished, rather than
+    overwriting the results file.
+
+    Returns a report of the merge:
+    {"jobs": 1000, "merged": 998, "missing": [17, 512], "duplicated": [], "pending_shards": [3]}
+    where "missing" lists the indices of jobs with no result in any finished shard, "duplicated" the indices of
+    jobs with a result in more than one shard (which happens if the input file was edited between shard runs)
+    and "pending_shards" the shards that have not finished or have not been run.
+    """
+    check_shard(0, shard_count)
+    journals = [BatchJournal(f"{shard_prefix(input_file, shard_index, shard_count)}_journal.jsonl", read_only=True) for shard_index in range(shard_count)]
+    pending_shards = [shard_index for shard_index, journal in enumerate(journals) if not journal.completed()]
+    if len(pending_shards) == shard_count:
+        raise Exception("None of the {} shards of {} has finished".format(shard_count, input_file))
+    if pending_shards and not partial:
+        raise Exception("Shards {} of {} have not finished, merge once they have or pass partial=True (--partial) to merge the others".format(pending_shards, input_file))
+
+    merged = {}
+    duplicated = set()
+    for shard_index, journal in enumerate(journals):
+        if shard_index in pending_shards:
+            continue
+        for i, result in journal.iter_results():
+            if i in merged:
+                duplicated.add(i)
+            merged[i] = result
+
+    jobs = sum(1 for _ in read_jobs(input_file))
+    missing = [i for i in range(jobs) if i not in merged]
+
+    write_results(f"{shard_prefix(input_file)}_results.json", sorted(merged.items()))
+
+    return {"jobs": jobs, "merged": len(merged), "missing": missing, "duplicated": sorted(duplicated), "pending_shards": pending_shards}
@@ -0,0 +1,277 @@
+import argparse
+import importlib
+import os
+import sys
+
+
+# Only the standard library is imported when the command starts. Each command imports the modules it needs,
+# so `syncai ... validate` and `--help` never load requests, tqdm or numpy. See Benchmarks/import_time.py.
+CLIENTS = {
+    "video": ("syncai.video", "SyncAiVideoClient"),
+    "animation": ("syncai.animation", "SyncAiAnimationClient"),
+}
+
+
+def load_client(client):
+    module, name = CLIENTS[client]
+    return getattr(importlib.import_module(module), name)
+
+
+def single(args):
+    sync_client = load_client(args.client)(token=args.token, audio_sample_rate=args.audio_sample_rate)
+    try:
+        if args.client == "animation" and args.segmented:
+            sync_client.generate_and_download_segmented(
+                        args.output_file,
+                        args.text,
+                        args.language,
+                        args.target_rig,
+                        max_segment_chars=args.max_segment_chars,
+                        tts_voice=args.tts_voice,
+                        tts_speed=args.tts_speed,
+                        emotion=args.emotion,
+                        emotion_level=args.emotion_level,
+                        actor=args.actor,
+                        job_deadline=args.deadline)
+            return 0 if os.path.exists(args.output_file) else 1
+
+        if args.client == "video":
+            resp = sync_client.generate(
+                        args.text,
+                        args.language,
+                        args.target_rig,
+                        actor=args.actor,
+                        camera=args.camera,
+                        tts_voice=args.tts_voice,
+                        tts_speed=args.tts_speed,
+                        background_rgb=args.background_rgb,
+                        audio_url=args.audio_url,
+                        audio_file=args.audio_file,
+                        emotion=args.emotion,
+                        emotion_level=args.emotion_level,
+                        frame_width=args.frame_width,
+                        frame_height=args.frame_height,
+                        display=True,
+                        deadline=args.deadline)
+        else:
+            resp = sync_client.generate(
+                        args.text,
+                        args.language,
+                        args.target_rig,
+                        tts_voice=args.tts_voice,
+                        tts_speed=args.tts_speed,
+                        audio_url=args.audio_url,
+                        audio_file=args.audio_file,
+                        emotion=args.emotion,
+                        emotion_level=args.emotion_level,
+                        output_type=args.output_type,
+                        actor=args.actor,
+                        display=True,
+                        deadline=args.deadline)
+
+        if "jobId" not in resp:
+            print("Generate request failed: ", resp)
+            return 1
+        if args.client == "video":
+            status = sync_client.download_content(resp["jobId"], args.output_file)
+        else:
+            status = sync_client.download_content(resp["jobId"], args.output_file, curves_file=args.curves_file)
+        return 0 if status is None else 1
+    finally:
+        sync_client.close()
+
+
+def batch(args):
+    notifications = None
+    if args.notifications:
+        from .notifications import CallbackTransport
+        notifications = CallbackTransport(host=args.callback_host, port=args.callback_port, public_url=args.callback_public_url)
+    # keep at least one pooled connection per in-flight job
+    sync_client = load_client(args.client)(token=args.token, pool_size=max(args.pool_size, args.concurrency), read_timeout=args.read_timeout, retries=args.retries, max_polls_per_second=args.max_polls_per_second, download_parts=args.download_parts, cache_dir=args.cache_dir, max_submissions_per_second=args.max_submissions_per_second, render_times_file=args.render_times_file, audio_sample_rate=args.audio_sample_rate, audio_workers=args.audio_workers, notifications=notifications, hedge_percentile=args.hedge_percentile)
+    options = {"archive_file": args.archive_file} if args.client == "animation" else {}
+    try:
+        summary = sync_client.generate_and_download_from_file(args.input_file, concurrency=args.concurrency, resume=args.resume, metrics_file=args.metrics_file, schedule=args.schedule, shard_index=args.shard_index, shard_count=args.shard_count, job_deadline=args.job_deadline, **options)
+        print(summary)
+        print(sync_client.pool_stats())
+        print(sync_client.poller.stats())
+        if sync_client.cache is not None:
+            print(sync_client.cache.stats())
+    finally:
+        sync_client.close()
+    return 0
+
+
+def validate(args):
+    # Checks every job of input_file as a batch run would, without contacting the API.
+    from .job_input import read_jobs
+
+    client = load_client(args.client)
+    jobs = invalid = 0
+    try:
+        for i, job in enumerate(read_jobs(args.input_file)):
+            jobs += 1
+            try:
+                kwargs, _ = client.prepare_job(i, job)
+                client.build_job(**kwargs)
+                if kwargs.get("audio_file") and not os.path.isfile(kwargs["audio_file"]):
+                    raise Exception("audio_file {} does not exist".format(kwargs["audio_file"]))
+            except Exception as e:
+                invalid += 1
+                message = str(e)
+                print(message if message.startswith("Input sample") else "Input sample {}: {}".format(i, message))
+    except (OSError, ValueError) as e:
+        print("Cannot read {}: {}".format(args.input_file, e))
+        return 1
+    print("{} of {} jobs are valid".format(jobs - invalid, jobs))
+    return 1 if invalid else 0
+
+
+def daemon(args):
+    import threading
+    from .client_daemon import ClientDaemon
+
+    client = load_client(args.client)(token=args.token, pool_size=max(args.pool_size, args.concurrency), read_timeout=args.read_timeout, retries=args.retries, max_polls_per_second=args.max_polls_per_second, download_parts=args.download_parts, cache_dir=args.cache_dir, max_submissions_per_second=args.max_submissions_per_second, audio_sample_rate=args.audio_sample_rate)
+    client_daemon = ClientDaemon(client, concurrency=args.concurrency, root=args.root)
+    server = client_daemon.serve(host=args.host, port=args.port, socket_path=args.socket, token_file=args.token_file)
+    address = server.server_address if args.port is None else "http://{}:{}".format(args.host, server.server_address[1])
+    print("Serving files under {} on {}".format(client_daemon.root, address))
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        client_daemon.close()
+    return 0
+
+
+def merge(args):
+    from .batch_shards import merge_results
+
+    try:
+        report = merge_results(args.input_file, args.shard_count, partial=args.partial)
+    except Exception as e:
+        print(e)
+        return 1
+    print("Merged {} of {} jobs into the results file".format(report["merged"], report["jobs"]))
+    if report["pending_shards"]:
+        print("Shards that have not finished, left out of the merge: {}".format(report["pending_shards"]))
+    if report["missing"]:
+        print("Jobs with no result: {}".format(report["missing"]))
+    if report["duplicated"]:
+        print("Jobs with a result in more than one shard: {}".format(report["duplicated"]))
+    return 1 if report["missing"] or report["duplicated"] else 0
+
+
+def add_single_arguments(parser, client):
+    parser.add_argument('--language', type=str, required=True, help='Language of the text. See API docs for available language codes')
+    parser.add_argument('--token', type=str, required=True, help='User token tied to the account - it is used to validate the user identity.')
+    parser.add_argument('--text', type=str, required=True, help='Text for avatar to speak')
+    parser.add_argument('--output_file', type=str, required=True, help='File to save generated content to.')
+    if client == "video":
+        parser.add_argument('--actor', type=str, default="caprica", choices=['caprica', 'annie', 'simone', 'vi', 'mario', 'troy', 'valerio', 'danbing', 'lewis', 'laura', 'liz', 'jeremy', 'james'], help='Actor to use in rendered video. See API documentation for more details')
+        parser.add_argument('--camera', type=int, help='Camera ID', choices=[0, 1, 2, 6, 7], default=0)
+        parser.add_argument('--background_rgb', type=str, help='Comma-separated RGB values for the background, eg. 120,200,120')
+    else:
+        parser.add_argument('--actor', type=str, default=None, choices=['male', 'female', 'caprica', 'annie', 'simone', 'vi', 'mario', 'troy', 'valerio', 'danbing', 'lewis', 'laura', 'liz', 'jeremy', 'james'], help="Name of the actors voice to use. This field is not required if an audio file is provided or tts voice is set.")
+    parser.add_argument('--tts_voice', type=str, default=None, help="Voice of tts - consult googles TTS API documentation for options")
+    parser.add_argument('--tts_speed', type=float, default=None, help="Speed of the speech, range: 0.0-1.0. 1.0 is 100%% speed")
+    parser.add_argument('--target_rig', type=str, default="metahumans", choices=["metahumans", "arkit"],
+                        help="Specifies which required rig. For the video renderer only metahumans is accepted. For FBX output we currently only accept arkit")
+    parser.add_argument('--audio_url', type=str, default=None, help="Either a HTTP, S3 or OBS URL that points to an audio file to be downloaded by the engine")
+    parser.add_argument('--audio_file', type=str, default=None, help="Local path for audio file to send to the engine")
+    parser.add_argument('--deadline', type=float, default=None, help="Seconds the job has to be generated and downloaded. Requests are given the remaining time as their timeout")
+    parser.add_argument('--audio_sample_rate', type=int, default=None, help="Convert a wav --audio_file to mono 16-bit at this sample rate (eg. 16000) before upload")
+    parser.add_argument('--emotion', type=str, default=None, choices=["neutral", "happy", "sad", "surprise", "fear", "disappointed"], help="Apply emotion expression to avatar")
+    parser.add_argument('--emotion_level', type=float, default=1.0, help="0.0 for no expression on the actor’s face, 1.0 for maximum expression.")
+    if client == "video":
+        parser.add_argument('--frame_width', type=int, default=None, help='Width of frames in the generated video')
+        parser.add_argument('--frame_height', type=int, default=None, help='Height of frames in the generated video')
+    else:
+        parser.add_argument('--output_type', type=str, default="csv", help='Content type to be generated', choices=["fbx", "csv"])
+        parser.add_argument('--segmented', action='store_true', help='Split a long text into segments rendered in parallel and merge the curves. Only for csv output without audio input')
+        parser.add_argument('--max_segment_chars', type=int, default=300, help='Approximate maximum length of each segment in --segmented mode')
+        parser.add_argument('--curves_file', type=str, default=None, help='Also convert the downloaded csv to a memory-mappable binary curve file at this path')
+
+
+def add_client_arguments(parser):
+    # options of the client shared by the batch and daemon commands
+    parser.add_argument('--token', type=str, required=True, help='User token tied to the account - it is used to validate the user identity.')
+    parser.add_argument('--pool_size', type=int, default=10, help='Number of keep-alive connections to the API. Raised to --concurrency if lower')
+    parser.add_argument('--read_timeout', type=float, default=30.0, help='Seconds to wait for a response from the API before retrying')
+    parser.add_argument('--retries', type=int, default=3, help='Number of retries on connection errors and 429/5xx responses')
+    parser.add_argument('--max_polls_per_second', type=float, default=None, help='Cap on status requests per second across all in-flight jobs')
+    parser.add_argument('--download_parts', type=int, default=1, help='Number of parallel byte ranges used to download large files')
+    parser.add_argument('--cache_dir', type=str, default=None, help='Directory of a local cache of generated files. Jobs found in the cache are not sent to the API')
+    parser.add_argument('--max_submissions_per_second', type=float, default=None, help='Hard cap on generate requests per second, for accounts with a quota')
+    parser.add_argument('--audio_sample_rate', type=int, default=None, help='Convert wav audio_file inputs to mono 16-bit at this sample rate (eg. 16000) before upload')
+
+
+def add_batch_arguments(parser, client):
+    add_client_arguments(parser)
+    parser.add_argument('--input_file', type=str, required=True, help='Path to json file containing inputs and job specifications, or a .jsonl file with one job per line')
+    parser.add_argument('--concurrency', type=int, default=1, help='Maximum number of jobs to have in flight at once. Jobs are submitted ahead and downloaded in parallel when greater than 1. Fewer are kept in flight while the API pushes back')
+    parser.add_argument('--resume', action='store_true', help='Continue an interrupted run from its journal instead of starting again')
+    parser.add_argument('--metrics_file', type=str, default=None, help='Write latency metrics to this file at the end, Prometheus text format if it ends with .prom, json otherwise')
+    parser.add_argument('--schedule', type=str, default="file", choices=["file", "sjf"], help='Submit jobs in file order, or shortest estimated render time first (honouring priority and due_by fields)')
+    parser.add_argument('--render_times_file', type=str, default=None, help='File in which observed render times are kept between runs to refine the estimates used by --schedule sjf')
+    parser.add_argument('--audio_workers', type=int, default=None, help='Number of processes converting audio for --audio_sample_rate. Defaults to the number of CPUs')
+    parser.add_argument('--job_deadline', type=float, default=None, help='Seconds each job has from submission to be generated and downloaded. Requests are given the remaining time as their timeout and late jobs are recorded as failed')
+    parser.add_argument('--hedge_percentile', type=float, default=None, help='Send a duplicate of a status, download-URL or file request that has not answered within this percentile of recent latencies (eg. 95)')
+    parser.add_argument('--notifications', action='store_true', help='Receive completion notifications from the API on an embedded HTTP listener, polling only as a slow fallback')
+    parser.add_argument('--callback_host', type=str, default="127.0.0.1", help='Address the notification listener binds to')
+    parser.add_argument('--callback_port', type=int, default=0, help='Port of the notification listener, any free port by default')
+    parser.add_argument('--callback_public_url', type=str, default=None, help='Url the API should send notifications to, if the listener is not reachable at --callback_host:--callback_port')
+    parser.add_argument('--shard_index', type=int, default=0, help='Run only the jobs of this shard, from 0 to --shard_count - 1')
+    parser.add_argument('--shard_count', type=int, default=1, help='Number of shards the input file is split into, eg. one per machine. Combine the results with `syncai merge`')
+    if client == "animation":
+        parser.add_argument('--archive_file', type=str, default=None, help='Append csv outputs to a memory-mapped curve archive at this path (creating <path>.crvdata and <path>.crvindex) instead of writing one file per job')
+
+
+def add_daemon_arguments(parser):
+    add_client_arguments(parser)
+    parser.add_argument('--socket', type=str, default=None, help='Unix socket to listen on (default: syncai-daemon.sock in $XDG_RUNTIME_DIR or ~/.syncai)')
+    parser.add_argument('--port', type=int, default=None, help='Listen on this local TCP port instead of a Unix socket')
+    parser.add_argument('--host', type=str, default="127.0.0.1", help='Address to listen on with --port')
+    parser.add_argument('--token_file', type=str, default=None, help='File the daemon writes its access token to (default: syncai-daemon.token next to the default socket)')
+    parser.add_argument('--root', type=str, default=".", help='Directory the output_file and audio_file of jobs must be inside')
+    parser.add_argument('--concurrency', type=int, default=8, help='Maximum number of jobs generated and downloaded at once, across all producers')
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="syncai", description="Client of the Emotech Sync-AI API.")
+    clients = parser.add_subparsers(dest="client", required=True)
+    for client, description in (("video", "Video generation"), ("animation", "Animation curve generation")):
+        client_parser = clients.add_parser(client, help=description)
+        commands = client_parser.add_subparsers(dest="command", required=True)
+
+        command = commands.add_parser("single", help="Generate and download a single job")
+        add_single_arguments(command, client)
+        command.set_defaults(run=single)
+
+        command = commands.add_parser("batch", help="Generate and download every job of an input file")
+        add_batch_arguments(command, client)
+        command.set_defaults(run=batch)
+
+        command = commands.add_parser("validate", help="Check the jobs of an input file without sending them")
+        command.add_argument('--input_file', type=str, required=True, help='Path to json file containing inputs and job specifications, or a .jsonl file with one job per line')
+        command.set_defaults(run=validate)
+
+        command = commands.add_parser("daemon", help="Run jobs submitted by other processes through one client, see daemon_client.py")
+        add_daemon_arguments(command)
+        command.set_defaults(run=daemon)
+
+    command = clients.add_parser("merge", help="Merge the results of the shards of a batch")
+    command.add_argument('--input_file', type=str, required=True, help='The input file given to each shard of the batch')
+    command.add_argument('--shard_count', type=int, required=True, help='The --shard_count the shards were run with')
+    command.add_argument('--partial', action='store_true', help='Merge the shards that have finished even if others have not, their jobs are reported missing')
+    command.set_defaults(run=merge)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,513 @@
+import functools
+import json
+import os
+import time
+from .audio_upload import AudioPreprocessor, MultipartStream
+from .batch_journal import BatchJournal, write_results
+from .batch_shards import check_shard, shard_of, shard_prefix
+from .hedging import DeadlineExceeded, Hedger, as_deadline, call_timeout
+from .job_input import prefetch, read_jobs
+from .job_scheduler import RenderTimeEstimator, schedule_jobs
+from .metrics import ClientMetrics
+from .rate_control import AimdController
+from .result_cache import CACHED_PREFIX, ResultCache, job_key, materialize
+from .status_poller import StatusPoller
+
+
+def get_tts_params(voice=None, speed=None):
+    tts_params =  {
+        "engine": "Google",
+    }
+
+    if voice:
+        tts_params["voice"] = voice
+
+    if speed != 0:
+        tts_params["speed"] = speed
+
+    return tts_params
+
+
+class SyncAiClient():
+    """
+    Core of the video and animation curve clients: job submission, status polling, downloads and batches.
+
+    Subclasses set the output specific parts:
+    - build_job, a static method building the job dictionary sent to the generate endpoint from generate() arguments
+    - generate(), which builds the job and sends it with submit()
+    - default_url, default_output_type (used for render time estimates) and valid_fields of batch input samples
+    - fixed_fields, fields every batch input sample is given regardless of its content
+
+    requests is imported when a client is created and tqdm when a batch runs, so importing a client module to
+    build or validate jobs stays cheap.
+    """
+
+    default_url = "https://lipsync-ai.api.emotechlab.com/lipsync"
+    default_output_type = "video"
+    valid_fields = []
+    fixed_fields = {}
+    build_job = None
+
+    def __init__(self, token, url=None, pool_size=10, connect_timeout=5.0, read_timeout=30.0, retries=3, min_poll_interval=1.0, max_poll_interval=30.0, max_polls_per_second=None, poll_stats_hook=None, download_chunk_size=1024 * 1024, download_parts=1, cache_dir=None, cache_max_bytes=10 * 1024 ** 3, metrics_listener=None, max_submissions_per_second=None, render_times_file=None, audio_sample_rate=None, audio_workers=None, notifications=None, fallback_poll_interval=60.0, hedge_percentile=None):
+        from .downloader import Downloader
+        from .http_session import PooledSession
+
+        # pool_size, connect_timeout, read_timeout and retries configure the shared keep-alive session, see PooledSession
+        self.url = url or self.default_url
+        self.token = token
+        # per-job latency breakdown, metrics_listener(event, job_id, fields) receives every event
+        self.metrics = ClientMetrics(listeners=[metrics_listener] if metrics_listener else None)
+        # adapts the number of jobs a batch keeps in flight to back-pressure from the API, see AimdController
+        self.controller = AimdController(max_submissions_per_second=max_submissions_per_second, metrics=self.metrics)
+        self.session = PooledSession(pool_size=pool_size, connect_timeout=connect_timeout, read_timeout=read_timeout, retries=retries, controller=self.controller)
+        # optional hedging of slow status, download-URL and file requests at the hedge_percentile latency, see Hedger
+        self.hedger = Hedger(percentile=hedge_percentile, workers=2 * pool_size, metrics=self.metrics) if hedge_percentile else None
+        # per-job time budgets, see hedging.Deadline
+        self.deadlines = {}  # jobId -> Deadline
+        # downloads stream through the same session, see Downloader for resume and parallel ranges
+        self.downloader = Downloader(self.session, chunk_size=download_chunk_size, parallel_parts=download_parts, hedger=self.hedger)
+        # optional content-addressed cache of generated files, see ResultCache
+        self.cache = ResultCache(cache_dir, max_bytes=cache_max_bytes) if cache_dir else None
+        self.job_keys = {}  # jobId -> (job key, submit time) for jobs whose output should be cached
+        # optional conversion of wav audio files to audio_sample_rate mono 16-bit before upload, see AudioPreprocessor
+        self.audio = AudioPreprocessor(sample_rate=audio_sample_rate, workers=audio_workers) if audio_sample_rate else None
+        # render time estimates for batch scheduling, refined from observed render times saved to render_times_file
+        self.estimator = RenderTimeEstimator(render_times_file, default_output_type=self.default_output_type)
+        # optional push notifications of completed jobs, see notifications.py; polling is then a slow fallback for missed notifications
+        self.notifications = notifications
+        if notifications is not None:
+            min_poll_interval = max(min_poll_interval, fallback_poll_interval)
+            max_poll_interval = max(max_poll_interval, fallback_poll_interval)
+        # a single scheduler polls every outstanding job, see StatusPoller for the adaptive intervals
+        self.poller = StatusPoller(self.check_status, min_interval=min_poll_interval, max_interval=max_poll_interval, max_polls_per_second=max_polls_per_second, stats_hook=poll_stats_hook)
+        if notifications is not None:
+            notifications.start(self.notified)
+
+    def pool_stats(self):
+        return self.session.pool_stats()
+
+    def close(self):
+        self.session.close()
+        if self.audio is not None:
+            self.audio.close()
+        if self.notifications is not None:
+            self.notifications.close()
+        if self.hedger is not None:
+            self.hedger.close()
+
+    def notified(self, job_id, status):
+        # called by the notification transport when a job finishes or fails
+        self.metrics.notified(job_id, status["status"])
+        self.poller.notify(job_id, status)
+
+    def hedged(self, endpoint, call, deadline=None):
+        # makes an idempotent call, hedged if the client hedges requests
+        if self.hedger is None:
+            return call()
+        return self.hedger.call(endpoint, call, deadline)
+
+    def check_status(self, job_id):
+        started = time.monotonic()
+        deadline = self.deadlines.get(job_id)
+        url = os.path.join(self.url, f"status?jobId={job_id}&token={self.token}")
+        try:
+            resp = self.hedged("status", lambda: self.session.get(url, **call_timeout(deadline, self.session.timeout)), deadline)
+        except Exception:
+            if deadline is None or not deadline.expired():
+                raise
+            # the poller may be serving other jobs from this thread, so the job fails rather than raising
+            resp = None
+        status = resp.json() if resp is not None else {"status": "failed", "error": "deadline of {}s exceeded".format(deadline.seconds)}
+        self.metrics.status(job_id, status.get("status"), time.monotonic() - started)
+        return status
+
+    def download_content(self, job_id, save_file, deadline=None):
+        # wait for the poller to see a 'finished' status then download the content
+        # file extension of save_file must match the output type of the request
+        # deadline (a Deadline or seconds) defaults to the one passed to generate; once it has passed a 'failed'
+        # status is returned, or DeadlineExceeded is raised if the download had started
+        deadline = self.deadline_of(job_id, deadline)
+        if not job_id.startswith(CACHED_PREFIX):
+            status = self.poller.wait(job_id, deadline=deadline)
+            if status is None:
+                status = {"status": "failed", "error": "deadline of {}s exceeded".format(deadline.seconds)}
+            if status["status"] == "failed":
+                self.forget(job_id)
+                print("Job {} failed with: {}".format(job_id, status))
+                return status
+
+        self.download_finished(job_id, save_file)
+
+        return None
+
+    def deadline_of(self, job_id, deadline=None):
+        # the deadline of job_id, which deadline replaces if given
+        deadline = as_deadline(deadline)
+        if deadline is None:
+            return self.deadlines.get(job_id)
+        self.deadlines[job_id] = deadline
+        return deadline
+
+    def forget(self, job_id):
+        # drops the per-job state of a job that failed
+        self.deadlines.pop(job_id, None)
+        self.job_keys.pop(job_id, None)
+
+    def download_finished(self, job_id, save_file):
+        # download the output of a job that has already reached the 'finished' status
+        if job_id.startswith(CACHED_PREFIX):
+            # generate found the job in the cache, no request is needed
+            if self.cache is None or not self.cache.get(job_id[len(CACHED_PREFIX):], save_file):
+                raise Exception("Cached result for {} was evicted before it could be used".format(job_id))
+            return
+
+        started = time.monotonic()
+        deadline = self.deadlines.pop(job_id, None)
+        cached = self.job_keys.pop(job_id, None)
+        # get file extension from the save_file
+        download_file = job_id + "." + save_file.split(".")[-1]
+        url = os.path.join(self.url, f"download?fileName={download_file}&token={self.token}")
+        resp = self.hedged("download", lambda: self.session.get(url, **call_timeout(deadline, self.session.timeout)), deadline).json()
+
+        if "url" not in resp:
+            raise Exception("Download failed: ", resp)
+
+        size = self.downloader.download(resp["url"], save_file, deadline)
+        self.metrics.downloaded(job_id, size, time.monotonic() - started)
+
+        if cached is not None:
+            key, submitted = cached
+            self.cache.put(key, save_file, generation_seconds=time.monotonic() - submitted)
+
+    def download_output(self, job_id, output_file, key):
+        # download the output of a finished batch job to output_file
+        self.download_finished(job_id, output_file)
+
+    def copy_output(self, output_file, duplicate_file):
+        # give a duplicate batch job the output of the job it duplicates
+        materialize(output_file, duplicate_file, link=False)
+
+    def submit(self, job, audio_file=None, display=False, deadline=None):
+        # Sends a job built by build_job to the generate endpoint, with audio_file as a multipart upload if given.
+        # deadline (a Deadline or seconds) is the time budget of the job, used by download_content as well
+        if self.cache is not None:
+            key = job_key(job, audio_file)
+            if self.cache.lookup(key):
+                response = {"jobId": CACHED_PREFIX + key, "cached": True}
+                if display:
+                    print(response)
+                return response
+
+        if audio_file:
+            upload_file, original_size = self.audio.prepare(audio_file) if self.audio is not None else (audio_file, os.path.getsize(audio_file))
+
+        if self.notifications is not None and self.notifications.callback_url:
+            job["callback_url"] = self.notifications.callback_url
+
+        self.controller.acquire_submission()
+        # a budget given in seconds starts once the controller lets the job through, so throttling is not charged to it
+        deadline = as_deadline(deadline)
+        submitted = time.monotonic()
+        if audio_file:
+            # Send multipart request if audio file is present, streamed from disk
+            fields = [("audio", os.path.basename(audio_file), upload_file), ("job", "job", json.dumps(job, indent=2).encode('utf-8'))]
+            try:
+                with MultipartStream(fields) as body:
+                    resp = self.session.post(
+                        os.path.join(self.url, f"generate?token={self.token}"),
+                        data=body, headers={"Content-Type": body.content_type}, **call_timeout(deadline, self.session.timeout)
+                    )
+                upload_size = os.path.getsize(upload_file)
+            finally:
+                if self.audio is not None:
+                    # the converted file is not needed once it has been sent
+                    self.audio.release(audio_file)
+            upload = {"bytes": upload_size, "bytes_saved": original_size - upload_size, "seconds": time.monotonic() - submitted}
+        else:
+            resp = self.session.post(os.path.join(self.url, f"generate?token={self.token}"), json=job, **call_timeout(deadline, self.session.timeout))
+
+        if not resp:
+            response = {"error": "curl request failed"}
+        else:
+            response = resp.json()
+
+        if "jobId" in response:
+            self.metrics.submitted(response["jobId"], time.monotonic() - submitted)
+            if deadline is not None:
+                self.deadlines[response["jobId"]] = deadline
+        if audio_file:
+            response["upload"] = upload
+            if "jobId" in response:
+                self.metrics.uploaded(response["jobId"], upload["bytes"], upload["bytes_saved"], upload["seconds"])
+        if self.cache is not None and "jobId" in response:
+            self.job_keys[response["jobId"]] = (key, submitted)
+
+        if display:
+            print(response)
+
+        return response
+
+    def generate_and_download_from_file(self, input_file, concurrency=1, resume=False, metrics_file=None, schedule="file", shard_index=0, shard_count=1, job_deadline=None):
+        """
+        input_file should be a json with a "jobs" field containing a list of settings/arguments to use for each sample.
+        Each sample must have "language", "text" and "output_file" fields, plus the fields generate() of the client
+        needs, see the examples in the client's docstring.
+
+        input_file can also be a .jsonl file with one job per line, which is read lazily as the batch runs,
+        so the first job is submitted straight away and memory use does not grow with the size of the batch.
+
+        - Generate method responses are saved in a json file in the save_dir
+        with the same name as the input file with '_results' appended to the end. It is written from the journal
+        (see below) one job at a time, in the order the jobs completed.
+
+        - concurrency sets the maximum number of jobs in flight (submitted but not yet downloaded). The client's
+        AimdController lowers the limit while the API answers with 429/5xx or slows down, and raises it back to
+        concurrency while the API is healthy.
+        New jobs are submitted ahead as soon as a slot frees up, all outstanding jobs are polled
+        by the client's StatusPoller, and finished outputs are downloaded in a worker pool.
+
+        - With schedule="sjf" jobs are submitted shortest estimated render time first instead of in file order,
+        which lowers the mean completion time when concurrency is limited. Jobs may set a "priority" field
+        (higher first) and a "due_by" field (lower first), which take precedence over the estimate. due_by only
+        orders submissions; it is unrelated to job_deadline below.
+
+        - Progress is journaled to a file with the same name as the input file with '_journal.jsonl' appended,
+        one line per job submission, completion, failure and download. With resume=True the journal of an
+        interrupted run is read back: jobs already downloaded are skipped and jobs already submitted are
+        polled and downloaded instead of being generated again.
+
+        - If metrics_file is given, the client's latency metrics are written to it at the end of the batch,
+        in Prometheus text format if it ends with '.prom' and as a json summary otherwise.
+
+        - With shard_count > 1 only the jobs of shard shard_index are run. Jobs are assigned to shards by a hash
+        of the job, so shard_count processes or machines given the same input_file and shard indices 0 to
+        shard_count - 1 split the batch between them without coordination. Each shard writes
+        '_shard<index>of<count>_results.json' and '_shard<index>of<count>_journal.jsonl' files instead of the
+        files above; merge them with batch_shards.merge_results (`syncai merge`) once every shard has finished.
+        A shard has finished once its journal ends with a "completed" event.
+
+        - With job_deadline, each job has that many seconds from its submission to be generated and downloaded.
+        Every request for the job is given the remaining budget as its timeout, and a job that runs out of time
+        is recorded as failed instead of holding up the batch.
+
+        Returns the number of jobs of each outcome in this run, see run_batch.
+
+        ** NOTE **
+        With the default concurrency of 1 this function waits for each job to be generated, then downloaded
+        before sending the next request
+        """
+        check_shard(shard_index, shard_count)
+        jobs = prefetch(read_jobs(input_file))
+
+        # prepare results file
+        prefix = shard_prefix(input_file, shard_index, shard_count)
+        results_file = f"{prefix}_results.json"
+        if not os.path.exists(results_file):
+            open(results_file, 'a').close()
+
+        journal_file = f"{prefix}_journal.jsonl"
+        with BatchJournal(journal_file, resume=resume) as journal:
+            summary = self.run_batch(jobs, concurrency=concurrency, journal=journal, resume=resume, schedule=schedule, shard_index=shard_index, shard_count=shard_count, job_deadline=job_deadline)
+            write_results(results_file, journal.iter_results())
+
+        if metrics_file:
+            self.metrics.export(metrics_file)
+        return summary
+
+    @classmethod
+    def prepare_job(cls, i, args_dictionary):
+        # validate a single input sample and split it into generate() arguments and the output file
+        args_dictionary = dict(args_dictionary)
+        # scheduling fields are only used by schedule_jobs
+        args_dictionary.pop("priority", None)
+        args_dictionary.pop("due_by", None)
+        args_dictionary.update(cls.fixed_fields)
+        required_fields = ["text", "language", "output_file", "target_rig"]
+        for field in required_fields:
+            if field not in args_dictionary:
+                raise Exception("Input sample {} is missing {} field".format(i, field))
+
+        output_file = args_dictionary.pop("output_file")
+
+        for key in args_dictionary.keys():
+            if key not in cls.valid_fields:
+                raise Exception("Input sample {} has invalid field: {}".format(i, key))
+
+        return args_dictionary, output_file
+
+    def run_batch(self, jobs, concurrency=1, journal=None, resume=False, schedule="file", shard_index=0, shard_count=1, job_deadline=None):
+        # Submits jobs ahead while fewer than `concurrency` are in flight, polls outstanding jobs
+        # through the poller and hands finished jobs to a pool of download workers.
+        # Identical jobs are only submitted once and the output is copied to each of their output files, whether the
+        # first of them is still in flight or already downloaded.
+        # Every step is recorded in journal (a BatchJournal, kept in memory if not given). With resume=True
+        # jobs the journal records as downloaded are skipped and submitted jobs are polled again instead of regenerated.
+        # schedule is "file" to submit jobs in order or "sjf" to reorder them with schedule_jobs.
+        # With shard_count > 1 only jobs whose key falls in shard shard_index are run, see batch_shards.shard_of.
+        # With job_deadline each job gets that many seconds from its submission to be generated and downloaded.
+        # Returns the number of jobs of each outcome in this run, eg. {"submitted": 9, "duplicate": 1, "downloaded": 9, "failed": 1};
+        # the generate response of each job is in the journal, see BatchJournal.iter_results.
+        from concurrent.futures import ThreadPoolExecutor
+        import requests
+        from tqdm import tqdm
+
+        if concurrency < 1:
+            raise Exception("concurrency must be at least 1")
+        if journal is None:
+            journal = BatchJournal()
+
+        done, submitted = journal.resume_state() if resume else (set(), {})
+
+        responses = {}  # index -> generate response, for jobs in flight only
+        pending = {}    # jobId -> (index, output_file, job key) for jobs that are rendering
+        downloads = {}  # download future -> (index, jobId, output_file, job key)
+        leaders = {}    # job key -> index of the job in flight for it
+        followers = {}  # index of a job in flight -> [(index, output_file)] of duplicates waiting for it
+        outputs = {}    # job key -> (index, output_file, generate response) of a downloaded job, copied for later duplicates
+        samples = enumerate(jobs)
+        if schedule == "sjf":
+            samples = schedule_jobs(list(samples) if isinstance(jobs, list) else samples, self.estimator)
+        elif schedule != "file":
+            raise Exception("Unknown schedule: {}".format(schedule))
+        if self.audio is not None:
+            # convert the audio of upcoming jobs while earlier ones are uploaded
+            samples = self.audio.ahead(samples)
+        exhausted = False
+
+        def complete(i, key, output_file, status=None):
+            # records the outcome of job i and of every duplicate of it
+            del leaders[key]
+            response = responses.pop(i)
+            if status is None:
+                outputs[key] = (i, output_file, response)
+            for j, duplicate_file in followers.pop(i, []) + [(i, output_file)]:
+                if status is None:
+                    if j != i:
+                        self.copy_output(output_file, duplicate_file)
+                    journal.record("downloaded", j)
+                elif status["status"] == "download_failed":
+                    journal.record("download_failed", j, error=status["error"])
+                else:
+                    journal.record("failed", j, status=status)
+                progress.update(1)
+
+        def start_download(i, job_id, output_file, key):
+            future = pool.submit(self.download_output, job_id, output_file, key)
+            # a finished download ends the sleep at the bottom of the loop
+            future.add_done_callback(self.poller.wake)
+            downloads[future] = (i, job_id, output_file, key)
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool, tqdm(total=len(jobs) if isinstance(jobs, list) else None) as progress:
+            while True:
+                # fill free slots with new submissions
+                # the controller may hold the number of jobs in flight below concurrency while the API pushes back
+                while not exhausted and len(pending) + len(downloads) < self.controller.window(concurrency):
+                    try:
+                        i, args_dictionary = next(samples)
+                    except StopIteration:
+                        exhausted = True
+                        break
+
+                    if i in done:
+                        progress.update(1)
+                        continue
+
+                    kwargs, output_file = self.prepare_job(i, args_dictionary)
+                    if shard_count > 1 and shard_of(job_key(self.build_job(**kwargs)), shard_count) != shard_index:
+                        # another shard runs this job
+                        progress.update(1)
+                        continue
+                    key = job_key(self.build_job(**kwargs), kwargs.get("audio_file"))
+                    if key in outputs:
+                        # same job as one already downloaded, copy its output
+                        of, original_file, response = outputs[key]
+                        try:
+                            self.copy_output(original_file, output_file)
+                        except OSError as e:
+                            # the earlier output was moved or removed, generate the job again
+                            print("Could not copy {} for input sample {} ({}), generating it".format(original_file, i, e))
+                            del outputs[key]
+                        else:
+                            journal.record("duplicate", i, of=of, response=response)
+                            journal.record("downloaded", i)
+                            progress.update(1)
+                            continue
+                    if key in leaders:
+                        # same job as one already in flight, wait for its output instead of submitting it again
+                        journal.record("duplicate", i, of=leaders[key], response=responses[leaders[key]])
+                        followers[leaders[key]].append((i, output_file))
+                        continue
+
+                    observe = None
+                    if i in submitted:
+                        # submitted by a previous run, re-attach to it
+                        job_id, response = submitted.pop(i)
+                    else:
+                        try:
+                            response = self.generate(**kwargs, deadline=job_deadline)
+                        except (requests.RequestException, DeadlineExceeded, OSError) as e:
+                            # a timeout, a connection error after the retries, or an audio file that cannot be read
+                            # fails this job only
+                            response = {"error": str(e)}
+                        if "jobId" not in response:
+                            print("Generate request {} failed: {}".format(i, response))
+                            journal.record("generate_failed", i, response=response)
+                            progress.update(1)
+                            continue
+                        job_id = response["jobId"]
+                        journal.record("submitted", i, jobId=job_id, response=response)
+                        # the render time is measured by the poller from the generate response to the status
+                        # that showed the job finished, so throttling, uploads and late polls are not counted
+                        observe = functools.partial(self.estimator.observe, kwargs)
+
+                    responses[i] = response
+                    leaders[key] = i
+                    followers[i] = []
+                    if job_id.startswith(CACHED_PREFIX):
+                        start_download(i, job_id, output_file, key)
+                    else:
+                        pending[job_id] = (i, output_file, key)
+                        self.poller.add(job_id, self.estimator.estimate(kwargs, observed_only=True), observe=observe)
+
+                if exhausted and not pending and not downloads:
+                    break
+
+                # poll the outstanding jobs that are due
+                changed = False
+                for job_id, status in self.poller.poll_due():
+                    if job_id not in pending:
+                        # tracked by a concurrent download_content call, hand it back to the poller
+                        self.poller.hand_back(job_id, status)
+                    elif status["status"] == "finished":
+                        i, output_file, key = pending.pop(job_id)
+                        journal.record("finished", i, jobId=job_id)
+                        start_download(i, job_id, output_file, key)
+                        changed = True
+                    elif status["status"] == "failed":
+                        i, output_file, key = pending.pop(job_id)
+                        self.forget(job_id)
+                        print("Job {} failed with: {}".format(job_id, status))
+                        # if content generation fails, save the status to the results
+                        complete(i, key, output_file, status)
+                        changed = True
+
+                # collect completed downloads
+                for future in [f for f in downloads if f.done()]:
+                    i, job_id, output_file, key = downloads.pop(future)
+                    error = future.exception()
+                    if error is not None:
+                        print("Download of job {} failed with: {}".format(job_id, error))
+                        complete(i, key, output_file, {"status": "download_failed", "error": str(error)})
+                    else:
+                        complete(i, key, output_file)
+                    changed = True
+
+                if not changed:
+                    delay = self.poller.next_delay()
+                    if downloads or delay:
+                        # wake early if a download finishes or a notification arrives before the next poll is due
+                        self.poller.sleep(delay)
+
+        self.estimator.save()
+        journal.record("completed", None)
+        return dict(journal.counts)
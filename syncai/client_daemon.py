@@ -0,0 +1,286 @@
+import collections
+import hmac
+import json
+import os
+import secrets
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import ThreadingMixIn, UnixStreamServer
+from urllib.parse import parse_qs, urlparse
+from .daemon_client import default_socket_path, default_token_file
+from .result_cache import job_key, materialize
+
+
+# fields of a job record returned to callers
+PUBLIC_FIELDS = ("id", "state", "output_file", "duplicate_of", "jobId", "response", "status", "error")
+TERMINAL_STATES = ("finished", "failed")
+# job fields naming local files, which must be inside the daemon's root directory
+PATH_FIELDS = ("output_file", "audio_file")
+
+
+class ClientDaemon():
+    """
+    Runs the jobs of many producer processes through one client, so they share its keep-alive connections,
+    its single StatusPoller loop and its rate control instead of each polling the API on its own.
+
+    Jobs are the same dictionaries as the entries of a batch input file. submit() validates a job and queues it;
+    up to `concurrency` jobs are generated and downloaded at once. A job identical to one that is queued or
+    running (same job_key) is not sent to the API again: it waits for that job and its output is copied to
+    its own output_file. Submitting the same job with the same output_file again returns the existing record.
+
+    get(id, wait) returns the record of a job, waiting up to `wait` seconds for it to finish or fail.
+    The records of the last max_finished finished or failed jobs are kept.
+
+    The daemon reads and writes files on behalf of whoever can reach it, so the output_file and audio_file of
+    a job must be inside `root` (the working directory by default); relative paths are taken from root.
+
+    serve() exposes the daemon over HTTP on a Unix socket, only accessible to the user, or on a local TCP port,
+    see DaemonHandler and daemon_client.py. Every request must carry `token` (a random one by default), which
+    serve() writes to a token file only the user can read.
+    """
+
+    def __init__(self, client, concurrency=8, max_finished=10000, root=None, token=None):
+        self.client = client
+        self.concurrency = concurrency
+        self.max_finished = max_finished
+        self.root = os.path.realpath(root or os.getcwd())
+        self.token = token or secrets.token_urlsafe(32)
+        self.pool = ThreadPoolExecutor(max_workers=concurrency)
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+        self.records = {}   # id -> job record
+        self.leaders = {}   # job key -> id of the queued or running job for it
+        self.finished = collections.deque()  # ids of finished or failed jobs, oldest first
+        self.counts = collections.Counter()
+        self.servers = []
+        self.token_files = []
+
+    def confine(self, job):
+        # Returns job with its file paths resolved inside root, raising if one of them points outside it.
+        job = dict(job)
+        for field in PATH_FIELDS:
+            if not job.get(field):
+                continue
+            path = os.path.realpath(os.path.join(self.root, job[field]))
+            if os.path.commonpath([self.root, path]) != self.root:
+                raise Exception("{} {} is outside the daemon's root directory {}".format(field, job[field], self.root))
+            job[field] = path
+        return job
+
+    def submit(self, job):
+        job = self.confine(job)
+        kwargs, output_file = self.client.prepare_job(len(self.records), job)
+        key = job_key(self.client.build_job(**kwargs), kwargs.get("audio_file"))
+        with self.lock:
+            self.counts["submitted"] += 1
+            leader = self.records.get(self.leaders.get(key))
+            if leader is not None and os.path.abspath(leader["output_file"]) == os.path.abspath(output_file):
+                self.counts["resubmitted"] += 1
+                return self.public(leader)
+
+            record = {"id": uuid.uuid4().hex, "state": "queued", "output_file": output_file, "key": key, "followers": []}
+            self.records[record["id"]] = record
+            if leader is not None:
+                # same job as one already queued or running, wait for its output instead of submitting it again
+                self.counts["deduplicated"] += 1
+                record["duplicate_of"] = leader["id"]
+                leader["followers"].append(record["id"])
+            else:
+                self.leaders[key] = record["id"]
+                self.pool.submit(self.run, record, kwargs)
+            return self.public(record)
+
+    def run(self, record, kwargs):
+        status = None
+        try:
+            response = self.client.generate(**kwargs)
+            with self.lock:
+                record["response"] = response
+                if "jobId" in response:
+                    record["jobId"] = response["jobId"]
+                    record["state"] = "running"
+            if "jobId" not in response:
+                status = {"status": "failed", "error": "generate request failed", "response": response}
+            else:
+                status = self.client.download_content(response["jobId"], record["output_file"])
+        except Exception as e:
+            status = {"status": "failed", "error": str(e)}
+        self.complete(record, status)
+
+    def complete(self, record, status):
+        with self.lock:
+            del self.leaders[record["key"]]
+            for follower in [self.records[i] for i in record["followers"]] + [record]:
+                error = None
+                if status is None and follower is not record:
+                    try:
+                        materialize(record["output_file"], follower["output_file"], link=False)
+                    except OSError as e:
+                        error = {"status": "failed", "error": str(e)}
+                self.finish(follower, error or status)
+            self.changed.notify_all()
+
+    def finish(self, record, status):
+        record["state"] = "finished" if status is None else "failed"
+        if status is not None:
+            record["status"] = status
+        self.counts[record["state"]] += 1
+        self.finished.append(record["id"])
+        while len(self.finished) > self.max_finished:
+            self.records.pop(self.finished.popleft(), None)
+
+    def get(self, id, wait=None):
+        # Returns the record of job id, or None if it is unknown. With wait, blocks up to wait seconds for it to complete.
+        with self.lock:
+            record = self.records.get(id)
+            if record is not None and wait:
+                self.changed.wait_for(lambda: record["state"] in TERMINAL_STATES, timeout=wait)
+            return self.public(record) if record is not None else None
+
+    def public(self, record):
+        return {field: record[field] for field in PUBLIC_FIELDS if field in record}
+
+    def stats(self):
+        with self.lock:
+            states = collections.Counter(record["state"] for record in self.records.values())
+            stats = {**self.counts, "queued": states["queued"], "running": states["running"]}
+        return {"jobs": stats, "poller": self.client.poller.stats(), "pool": self.client.pool_stats()}
+
+    def serve(self, host="127.0.0.1", port=None, socket_path=None, token_file=None):
+        # Serves the HTTP API in a background thread, on host:port if a port is given and on a Unix socket at
+        # socket_path (default_socket_path() by default) otherwise. The socket is only accessible to the user.
+        # The token is written to token_file (default_token_file() by default), readable only by the user.
+        write_private(token_file or default_token_file(), self.token)
+        self.token_files.append(token_file or default_token_file())
+        if port is None:
+            socket_path = socket_path or default_socket_path()
+            make_private_dir(os.path.dirname(os.path.abspath(socket_path)))
+            if os.path.exists(socket_path):
+                # left behind by a daemon that was not shut down cleanly
+                os.remove(socket_path)
+            # the socket is created without group or other permissions rather than restricted after the fact
+            umask = os.umask(0o177)
+            try:
+                # TCP_NODELAY does not apply to Unix sockets
+                server = ThreadingUnixHTTPServer(socket_path, type("Handler", (DaemonHandler,), {"daemon": self, "disable_nagle_algorithm": False}))
+            finally:
+                os.umask(umask)
+        else:
+            server = ThreadingHTTPServer((host, port), type("Handler", (DaemonHandler,), {"daemon": self}))
+            server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.servers.append(server)
+        return server
+
+    def close(self):
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+            if isinstance(server, UnixStreamServer) and os.path.exists(server.server_address):
+                os.remove(server.server_address)
+        self.servers = []
+        for token_file in self.token_files:
+            if os.path.exists(token_file):
+                os.remove(token_file)
+        self.token_files = []
+        self.pool.shutdown(wait=True)
+        self.client.close()
+
+
+def make_private_dir(path):
+    # creates path, readable by the user only, if it does not exist
+    if not os.path.isdir(path):
+        os.makedirs(path, mode=0o700, exist_ok=True)
+
+
+def write_private(path, text):
+    # writes text to path with permissions for the user only, whatever the permissions of an existing file
+    make_private_dir(os.path.dirname(os.path.abspath(path)))
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as fp:
+        os.fchmod(fd, 0o600)
+        fp.write(text)
+
+
+class ThreadingUnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+
+class DaemonHandler(BaseHTTPRequestHandler):
+    """
+    HTTP API of a ClientDaemon:
+    - POST /jobs with a job as the json body queues it and returns its record.
+    - GET /jobs/<id>?wait=<seconds> returns the record of a job, waiting up to `wait` seconds for it to complete.
+    - GET /stats returns job counts, poller and connection pool statistics.
+
+    Every request must send the daemon's token as `Authorization: Bearer <token>` (401 otherwise). Requests
+    with an Origin header come from a web page and are refused (403), and POST bodies must be sent as
+    application/json (415), which a page cannot do without a CORS preflight the daemon never answers.
+    """
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    daemon = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, code, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def refused(self):
+        # Answers a request that is not allowed and returns True, or returns False. The body of a refused request
+        # is not read, so the connection is closed after the answer.
+        if self.headers.get("Origin") is not None:
+            self.close_connection = True
+            self.send_json(403, {"error": "requests from web pages are not accepted"})
+            return True
+        scheme, _, token = (self.headers.get("Authorization") or "").partition(" ")
+        if scheme.lower() != "bearer" or not hmac.compare_digest(token.strip().encode("utf-8"), self.daemon.token.encode("utf-8")):
+            self.close_connection = True
+            self.send_json(401, {"error": "missing or wrong token"})
+            return True
+        return False
+
+    def do_POST(self):
+        if self.refused():
+            return
+        if self.headers.get_content_type() != "application/json":
+            self.close_connection = True
+            return self.send_json(415, {"error": "jobs must be sent as application/json"})
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if urlparse(self.path).path != "/jobs":
+            return self.send_json(404, {"error": "not found"})
+        try:
+            job = json.loads(body)
+            if not isinstance(job, dict):
+                raise Exception("A job must be a json object")
+            record = self.daemon.submit(job)
+        except Exception as e:
+            return self.send_json(400, {"error": str(e)})
+        self.send_json(200, record)
+
+    def do_GET(self):
+        if self.refused():
+            return
+        url = urlparse(self.path)
+        if url.path == "/stats":
+            return self.send_json(200, self.daemon.stats())
+        if url.path.startswith("/jobs/"):
+            try:
+                wait = float(parse_qs(url.query).get("wait", ["0"])[0])
+                if not 0 <= wait < float("inf"):
+                    raise ValueError(wait)
+            except ValueError:
+                return self.send_json(400, {"error": "wait must be a number of seconds"})
+            record = self.daemon.get(url.path[len("/jobs/"):], wait=wait)
+            if record is None:
+                return self.send_json(404, {"error": "unknown job"})
+            return self.send_json(200, record)
+        self.send_json(404, {"error": "not found"})
@@ -0,0 +1,149 @@
+import mmap
+import os
+import sqlite3
+import threading
+from .animation_curves import ALIGNMENT, AnimationCurves
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS clips (
+    id INTEGER PRIMARY KEY,
+    job_id TEXT,
+    job_hash TEXT,
+    name TEXT,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    frames INTEGER NOT NULL,
+    channels INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS clips_job_id ON clips (job_id);
+CREATE INDEX IF NOT EXISTS clips_job_hash ON clips (job_hash);
+CREATE INDEX IF NOT EXISTS clips_name ON clips (name);
+"""
+
+
+def archive_paths(path):
+    # data and index files of the archive at path
+    return path + ".crvdata", path + ".crvindex"
+
+
+def connect(index_file):
+    connection = sqlite3.connect(index_file, timeout=60, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.executescript(SCHEMA)
+    return connection
+
+
+class CurveArchiveWriter():
+    """
+    Appends animation curves to an archive of many clips.
+
+    The archive is a data file of clips in the AnimationCurves binary format, each starting on a 64 byte
+    boundary, plus a sqlite index mapping jobId, job hash and output name to the clip's offset. A clip's
+    bytes are flushed before its index row is committed, so readers never see a clip that is not fully written.
+    Writers take the sqlite write lock while appending, so several processes can write to one archive.
+    """
+
+    def __init__(self, path):
+        self.data_file, self.index_file = archive_paths(path)
+        self.lock = threading.Lock()
+        self.data = open(self.data_file, "ab")
+        self.index = connect(self.index_file)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.data.close()
+        self.index.close()
+
+    def add(self, curves, job_id=None, job_hash=None, name=None):
+        # Appends curves and returns the id of the clip.
+        record = curves.to_bytes()
+        with self.lock:
+            self.index.execute("BEGIN IMMEDIATE")
+            try:
+                offset = os.fstat(self.data.fileno()).st_size
+                padding = -offset % ALIGNMENT
+                self.data.write(b"\0" * padding + record)
+                self.data.flush()
+                os.fsync(self.data.fileno())
+                cursor = self.index.execute(
+                    "INSERT INTO clips (job_id, job_hash, name, offset, length, frames, channels) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, job_hash, name, offset + padding, len(record), len(curves), len(curves.channels)),
+                )
+                self.index.execute("COMMIT")
+            except BaseException:
+                self.index.execute("ROLLBACK")
+                raise
+            return cursor.lastrowid
+
+    def add_csv(self, csv_file, job_id=None, job_hash=None, name=None, fps=60):
+        return self.add(AnimationCurves.from_csv(csv_file, fps), job_id=job_id, job_hash=job_hash, name=name)
+
+    def link(self, clip_id, job_id=None, job_hash=None, name=None):
+        # Adds another index entry for an existing clip, eg. for a duplicate job with a different output name.
+        with self.lock:
+            with self.index:
+                self.index.execute(
+                    "INSERT INTO clips (job_id, job_hash, name, offset, length, frames, channels) "
+                    "SELECT ?, ?, ?, offset, length, frames, channels FROM clips WHERE id = ?",
+                    (job_id, job_hash, name, clip_id),
+                )
+
+    def find(self, name):
+        # id of the clip stored under an output name
+        with self.lock:
+            row = self.index.execute("SELECT id FROM clips WHERE name = ? ORDER BY id DESC LIMIT 1", (name,)).fetchone()
+        return row[0] if row else None
+
+
+class CurveArchive():
+    """
+    Read access to an archive written by CurveArchiveWriter.
+
+    The data file is memory-mapped, so get() returns AnimationCurves whose arrays are views of the mapping:
+    any clip is read without touching the others. The mapping is extended when clips appended after it was
+    made are requested. Any number of processes can read while one writes.
+    """
+
+    def __init__(self, path):
+        self.data_file, self.index_file = archive_paths(path)
+        self.index = sqlite3.connect(f"file:{self.index_file}?mode=ro", uri=True, timeout=60, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.buffer = None
+        self.mapped = 0
+
+    def close(self):
+        self.index.close()
+
+    def __len__(self):
+        return self.index.execute("SELECT COUNT(*) FROM clips").fetchone()[0]
+
+    def names(self):
+        return [row[0] for row in self.index.execute("SELECT name FROM clips WHERE name IS NOT NULL ORDER BY id")]
+
+    def get(self, job_id=None, job_hash=None, name=None):
+        # Returns the curves stored under the given jobId, job hash or output name, or None.
+        for column, value in (("job_id", job_id), ("job_hash", job_hash), ("name", name)):
+            if value is not None:
+                row = self.index.execute(f"SELECT offset, length FROM clips WHERE {column} = ? ORDER BY id DESC LIMIT 1", (value,)).fetchone()
+                break
+        else:
+            raise Exception("One of job_id, job_hash or name must be given")
+        if row is None:
+            return None
+
+        offset, length = row
+        return AnimationCurves.from_buffer(self.mapping(offset + length), offset)
+
+    def mapping(self, size):
+        with self.lock:
+            if self.buffer is None or self.mapped < size:
+                with open(self.data_file, "rb") as fp:
+                    self.buffer = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+                self.mapped = len(self.buffer)
+            return self.buffer
@@ -0,0 +1,205 @@
+import csv
+import re
+
+
+SENTENCE_END = re.compile(r"(?<=[.!?。！？])\s+")
+TAG = re.compile(r"<[^>]+>")
+
+
+def split_text(text, max_segment_chars=300):
+    """
+    Splits text into segments of whole sentences of up to about max_segment_chars characters each.
+
+    SSML (text containing <speak>) is only split at sentence ends and <break> tags outside any other
+    element, so tags such as <emo:express-as> are never cut in half, and each segment is wrapped in its own <speak>.
+    A <break> with no text of its own since the last sentence end stays with that sentence, so every segment has
+    something to say.
+    """
+    if "<speak>" not in text:
+        sentences = [sentence for sentence in SENTENCE_END.split(text.strip()) if sentence]
+        return group(sentences, max_segment_chars, " ")
+
+    body = text.strip()
+    body = re.sub(r"^\s*<speak>", "", body)
+    body = re.sub(r"</speak>\s*$|<\\speak>\s*$", "", body)
+
+    sentences = []
+    current = ""
+    depth = 0
+    position = 0
+    for match in TAG.finditer(body):
+        current, depth = split_plain(body[position:match.start()], current, depth, sentences)
+        tag = match.group(0)
+        current += tag
+        if tag.startswith("</"):
+            depth -= 1
+        elif tag.endswith("/>"):
+            if depth == 0 and tag.startswith("<break"):
+                # a top-level pause is a natural seam, keep it at the end of the segment
+                if spoken(current):
+                    sentences.append(current)
+                    current = ""
+                elif sentences:
+                    # the sentence before the pause has already been closed, the pause belongs to it
+                    sentences[-1] += current
+                    current = ""
+        else:
+            depth += 1
+        position = match.end()
+    current, depth = split_plain(body[position:], current, depth, sentences)
+    if spoken(current) or (current.strip() and not sentences):
+        sentences.append(current)
+    elif sentences:
+        sentences[-1] += current
+
+    return ["<speak>" + segment.strip() + "</speak>" for segment in group(sentences, max_segment_chars, "")]
+
+
+def split_plain(text, current, depth, sentences):
+    # adds text outside tags to current, closing a sentence at each sentence end when outside any element
+    if depth > 0:
+        return current + text, depth
+    parts = SENTENCE_END.split(text)
+    for part in parts[:-1]:
+        sentences.append(current + part + " ")
+        current = ""
+    return current + parts[-1], depth
+
+
+def spoken(text):
+    # whether text has anything to say besides tags
+    return bool(TAG.sub("", text).strip())
+
+
+def group(sentences, max_segment_chars, separator):
+    # a segment with nothing to say would be submitted as a job with empty text, so tags on their own are
+    # kept with the segment before them
+    segments = []
+    current = ""
+    for sentence in sentences:
+        if spoken(current) and spoken(sentence) and len(TAG.sub("", current + sentence)) > max_segment_chars:
+            segments.append(current)
+            current = ""
+        current = current + separator + sentence if current and separator else current + sentence
+    if spoken(current) or not segments:
+        if current.strip():
+            segments.append(current)
+    else:
+        segments[-1] += current
+    return segments
+
+
+def parse_timecode(value, fps):
+    # "HH:MM:SS:FF" or "HH:MM:SS:FF.sub" -> frames
+    hours, minutes, seconds, frames = value.split(":")
+    return ((int(hours) * 60 + int(minutes)) * 60 + int(seconds)) * fps + float(frames)
+
+
+def format_timecode(frames, fps, template):
+    whole = int(frames)
+    sub = frames - whole
+    hours, rest = divmod(whole, 3600 * fps)
+    minutes, rest = divmod(rest, 60 * fps)
+    seconds, frame = divmod(rest, fps)
+    value = f"{hours:02d}:{minutes:02d}:{seconds:02d}:{frame:02d}"
+    if "." in template:
+        decimals = len(template.rsplit(".", 1)[1])
+        value += f"{sub:.{decimals}f}"[1:]
+    return value
+
+
+class TimeColumn():
+    # Reads and writes the time column of a curve csv as a number of frames or seconds.
+
+    def __init__(self, header, fps):
+        self.fps = fps
+        self.index = None
+        self.kind = None
+        for i, name in enumerate(header):
+            lowered = name.strip().lower()
+            if lowered in ("timecode", "time code"):
+                self.index, self.kind = i, "timecode"
+            elif lowered in ("time", "timestamp", "seconds", "time_s"):
+                self.index, self.kind = i, "seconds"
+            elif lowered in ("frame", "frames", "frame_number"):
+                self.index, self.kind = i, "frame"
+            if self.index is not None:
+                break
+
+    def read(self, row):
+        value = row[self.index]
+        if self.kind == "timecode":
+            return parse_timecode(value, self.fps)
+        return float(value)
+
+    def write(self, row, value, template):
+        if self.kind == "timecode":
+            row[self.index] = format_timecode(value, self.fps, template)
+        elif self.kind == "frame" and "." not in template:
+            row[self.index] = str(int(round(value)))
+        else:
+            row[self.index] = repr(round(value, 6))
+
+
+def read_curve(path):
+    with open(path, "r", newline="") as fp:
+        rows = list(csv.reader(fp))
+    return rows[0], [row for row in rows[1:] if row]
+
+
+def merge_curves(segment_files, output_file, fps=60, blend_frames=3):
+    """
+    Concatenates the curve csv files of consecutive segments into output_file.
+
+    The time column (Timecode, time in seconds or frame number) of each segment is offset to start one frame
+    after the previous segment ends. Numeric curve values of the first blend_frames rows of each segment are
+    blended from the last row of the previous segment, so blendshapes do not jump at the seams.
+    """
+    header = None
+    merged = []
+    for path in segment_files:
+        segment_header, rows = read_curve(path)
+        if header is None:
+            header = segment_header
+            time_column = TimeColumn(header, fps)
+        elif segment_header != header:
+            raise Exception("Curve file {} has different columns from the first segment".format(path))
+        if not rows:
+            continue
+
+        if merged and time_column.index is not None:
+            # offset by the end of the previous segment plus one step
+            start = time_column.read(rows[0])
+            step = frame_step(rows, time_column) or frame_step(merged[-3:], time_column) or 1.0
+            offset = time_column.read(merged[-1]) + step - start
+            for row in rows:
+                time_column.write(row, time_column.read(row) + offset, row[time_column.index])
+
+        if merged and blend_frames:
+            previous = merged[-1]
+            for k, row in enumerate(rows[:blend_frames]):
+                weight = (k + 1) / (blend_frames + 1)
+                for j, value in enumerate(row):
+                    if j == time_column.index:
+                        continue
+                    try:
+                        blended = float(previous[j]) * (1 - weight) + float(value) * weight
+                    except ValueError:
+                        continue
+                    row[j] = repr(round(blended, 6)) if "." in value or "." in previous[j] else str(int(round(blended)))
+
+        merged.extend(rows)
+
+    with open(output_file, "w", newline="") as fp:
+        writer = csv.writer(fp)
+        writer.writerow(header or [])
+        writer.writerows(merged)
+
+
+def frame_step(rows, time_column):
+    # median spacing of the time column
+    if time_column.index is None or len(rows) < 2:
+        return None
+    times = [time_column.read(row) for row in rows]
+    steps = sorted(b - a for a, b in zip(times, times[1:]))
+    return steps[len(steps) // 2] or None
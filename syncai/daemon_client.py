@@ -0,0 +1,126 @@
+import http.client
+import json
+import os
+import socket
+import time
+from urllib.parse import urlparse
+
+
+def runtime_dir():
+    # Per-user directory of the default daemon socket and token file, only accessible to the user.
+    return os.environ.get("XDG_RUNTIME_DIR") or os.path.join(os.path.expanduser("~"), ".syncai")
+
+
+def default_socket_path():
+    return os.path.join(runtime_dir(), "syncai-daemon.sock")
+
+
+def default_token_file():
+    return os.path.join(runtime_dir(), "syncai-daemon.token")
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+
+    def __init__(self, socket_path, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class DaemonClient():
+    """
+    Submits jobs to a ClientDaemon (client_daemon.py, started with `syncai video daemon` or `syncai animation daemon`)
+    over its local HTTP API.
+
+    Only the standard library is imported, so short-lived processes start quickly. Jobs are the same
+    dictionaries as the entries of a batch input file and are passed as keyword arguments, eg.
+    DaemonClient().generate_and_download(text="Hello", language="en-US", actor="caprica", camera=0, output_file="hello.mp4")
+    or, for a daemon running the animation client,
+    DaemonClient().generate_and_download(text="Hello", language="en-US", target_rig="metahumans", actor="female", output_file="hello.csv")
+
+    By default it connects to the daemon's default Unix socket (default_socket_path()). Pass socket_path for a
+    daemon listening on another socket, or url for one listening on a TCP port. Every request carries the
+    daemon's token, read from token_file (default_token_file() by default) unless given as token.
+    A DaemonClient keeps one connection open and should not be shared between threads.
+    """
+
+    def __init__(self, url=None, socket_path=None, token=None, token_file=None, timeout=60.0):
+        self.url = urlparse(url) if url else None
+        self.socket_path = socket_path or (default_socket_path() if url is None else None)
+        self.token = token
+        self.token_file = token_file or default_token_file()
+        self.timeout = timeout
+        self.connection = None
+
+    def connect(self, timeout):
+        if self.socket_path:
+            return UnixHTTPConnection(self.socket_path, timeout=timeout)
+        return http.client.HTTPConnection(self.url.hostname, self.url.port or 80, timeout=timeout)
+
+    def request(self, method, path, body=None, timeout=None):
+        if self.token is None:
+            with open(self.token_file) as fp:
+                self.token = fp.read().strip()
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        headers = {"Authorization": "Bearer " + self.token}
+        if data is not None:
+            headers["Content-Type"] = "application/json"
+        for attempt in range(2):
+            if self.connection is None:
+                self.connection = self.connect(self.timeout)
+            # long polls may take longer than the default timeout
+            self.connection.timeout = timeout or self.timeout
+            if self.connection.sock is not None:
+                self.connection.sock.settimeout(self.connection.timeout)
+            try:
+                self.connection.request(method, path, body=data, headers=headers)
+                resp = self.connection.getresponse()
+                response = json.loads(resp.read())
+                break
+            except (ConnectionError, http.client.RemoteDisconnected, http.client.CannotSendRequest):
+                # the daemon closed the kept-alive connection, retry once on a new one
+                self.close()
+                if attempt:
+                    raise
+        if resp.status >= 400:
+            raise Exception("Daemon request {} {} failed: {}".format(method, path, response.get("error", response)))
+        return response
+
+    def submit(self, **job):
+        # Queues a job and returns its record, eg. {"id": "...", "state": "queued", "output_file": "..."}
+        return self.request("POST", "/jobs", job)
+
+    def status(self, id):
+        return self.request("GET", f"/jobs/{id}")
+
+    def wait(self, id, timeout=None, poll=30.0):
+        # Blocks until job id is "finished" or "failed" (or timeout seconds have passed) and returns its record.
+        # The daemon answers as soon as the job completes, so this does not poll the API.
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            wait = poll if deadline is None else max(0.0, min(poll, deadline - time.monotonic()))
+            record = self.request("GET", f"/jobs/{id}?wait={wait}", timeout=self.timeout + wait)
+            if record["state"] in ("finished", "failed") or (deadline is not None and time.monotonic() >= deadline):
+                return record
+
+    def generate_and_download(self, timeout=None, **job):
+        return self.wait(self.submit(**job)["id"], timeout=timeout)
+
+    def stats(self):
+        return self.request("GET", "/stats")
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,208 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from .hedging import call_timeout
+
+
+class DownloadError(Exception):
+    pass
+
+
+class Downloader():
+    """
+    Streams a URL to disk in fixed-size chunks through a PooledSession.
+
+    - Data is written to `<save_file>.part` and moved into place with os.replace once the size has been
+    checked against the size announced by the server, so a partial file never appears at save_file.
+    - If the connection drops the download resumes from the end of the .part file with an HTTP Range request,
+    up to max_attempts times. A .part file left by an earlier run is resumed the same way when the ETag or
+    Last-Modified of its content is known, which is sent as If-Range so a changed file is downloaded again.
+    - Files of at least parallel_threshold bytes are fetched as parallel_parts byte ranges in parallel when
+    the server supports ranges. Each range is itself resumed on a dropped connection, and the .part file is
+    removed if a range fails.
+    Memory use is bounded by chunk_size per stream regardless of file size.
+    File requests go to the storage behind the signed URL rather than the API, so they are not reported to
+    the session's rate controller.
+    - With a hedger (see hedging.Hedger) a request whose response headers are slow to arrive is sent twice and
+    the first response is streamed. With a deadline (see hedging.Deadline) every request is given the remaining
+    budget as its timeout and the download stops with DeadlineExceeded once the budget is spent.
+    """
+
+    def __init__(self, session, chunk_size=1024 * 1024, max_attempts=5, parallel_parts=1, parallel_threshold=64 * 1024 * 1024, hedger=None):
+        self.session = session
+        self.hedger = hedger
+        self.chunk_size = chunk_size
+        self.max_attempts = max_attempts
+        self.parallel_parts = parallel_parts
+        self.parallel_threshold = parallel_threshold
+
+        self.lock = threading.Lock()
+        self.bytes_downloaded = 0
+
+    def download(self, url, save_file, deadline=None):
+        # Downloads url to save_file and returns the number of bytes in the file.
+        part_file = save_file + ".part"
+
+        if self.parallel_parts > 1 and not os.path.exists(part_file):
+            size = self.probe_size(url, deadline)
+            if size is not None and size >= self.parallel_threshold:
+                self.download_ranges(url, part_file, size, deadline)
+                os.replace(part_file, save_file)
+                return size
+
+        size = self.download_stream(url, part_file, deadline)
+        os.replace(part_file, save_file)
+        self.remove(part_file + ".validator")
+        return size
+
+    @staticmethod
+    def remove(path):
+        if os.path.exists(path):
+            os.remove(path)
+
+    @staticmethod
+    def validator(resp):
+        # The validator to send as If-Range when resuming the content of resp, or None if the server gave none.
+        # Weak ETags cannot be used with If-Range.
+        etag = resp.headers.get("ETag")
+        if etag and not etag.startswith("W/"):
+            return etag
+        return resp.headers.get("Last-Modified")
+
+    def get(self, url, headers, deadline=None):
+        # Sends a streamed GET and returns once the response headers have arrived.
+        def call():
+            return self.session.get(url, controlled=False, headers=headers, stream=True, **call_timeout(deadline, self.session.timeout))
+        if self.hedger is None:
+            return call()
+        # GETs of a signed URL are idempotent, so a slow one can be hedged
+        return self.hedger.call("file", call, deadline)
+
+    def probe_size(self, url, deadline=None):
+        # Returns the size of the file if the server supports range requests, otherwise None.
+        # A one byte GET is used rather than HEAD since signed URLs are usually only valid for GET.
+        with self.get(url, {"Range": "bytes=0-0"}, deadline) as resp:
+            content_range = resp.headers.get("Content-Range", "")
+            if resp.status_code != 206 or "/" not in content_range:
+                return None
+            total = content_range.rsplit("/", 1)[1]
+            return int(total) if total.isdigit() else None
+
+    def download_stream(self, url, part_file, deadline=None):
+        # Streams url into part_file, resuming from its current size after a dropped connection.
+        # Resumed requests carry If-Range with the validator of the response that started part_file, so a server
+        # whose content has changed sends it whole instead of a range that would be appended to stale data.
+        # The validator is kept in `<part_file>.validator` for .part files left for a later call; a .part file
+        # without one cannot be checked and is downloaded again.
+        validator_file = part_file + ".validator"
+        validator = None
+        if os.path.exists(validator_file):
+            with open(validator_file, "r") as fp:
+                validator = fp.read()
+        elif os.path.exists(part_file):
+            os.remove(part_file)
+
+        for attempt in range(self.max_attempts):
+            offset = os.path.getsize(part_file) if os.path.exists(part_file) else 0
+            headers = {}
+            if offset:
+                headers["Range"] = f"bytes={offset}-"
+                if validator:
+                    headers["If-Range"] = validator
+            try:
+                with self.get(url, headers, deadline) as resp:
+                    if resp.status_code == 416:
+                        # the .part file is longer than the content, so it is not a prefix of it
+                        print("Download of {} does not match the {} bytes already downloaded, restarting".format(part_file, offset))
+                        self.remove(part_file)
+                        self.remove(validator_file)
+                        validator = None
+                        continue
+                    resp.raise_for_status()
+
+                    if offset and resp.status_code != 206:
+                        # the server ignored the range or the content has changed, start again from the beginning
+                        offset = 0
+                    if not offset:
+                        validator = self.validator(resp) or ""
+                        if validator:
+                            with open(validator_file, "w") as fp:
+                                fp.write(validator)
+                        else:
+                            self.remove(validator_file)
+                    expected = self.expected_size(resp, offset)
+
+                    with open(part_file, "ab" if offset else "wb") as fp:
+                        self.write_chunks(resp, fp, deadline)
+                        size = fp.tell()
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+                print("Download of {} interrupted ({}), resuming".format(part_file, e))
+                continue
+
+            if expected is not None and size != expected:
+                print("Download of {} is {} bytes but {} were expected, resuming".format(part_file, size, expected))
+                if size > expected:
+                    self.remove(part_file)
+                continue
+            return size
+
+        raise DownloadError("Download of {} failed after {} attempts".format(url, self.max_attempts))
+
+    def download_ranges(self, url, part_file, size, deadline=None):
+        # Fetches size bytes of url as parallel byte ranges written in place into a preallocated part_file.
+        # The preallocated file has holes until every range is written, so it is removed if any range fails
+        # rather than being resumed from its size.
+        with open(part_file, "wb") as fp:
+            fp.truncate(size)
+
+        part_size = -(-size // self.parallel_parts)
+        ranges = [(start, min(start + part_size, size) - 1) for start in range(0, size, part_size)]
+        try:
+            with ThreadPoolExecutor(max_workers=len(ranges)) as pool:
+                for future in [pool.submit(self.download_range, url, part_file, start, end, deadline) for start, end in ranges]:
+                    future.result()
+        except BaseException:
+            self.remove(part_file)
+            raise
+
+    def download_range(self, url, part_file, start, end, deadline=None):
+        position = start
+        for attempt in range(self.max_attempts):
+            try:
+                with self.get(url, {"Range": f"bytes={position}-{end}"}, deadline) as resp:
+                    if resp.status_code != 206:
+                        raise DownloadError("Server did not honour range request for {}: {}".format(url, resp.status_code))
+                    with open(part_file, "r+b") as fp:
+                        fp.seek(position)
+                        try:
+                            self.write_chunks(resp, fp, deadline)
+                        finally:
+                            position = fp.tell()
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError):
+                pass
+
+            if position > end:
+                return
+        raise DownloadError("Download of bytes {}-{} of {} failed after {} attempts".format(start, end, url, self.max_attempts))
+
+    def write_chunks(self, resp, fp, deadline=None):
+        for chunk in resp.iter_content(chunk_size=self.chunk_size):
+            if deadline is not None:
+                deadline.check()
+            fp.write(chunk)
+            with self.lock:
+                self.bytes_downloaded += len(chunk)
+
+    @staticmethod
+    def expected_size(resp, offset):
+        # total size of the file once this response has been written after offset bytes
+        content_range = resp.headers.get("Content-Range", "")
+        if resp.status_code == 206 and "/" in content_range:
+            total = content_range.rsplit("/", 1)[1]
+            if total.isdigit():
+                return int(total)
+        length = resp.headers.get("Content-Length")
+        if length is not None and length.isdigit() and "Content-Encoding" not in resp.headers:
+            return offset + int(length)
+        return None
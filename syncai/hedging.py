@@ -0,0 +1,155 @@
+import collections
+import threading
+import time
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class Deadline():
+    """
+    Time budget of a job, shared by every call made for it.
+
+    timeout(default) returns the (connect, read) timeout of the next call: the default timeout capped at the
+    remaining budget. It raises DeadlineExceeded once the budget is spent, so no call is started after it.
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires = time.monotonic() + seconds
+
+    def remaining(self):
+        return self.expires - time.monotonic()
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def check(self):
+        if self.expired():
+            raise DeadlineExceeded("Deadline of {}s exceeded".format(self.seconds))
+
+    def timeout(self, default):
+        self.check()
+        remaining = self.remaining()
+        if isinstance(default, tuple):
+            return tuple(remaining if value is None else min(value, remaining) for value in default)
+        return remaining if default is None else min(default, remaining)
+
+
+def as_deadline(deadline):
+    # deadline may be a Deadline, a number of seconds or None
+    if deadline is None or isinstance(deadline, Deadline):
+        return deadline
+    return Deadline(deadline)
+
+
+def call_timeout(deadline, default):
+    # keyword arguments giving a call the remaining budget of deadline as its timeout, if there is one
+    return {} if deadline is None else {"timeout": deadline.timeout(default)}
+
+
+def discard(future):
+    # closes the response of a hedged call that lost the race, returning its connection to the pool
+    if not future.cancelled() and future.exception() is None and hasattr(future.result(), "close"):
+        future.result().close()
+
+
+class Hedger():
+    """
+    Hedges idempotent calls: if a call has not answered after the `percentile` latency of the recent calls to the
+    same endpoint, a duplicate is sent and whichever answers first is used. The loser is closed when it answers.
+
+    Latencies are kept for the last `window` successful calls per endpoint, and calls are not hedged until
+    min_samples have been seen. The hedge delay is never below min_delay seconds, so a fast endpoint is not
+    flooded with duplicates. Calls run on a pool of `workers` threads.
+
+    metrics, a ClientMetrics, counts hedgeable_requests, hedged_requests and hedge_wins (the duplicate answered
+    first) and keeps the hedge_rate gauge.
+    """
+
+    def __init__(self, percentile=95, window=200, min_samples=20, min_delay=0.05, workers=32, metrics=None):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.window = window
+        self.metrics = metrics
+        from concurrent.futures import ThreadPoolExecutor
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.lock = threading.Lock()
+        self.latencies = {}  # endpoint -> deque of recent latencies
+        self.counts = collections.Counter()
+
+    def delay(self, endpoint):
+        # Seconds to wait before hedging a call to endpoint, or None if there are too few samples.
+        with self.lock:
+            samples = self.latencies.get(endpoint)
+            if samples is None or len(samples) < self.min_samples:
+                return None
+            ordered = sorted(samples)
+        return max(self.min_delay, ordered[min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))])
+
+    def observe(self, endpoint, seconds):
+        with self.lock:
+            if endpoint not in self.latencies:
+                self.latencies[endpoint] = collections.deque(maxlen=self.window)
+            self.latencies[endpoint].append(seconds)
+
+    def timed(self, endpoint, call):
+        started = time.monotonic()
+        result = call()
+        self.observe(endpoint, time.monotonic() - started)
+        return result
+
+    def count(self, name):
+        with self.lock:
+            self.counts[name] += 1
+            rate = self.counts["hedged_requests"] / self.counts["hedgeable_requests"]
+        if self.metrics is not None:
+            self.metrics.increment(name)
+            self.metrics.set_gauge("hedge_rate", rate)
+
+    def call(self, endpoint, call, deadline=None):
+        # Returns call(), hedged with a second call() if the first is slow. Waits no longer than deadline.
+        self.count("hedgeable_requests")
+        delay = self.delay(endpoint)
+        if delay is None or (deadline is not None and deadline.remaining() <= delay):
+            return self.timed(endpoint, call)
+
+        from concurrent.futures import FIRST_COMPLETED, wait
+        futures = [self.pool.submit(self.timed, endpoint, call)]
+        done, _ = wait(futures, timeout=delay)
+        if not done:
+            self.count("hedged_requests")
+            futures.append(self.pool.submit(self.timed, endpoint, call))
+
+        hedge = futures[-1] if len(futures) > 1 else None
+        error = None
+        while futures:
+            done, _ = wait(futures, timeout=deadline.remaining() if deadline is not None else None, return_when=FIRST_COMPLETED)
+            if not done:
+                for future in futures:
+                    future.add_done_callback(discard)
+                raise DeadlineExceeded("Deadline of {}s exceeded waiting for {}".format(deadline.seconds, endpoint))
+            for future in done:
+                futures.remove(future)
+            winners = [future for future in done if future.exception() is None]
+            if not winners:
+                # wait for the other call, if any, before giving up
+                error = next(iter(done)).exception()
+                continue
+            if winners[0] is hedge:
+                self.count("hedge_wins")
+            for other in futures + winners[1:]:
+                other.add_done_callback(discard)
+            return winners[0].result()
+        raise error
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counts)
+        stats["delays"] = {endpoint: self.delay(endpoint) for endpoint in list(self.latencies)}
+        return stats
+
+    def close(self):
+        self.pool.shutdown(wait=False)
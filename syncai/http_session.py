@@ -0,0 +1,116 @@
+import random
+import time
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from .rate_control import RETRY_STATUSES, parse_retry_after
+
+
+class JitteredRetry(Retry):
+    # Exponential backoff where each sleep is drawn from [backoff / 2, backoff] so that
+    # many clients retrying at once do not hit the API in lock-step.
+    # Methods outside allowed_methods (POST /generate, which starts a job) are only retried when the connection
+    # could not be made or on a 429, when the request is known not to have started anything. A read timeout or
+    # a 5xx may come after the job was created, and sending it again would render it twice.
+
+    def get_backoff_time(self):
+        backoff = super().get_backoff_time()
+        return backoff / 2 + random.uniform(0, backoff / 2)
+
+    def is_retry(self, method, status_code, has_retry_after=False):
+        if status_code == 429 and self.total:
+            return True
+        return super().is_retry(method, status_code, has_retry_after)
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        if error is not None and method is not None and not self._is_method_retryable(method) and not self._is_connection_error(error):
+            raise error.with_traceback(_stacktrace)
+        return super().increment(method=method, url=url, response=response, error=error, _pool=_pool, _stacktrace=_stacktrace)
+
+
+class PooledSession():
+    """
+    A keep-alive requests.Session with a bounded connection pool, bounded retries and default timeouts.
+
+    - pool_size is the number of connections kept alive per host. It should be at least the number of
+    threads that make requests at once, eg. the concurrency of a batch.
+    - connect_timeout and read_timeout (seconds) are applied to every call that does not pass its own timeout.
+    - retries is the number of retries on connection errors and on 429/5xx responses, with jittered exponential
+    backoff starting at backoff_factor seconds. A Retry-After header on a 429/503 response is honoured.
+    POST requests are only retried on connection errors and 429 responses, see JitteredRetry.
+    - controller, if given, is an AimdController told about the outcome of every call made with controlled=True
+    (the default), and calls wait while it has been asked to back off. Only calls without a body are timed for
+    its latency signal.
+    """
+
+    def __init__(self, pool_size=10, connect_timeout=5.0, read_timeout=30.0, retries=3, backoff_factor=0.5, controller=None):
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.controller = controller
+
+        retry = JitteredRetry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(["GET"]),
+            raise_on_status=False,
+            respect_retry_after_header=True,
+        )
+        self.adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+
+    def request(self, method, url, controlled=True, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        if self.controller is None or not controlled:
+            return self.session.request(method, url, **kwargs)
+
+        endpoint = urlparse(url).path.rsplit("/", 1)[-1]
+        self.controller.wait()
+        started = time.monotonic()
+        try:
+            resp = self.session.request(method, url, **kwargs)
+        except requests.RequestException:
+            self.controller.record(endpoint, [], time.monotonic() - started, error=True)
+            raise
+
+        # responses that urllib3 retried are only visible in the retry history
+        retries = getattr(resp.raw, "retries", None)
+        statuses = [history.status for history in retries.history if history.status] if retries is not None else []
+        statuses.append(resp.status_code)
+        # the latency of a call with a body includes its upload, which says nothing about the load on the API
+        latency = None if kwargs.get("data") is not None or kwargs.get("json") is not None or kwargs.get("files") is not None else time.monotonic() - started
+        self.controller.record(endpoint, statuses, latency, parse_retry_after(resp.headers.get("Retry-After")))
+        return resp
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+    def pool_stats(self):
+        # Returns connection pool statistics per host, eg.
+        # {"https://lipsync-ai.api.emotechlab.com": {"pool_size": 10, "connections_opened": 2, "requests": 140, "in_use": 1}}
+        stats = {}
+        pools = self.adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            stats[f"{pool.scheme}://{pool.host}:{pool.port}"] = {
+                "pool_size": self.pool_size,
+                "connections_opened": pool.num_connections,
+                "requests": pool.num_requests,
+                "in_use": self.pool_size - pool.pool.qsize() if pool.pool is not None else 0,
+            }
+        return stats
@@ -0,0 +1,74 @@
+import json
+import queue
+import threading
+
+
+def read_jobs(input_file):
+    # Returns the jobs in input_file.
+    # A .jsonl file holds one job per line and is read lazily, so memory does not depend on the number of jobs.
+    # Any other file is read as a json document with a "jobs" list, as before.
+    if input_file.endswith(".jsonl"):
+        return iter_jsonl(input_file)
+
+    with open(input_file, "r") as json_file:
+        input_samples = json.load(json_file)
+    if "jobs" not in input_samples:
+        raise Exception("Input json file incorrect format, needs \"jobs\" field")
+    return input_samples["jobs"]
+
+
+def iter_jsonl(input_file):
+    with open(input_file, "r", encoding="utf-8") as fp:
+        for line_number, line in enumerate(fp, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                raise Exception("Input jsonl file line {} is not valid json: {}".format(line_number, e))
+
+
+_END = object()
+
+
+def prefetch(jobs, size=64):
+    # Reads up to `size` jobs ahead of the consumer in a background thread.
+    # Lists are returned unchanged since there is nothing to read ahead.
+    if isinstance(jobs, list):
+        return jobs
+    return _prefetch(jobs, size)
+
+
+def _prefetch(jobs, size):
+    buffer = queue.Queue(maxsize=size)
+    stop = threading.Event()
+
+    def reader():
+        try:
+            for job in jobs:
+                while not stop.is_set():
+                    try:
+                        buffer.put(job, timeout=0.1)
+                        break
+                    except queue.Full:
+                        pass
+                if stop.is_set():
+                    return
+        except Exception as e:
+            buffer.put(e)
+            return
+        buffer.put(_END)
+
+    thread = threading.Thread(target=reader, daemon=True)
+    thread.start()
+    try:
+        while True:
+            job = buffer.get()
+            if job is _END:
+                return
+            if isinstance(job, Exception):
+                raise job
+            yield job
+    finally:
+        stop.set()
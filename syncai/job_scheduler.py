@@ -0,0 +1,146 @@
+import heapq
+import json
+import os
+import re
+import threading
+import wave
+
+
+# rough speaking rate used to turn text into seconds of speech
+CHARACTERS_PER_SECOND = 15.0
+# prior render time per output type before any observations: (fixed seconds, seconds per second of speech)
+PRIOR_RENDER_TIMES = {"video": (10.0, 3.0), "csv": (2.0, 0.5), "fbx": (3.0, 0.6)}
+FULL_HD_PIXELS = 1920 * 1080
+# variance of the seconds of speech of the observed jobs (s^2) below which their length cannot explain their render time
+MIN_FIT_VARIANCE = 1.0
+
+
+def speech_seconds(text, audio_file=None):
+    # Estimated length of the speech for a job: the duration of a local WAV file if one is given,
+    # otherwise the length of the text without SSML tags plus any SSML <break> times.
+    if audio_file and audio_file.lower().endswith(".wav"):
+        try:
+            with wave.open(audio_file, "rb") as fp:
+                return fp.getnframes() / float(fp.getframerate())
+        except (OSError, wave.Error):
+            pass
+
+    breaks = 0.0
+    for value, unit in re.findall(r"<break[^>]*time=['\"]([\d.]+)\s*(ms|s)['\"]", text):
+        breaks += float(value) / (1000.0 if unit == "ms" else 1.0)
+    spoken = re.sub(r"<[^>]+>", "", text)
+    return len(spoken.strip()) / CHARACTERS_PER_SECOND + breaks
+
+
+class RenderTimeEstimator():
+    """
+    Estimates how long a job will take to render from its generate() arguments.
+
+    Jobs are grouped by output type ("video", "csv" or "fbx") and, for video, scaled by frame size.
+    Render time is modelled as a + b * seconds of speech for each output type. Until render times have been
+    observed for an output type, PRIOR_RENDER_TIMES is used; after that a least-squares fit of the observations
+    with a, b >= 0. While the observed jobs are all about the same length (eg. a batch of similar sentences) the
+    slope cannot be told apart from the intercept, so the prior is scaled to the observed mean instead.
+    Observations are kept as running sums, persisted to `path` (if given) by save() and loaded on the next run.
+    """
+
+    def __init__(self, path=None, default_output_type="video"):
+        self.path = path
+        self.default_output_type = default_output_type
+        self.lock = threading.Lock()
+        # output type -> [n, sum x, sum y, sum xx, sum xy]
+        self.observations = {}
+        if path and os.path.exists(path):
+            with open(path, "r") as fp:
+                self.observations = json.load(fp)
+
+    def features(self, kwargs):
+        # (output type, seconds of speech, frame size scale) of a job
+        output_type = kwargs.get("output_type", self.default_output_type)
+        scale = 1.0
+        if output_type == "video" and kwargs.get("frame_width") and kwargs.get("frame_height"):
+            scale = max(0.1, kwargs["frame_width"] * kwargs["frame_height"] / FULL_HD_PIXELS)
+        return output_type, speech_seconds(kwargs.get("text", ""), kwargs.get("audio_file")), scale
+
+    def estimate(self, kwargs, observed_only=False):
+        # Estimated render time in seconds. With observed_only=True None is returned until render
+        # times have been observed for the job's output type.
+        output_type, x, scale = self.features(kwargs)
+        with self.lock:
+            sums = self.observations.get(output_type)
+        if sums is None or not sums[0]:
+            if observed_only:
+                return None
+            a, b = PRIOR_RENDER_TIMES.get(output_type, PRIOR_RENDER_TIMES["video"])
+            return (a + b * x) * scale
+
+        n, sx, sy, sxx, sxy = sums
+        variance = (n * sxx - sx * sx) / (n * n)
+        if n >= 3 and variance >= MIN_FIT_VARIANCE:
+            b = (n * sxy - sx * sy) / (n * n * variance)
+            a = (sy - b * sx) / n
+            if b < 0:
+                # render time does not grow with length, the best fit with b = 0 is the mean
+                a, b = sy / n, 0.0
+            elif a < 0:
+                # the best fit with a = 0 is a line through the origin
+                a, b = 0.0, sxy / sxx
+        else:
+            # too few points or too little spread for a fit, scale the prior to match the observed mean
+            a, b = PRIOR_RENDER_TIMES.get(output_type, PRIOR_RENDER_TIMES["video"])
+            ratio = (sy / n) / max(1e-6, a + b * sx / n)
+            a, b = a * ratio, b * ratio
+        return (a + b * x) * scale
+
+    def observe(self, kwargs, render_seconds):
+        output_type, x, scale = self.features(kwargs)
+        y = render_seconds / scale
+        with self.lock:
+            sums = self.observations.setdefault(output_type, [0, 0.0, 0.0, 0.0, 0.0])
+            sums[0] += 1
+            sums[1] += x
+            sums[2] += y
+            sums[3] += x * x
+            sums[4] += x * y
+
+    def save(self):
+        if not self.path:
+            return
+        with self.lock:
+            data = json.dumps(self.observations)
+        part_file = self.path + ".part"
+        with open(part_file, "w") as fp:
+            fp.write(data)
+        os.replace(part_file, self.path)
+
+
+def schedule_jobs(samples, estimator, window=1000):
+    """
+    Reorders (index, job) pairs so that, among the next `window` jobs read, the one to submit first is the one with
+    - the highest "priority" field (default 0), then
+    - the earliest "due_by" field (any comparable number, eg. seconds from the start of the batch; only an
+    ordering key, unlike the job_deadline time budget of run_batch), then
+    - the shortest estimated render time,
+    which minimises mean completion time when concurrency is limited. A bounded window keeps memory flat for
+    lazily read inputs; a list is reordered in full.
+    """
+    if isinstance(samples, list):
+        window = max(window, len(samples))
+    samples = iter(samples)
+    heap = []
+
+    def push(i, job):
+        cost = estimator.estimate(job)
+        due_by = job.get("due_by")
+        heapq.heappush(heap, (-job.get("priority", 0), due_by if due_by is not None else float("inf"), cost, i, job))
+
+    for i, job in samples:
+        push(i, job)
+        if len(heap) >= window:
+            break
+    while heap:
+        *_, i, job = heapq.heappop(heap)
+        yield i, job
+        for i, job in samples:
+            push(i, job)
+            break
@@ -0,0 +1,212 @@
+import json
+import threading
+import time
+
+
+# upper bounds of the histogram buckets for each metric
+SECONDS_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+BYTES_BUCKETS = tuple(1024 * 4 ** i for i in range(12))
+COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+class Histogram():
+
+    def __init__(self, name, description, buckets):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q):
+        # upper bound of the bucket holding the q-th quantile
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else None,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+    def prometheus(self, prefix):
+        name = prefix + self.name
+        lines = [f"# HELP {name} {self.description}", f"# TYPE {name} histogram"]
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum {self.sum}")
+        lines.append(f"{name}_count {self.count}")
+        return lines
+
+
+class ClientMetrics():
+    """
+    Per-job latency breakdown of a client, aggregated into histograms.
+
+    The client reports events as they happen:
+    - submitted(job_id, seconds): generate request, including any audio upload
+    - uploaded(job_id, size, bytes_saved, seconds): audio upload, with the bytes saved by preprocessing the audio
+    - status(job_id, status, seconds): each status check
+    - notified(job_id, status): a completion notification pushed by the API
+    - downloaded(job_id, size, seconds): file download, including the download-URL request
+    From these the time to first status, render duration (submission to first 'finished' status),
+    polls per job and download throughput are derived. Per-job state is dropped once a job is downloaded or fails.
+
+    Every event is also passed to each listener as listener(event, job_id, fields), eg. to forward it to a tracing system.
+    """
+
+    def __init__(self, listeners=None, prefix="syncai_"):
+        self.prefix = prefix
+        self.listeners = list(listeners or [])
+        self.lock = threading.Lock()
+        self.jobs = {}  # jobId -> {"submitted", "first_status", "polls"}
+        self.counters = {"jobs_submitted": 0, "jobs_finished": 0, "jobs_failed": 0, "jobs_downloaded": 0,
+                         "throttle_events": 0, "server_errors": 0, "connection_errors": 0, "latency_backoffs": 0, "pauses": 0,
+                         "upload_bytes_saved": 0, "notifications": 0}
+        self.gauges = {}
+        self.histograms = {histogram.name: histogram for histogram in [
+            Histogram("submit_seconds", "Latency of generate requests including upload", SECONDS_BUCKETS),
+            Histogram("upload_seconds", "Latency of generate requests that upload an audio file", SECONDS_BUCKETS),
+            Histogram("upload_bytes", "Size of uploaded audio files", BYTES_BUCKETS),
+            Histogram("time_to_first_status_seconds", "Time from submission to the first status response", SECONDS_BUCKETS),
+            Histogram("status_seconds", "Latency of status requests", SECONDS_BUCKETS),
+            Histogram("render_seconds", "Time from submission to the first finished status", SECONDS_BUCKETS),
+            Histogram("download_seconds", "Time to fetch the download URL and the file", SECONDS_BUCKETS),
+            Histogram("download_bytes", "Size of downloaded files", BYTES_BUCKETS),
+            Histogram("download_bytes_per_second", "Download throughput", BYTES_BUCKETS),
+            Histogram("polls_per_job", "Status requests per job", COUNT_BUCKETS),
+        ]}
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def emit(self, event, job_id, **fields):
+        for listener in self.listeners:
+            listener(event, job_id, fields)
+
+    def observe(self, name, value):
+        self.histograms[name].observe(value)
+
+    def increment(self, name):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + 1
+
+    def set_gauge(self, name, value):
+        with self.lock:
+            self.gauges[name] = value
+
+    def submitted(self, job_id, seconds):
+        with self.lock:
+            self.jobs[job_id] = {"submitted": time.monotonic() - seconds, "first_status": None, "polls": 0}
+            self.counters["jobs_submitted"] += 1
+            self.observe("submit_seconds", seconds)
+        self.emit("submitted", job_id, seconds=seconds)
+
+    def uploaded(self, job_id, size, bytes_saved, seconds):
+        with self.lock:
+            self.counters["upload_bytes_saved"] += bytes_saved
+            self.observe("upload_seconds", seconds)
+            self.observe("upload_bytes", size)
+        self.emit("uploaded", job_id, size=size, bytes_saved=bytes_saved, seconds=seconds)
+
+    def status(self, job_id, status, seconds):
+        with self.lock:
+            self.observe("status_seconds", seconds)
+            self.job_status(job_id, status, polled=True)
+        self.emit("status", job_id, status=status, seconds=seconds)
+
+    def notified(self, job_id, status):
+        with self.lock:
+            self.counters["notifications"] += 1
+            self.job_status(job_id, status, polled=False)
+        self.emit("notified", job_id, status=status)
+
+    def job_status(self, job_id, status, polled):
+        # updates the per-job state with a status seen by polling or a notification, with the lock held
+        job = self.jobs.get(job_id)
+        if job is not None:
+            now = time.monotonic()
+            if polled:
+                job["polls"] += 1
+            if job["first_status"] is None:
+                job["first_status"] = now
+                self.observe("time_to_first_status_seconds", now - job["submitted"])
+            if status == "finished" and "rendered" not in job:
+                job["rendered"] = now
+                self.counters["jobs_finished"] += 1
+                self.observe("render_seconds", now - job["submitted"])
+            elif status == "failed":
+                self.counters["jobs_failed"] += 1
+                self.observe("polls_per_job", job["polls"])
+                del self.jobs[job_id]
+
+    def downloaded(self, job_id, size, seconds):
+        with self.lock:
+            self.counters["jobs_downloaded"] += 1
+            self.observe("download_seconds", seconds)
+            self.observe("download_bytes", size)
+            if seconds > 0:
+                self.observe("download_bytes_per_second", size / seconds)
+            job = self.jobs.pop(job_id, None)
+            if job is not None:
+                self.observe("polls_per_job", job["polls"])
+        self.emit("downloaded", job_id, size=size, seconds=seconds)
+
+    def summary(self):
+        with self.lock:
+            return {
+                **self.counters,
+                **self.gauges,
+                "jobs_in_flight": len(self.jobs),
+                **{name: histogram.summary() for name, histogram in self.histograms.items()},
+            }
+
+    def prometheus(self):
+        with self.lock:
+            lines = []
+            for name, value in self.counters.items():
+                lines += [f"# TYPE {self.prefix}{name}_total counter", f"{self.prefix}{name}_total {value}"]
+            for name, value in self.gauges.items():
+                lines += [f"# TYPE {self.prefix}{name} gauge", f"{self.prefix}{name} {value}"]
+            for histogram in self.histograms.values():
+                lines += histogram.prometheus(self.prefix)
+            return "\n".join(lines) + "\n"
+
+    def export(self, path):
+        # Writes the metrics in Prometheus text format if path ends with .prom, otherwise as a json summary.
+        with open(path, "w") as fp:
+            if path.endswith(".prom"):
+                fp.write(self.prometheus())
+            else:
+                json.dump(self.summary(), fp, indent=4)
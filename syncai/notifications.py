@@ -0,0 +1,115 @@
+import json
+import secrets
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# statuses a notification can complete a job with
+TERMINAL_STATUSES = ("finished", "failed")
+
+
+class CallbackTransport():
+    """
+    Receives job completion notifications pushed by the API over HTTP.
+
+    A small HTTP server listens on host:port (an ephemeral port by default) in a background thread. The client
+    sends callback_url with every job it submits and the API POSTs a json body such as
+    {"jobId": "...", "status": "finished"} to it when the job finishes or fails.
+    callback_url ends with a random path, so other requests to the listener are rejected.
+    Set public_url to the address the API should call when it differs from host:port, eg. behind a NAT or tunnel.
+
+    Every transport has the same interface, so a client can use LocalTransport in its place:
+    - start(notify) starts receiving and calls notify(job_id, status) for each finished or failed job
+    - callback_url is the url sent with each job, or None if jobs should not carry one
+    - close() stops receiving
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, public_url=None):
+        self.host = host
+        self.port = port
+        self.public_url = public_url
+        self.path = "/syncai/" + secrets.token_hex(16)
+        self.server = None
+        self.notify = None
+        self.received = 0
+
+    @property
+    def callback_url(self):
+        if self.server is None:
+            return None
+        base = self.public_url or f"http://{self.host}:{self.server.server_address[1]}"
+        return base.rstrip("/") + self.path
+
+    def start(self, notify):
+        self.notify = notify
+        handler = type("Handler", (CallbackHandler,), {"transport": self})
+        self.server = ThreadingHTTPServer((self.host, self.port), handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def deliver(self, payload):
+        # Passes a notification body to notify. Returns False if it is not a job completion.
+        if not isinstance(payload, dict) or not payload.get("jobId") or payload.get("status") not in TERMINAL_STATUSES:
+            return False
+        self.received += 1
+        self.notify(payload["jobId"], payload)
+        return True
+
+    def close(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+class CallbackHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    transport = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def respond(self, code):
+        self.send_response(code)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if self.path.split("?")[0] != self.transport.path:
+            return self.respond(404)
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return self.respond(400)
+        # accept notifications of other statuses so the API does not retry them
+        self.transport.deliver(payload)
+        self.respond(204)
+
+
+class LocalTransport():
+    """
+    In-process stand-in for CallbackTransport, for tests and local mocks.
+
+    Jobs are not given a callback_url; call deliver({"jobId": ..., "status": "finished"}) to notify the client
+    as the API would.
+    """
+
+    callback_url = None
+
+    def __init__(self):
+        self.notify = None
+        self.received = 0
+
+    def start(self, notify):
+        self.notify = notify
+
+    def deliver(self, payload):
+        if payload.get("status") not in TERMINAL_STATUSES:
+            return False
+        self.received += 1
+        self.notify(payload["jobId"], payload)
+        return True
+
+    def close(self):
+        self.notify = None
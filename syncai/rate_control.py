@@ -0,0 +1,146 @@
+import threading
+import time
+
+
+# statuses that are safe to retry: throttling and transient server errors
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def parse_retry_after(value):
+    # Retry-After is either a number of seconds or an HTTP date. Returns seconds, or None if absent or invalid.
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    from email.utils import parsedate_to_datetime
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket():
+    # Allows `rate` acquisitions per second on average with bursts of up to `burst`.
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class AimdController():
+    """
+    Additive-increase / multiplicative-decrease control of the number of jobs a batch keeps in flight.
+
+    Every API call is reported with record(). A 429 or 5xx response, a connection error, or a moving average
+    latency for an endpoint above latency_tolerance times (and latency_slack seconds more than) the best seen
+    for that endpoint, shrinks the window by `decrease`, at most once
+    every `cooldown` seconds so one burst of errors counts as one congestion event. Every healthy call grows
+    the window by increase / window, ie. by `increase` per window's worth of calls.
+    A Retry-After header pauses all calls for that long. Calls that send a body, eg. a generate request uploading
+    an audio file, are timed by their upload as much as by the API, so they are left out of the latency signal.
+
+    max_submissions_per_second adds a token bucket in front of generate for accounts with hard quotas.
+    The window, throttle events and pauses are reported to `metrics` (a ClientMetrics) if given.
+    """
+
+    def __init__(self, initial_window=None, min_window=1, increase=1.0, decrease=0.5, latency_tolerance=3.0, latency_slack=0.25, cooldown=1.0, max_submissions_per_second=None, metrics=None):
+        self.window_size = float(initial_window) if initial_window else float("inf")
+        self.min_window = min_window
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_tolerance = latency_tolerance
+        self.latency_slack = latency_slack
+        self.cooldown = cooldown
+        self.bucket = TokenBucket(max_submissions_per_second) if max_submissions_per_second else None
+        self.metrics = metrics
+
+        self.lock = threading.Lock()
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self.latency = {}       # endpoint -> moving average of call latency
+        self.best_latency = {}  # endpoint -> lowest moving average seen, used as the healthy baseline
+
+    def window(self, cap):
+        # Number of jobs that may be in flight, never more than cap.
+        with self.lock:
+            self.window_size = min(self.window_size, float(cap))
+            window = max(self.min_window, int(self.window_size))
+        if self.metrics is not None:
+            self.metrics.set_gauge("window", window)
+        return window
+
+    def wait(self):
+        # Blocks while the API has asked us to back off with Retry-After.
+        while True:
+            with self.lock:
+                delay = self.paused_until - time.monotonic()
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
+    def acquire_submission(self):
+        # Called before each generate request.
+        self.wait()
+        if self.bucket is not None:
+            self.bucket.acquire()
+
+    def record(self, endpoint, statuses, latency, retry_after=None, error=False):
+        # endpoint names the API call, eg. "status". statuses are the HTTP status codes of the call including
+        # any retries, latency its total duration in seconds, or None if the call should not count towards the
+        # latency signal.
+        # error is set when the call failed without a response, eg. a connection error or timeout.
+        throttled = 429 in statuses
+        server_error = any(500 <= status < 600 for status in statuses)
+
+        with self.lock:
+            now = time.monotonic()
+            if retry_after:
+                self.paused_until = max(self.paused_until, now + retry_after)
+                self.count("pauses")
+
+            if throttled or server_error or error:
+                self.count("throttle_events" if throttled else "server_errors" if server_error else "connection_errors")
+                self.shrink(now)
+                return
+
+            if latency is None:
+                self.grow()
+                return
+            average = self.latency[endpoint] = 0.8 * self.latency.get(endpoint, latency) + 0.2 * latency
+            best = self.best_latency[endpoint] = min(self.best_latency.get(endpoint, average), average)
+            if average > self.latency_tolerance * best and average - best > self.latency_slack:
+                self.count("latency_backoffs")
+                self.shrink(now)
+            else:
+                self.grow()
+
+    def grow(self):
+        if self.window_size != float("inf"):
+            self.window_size += self.increase / max(self.window_size, 1.0)
+
+    def shrink(self, now):
+        if now - self.last_decrease < self.cooldown or self.window_size == float("inf"):
+            return
+        self.last_decrease = now
+        self.window_size = max(float(self.min_window), self.window_size * self.decrease)
+
+    def count(self, name):
+        if self.metrics is not None:
+            self.metrics.increment(name)
@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+
+# jobId returned by a client's generate() when the result is already in the cache
+CACHED_PREFIX = "cache:"
+
+
+def job_key(job, audio_file=None):
+    # Canonical hash of the job dictionary sent to the generate endpoint, plus the content of the uploaded audio file if any.
+    digest = hashlib.sha256(json.dumps(job, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8"))
+    if audio_file:
+        with open(audio_file, "rb") as fp:
+            for chunk in iter(lambda: fp.read(1024 * 1024), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def materialize(src, dst, link=True):
+    # Places a copy of src at dst, using a hardlink when possible.
+    if os.path.abspath(src) == os.path.abspath(dst):
+        return
+    if os.path.exists(dst):
+        os.remove(dst)
+    if link:
+        try:
+            os.link(src, dst)
+            return
+        except OSError:
+            # eg. src and dst are on different file systems
+            pass
+    shutil.copyfile(src, dst)
+
+
+class ResultCache():
+    """
+    Local on-disk cache of generated files keyed by job_key().
+
+    Entries are stored as `<cache_dir>/<key[:2]>/<key>` with a `<key>.json` sidecar holding the time it took
+    to generate them. When the cache grows above max_bytes the least recently used entries are evicted.
+    With link=True outputs are hardlinked to the cache entry, so output files should not be modified in place.
+    """
+
+    def __init__(self, cache_dir, max_bytes=10 * 1024 ** 3, link=True):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.link = link
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.seconds_saved = 0.0
+
+        # key -> [last used time, size]
+        self.entries = {}
+        self.total_bytes = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        for root, _, files in os.walk(cache_dir):
+            for name in files:
+                if name.endswith(".json") or name.endswith(".part"):
+                    continue
+                stat = os.stat(os.path.join(root, name))
+                self.entries[name] = [stat.st_mtime, stat.st_size]
+                self.total_bytes += stat.st_size
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def lookup(self, key):
+        # Returns whether key is cached, counting a miss if it is not. Hits are counted by get().
+        with self.lock:
+            if key in self.entries:
+                return True
+            self.misses += 1
+            return False
+
+    def get(self, key, save_file):
+        # Materializes the cached file for key at save_file. Returns False on a miss.
+        with self.lock:
+            if key not in self.entries:
+                return False
+            path = self.path(key)
+            materialize(path, save_file, self.link)
+
+            # bump the entry to most recently used, the mtime keeps the order across runs
+            now = time.time()
+            os.utime(path, (now, now))
+            self.entries[key][0] = now
+            self.hits += 1
+            try:
+                with open(path + ".json") as fp:
+                    self.seconds_saved += json.load(fp).get("generation_seconds") or 0.0
+            except (OSError, ValueError):
+                pass
+            return True
+
+    def put(self, key, src, generation_seconds=None):
+        # Adds the file src to the cache under key, then evicts entries above max_bytes.
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self.lock:
+            if key in self.entries:
+                return
+            part_file = path + ".part"
+            materialize(src, part_file, self.link)
+            with open(path + ".json", "w") as fp:
+                json.dump({"generation_seconds": generation_seconds}, fp)
+            os.replace(part_file, path)
+
+            size = os.path.getsize(path)
+            self.entries[key] = [os.path.getmtime(path), size]
+            self.total_bytes += size
+            self.evict()
+
+    def evict(self):
+        if self.total_bytes <= self.max_bytes:
+            return
+        for key, (_, size) in sorted(self.entries.items(), key=lambda item: item[1][0]):
+            if self.total_bytes <= self.max_bytes:
+                break
+            path = self.path(key)
+            for file in (path, path + ".json"):
+                if os.path.exists(file):
+                    os.remove(file)
+            del self.entries[key]
+            self.total_bytes -= size
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "seconds_saved": self.seconds_saved,
+                "entries": len(self.entries),
+                "bytes": self.total_bytes,
+            }
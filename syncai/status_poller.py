@@ -0,0 +1,268 @@
+import heapq
+import threading
+import time
+
+
+def poll_interval(age, expected, polls, late_polls, min_interval, max_interval, backoff=1.5):
+    # Seconds until the next status check of a job that was submitted `age` seconds ago, see StatusPoller.
+    # polls is the number of polls made so far and late_polls the number made since the job passed its expected
+    # render time. Before then, polls back off from min_interval as well, so an overestimate costs a few polls
+    # rather than a long wait for a job that finished early.
+    if expected is not None and age < expected:
+        interval = min((expected - age) / 2, min_interval * backoff ** polls)
+    else:
+        interval = min_interval * backoff ** late_polls
+    return min(max_interval, max(min_interval, interval))
+
+
+class StatusPoller():
+    """
+    Schedules status checks for many outstanding jobs from a single loop.
+
+    Each job is polled on its own adaptive interval:
+    - while a job is younger than its expected render time it is polled after half of the remaining time,
+    so polls tighten as the job nears its expected completion, but no later than min_interval * backoff ** polls
+    so a wrong estimate cannot hold up the first polls.
+    - once it is older than expected (or no estimate exists yet) the interval backs off exponentially
+    from min_interval by a factor of backoff per poll.
+    Intervals are clamped to [min_interval, max_interval]. The expected render time is learned from the
+    render times observed for finished jobs, unless one is passed to add(). A polled job is taken to have finished
+    halfway between the last status response that showed it pending and the first that showed it finished, so the
+    estimate does not grow with the delay of late polls.
+
+    A status request that raises, eg. a connection error after the session's retries or a 502 with a body that is
+    not json, only fails that poll: the job is polled again after min_interval * backoff ** errors in a row.
+
+    max_polls_per_second caps the total request rate across all jobs, so it stays flat however many jobs are in flight.
+
+    stats_hook, if given, is called as stats_hook(job_id, polls, status) when a job finishes or fails.
+
+    notify(job_id, status) completes a job from a push notification (see notifications.py) without polling it.
+    The notification is returned by the next poll_due() and wakes wait() and sleep() straight away; a notification
+    that arrives before the job is added is kept until it is.
+    """
+
+    def __init__(self, check_status, min_interval=1.0, max_interval=30.0, backoff=1.5, max_polls_per_second=None, stats_hook=None):
+        self.check_status = check_status
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.max_polls_per_second = max_polls_per_second
+        self.stats_hook = stats_hook
+
+        self.lock = threading.RLock()
+        self.changed = threading.Condition(self.lock)
+        self.jobs = {}          # jobId -> job state
+        self.queue = []         # heap of (next poll time, jobId)
+        self.completed = {}     # jobId -> terminal status not yet collected by wait()
+        self.notified = []      # (jobId, status) of notified jobs not yet returned by poll_due()
+        self.early = {}         # jobId -> notified status of a job that has not been added yet
+        self.max_early = 10000
+        self.woken = False
+        self.next_slot = 0.0    # earliest time the next poll may be sent under max_polls_per_second
+
+        # exponential moving average of observed render times
+        self.render_time = None
+        self.render_time_weight = 0.2
+
+        self.total_jobs = 0
+        self.total_polls = 0
+        self.total_notified = 0
+        self.total_poll_errors = 0
+        self.max_polls = 0
+
+    def add(self, job_id, expected_render_time=None, observe=None):
+        # Starts tracking a job, which should be added as soon as its generate response arrives. The first poll is
+        # scheduled using the expected render time, if any. observe(render_seconds), if given, is called with the
+        # render time of the job if it finishes, estimated as for the moving average.
+        with self.lock:
+            now = time.monotonic()
+            job = {"added": now, "last_pending": now, "polls": 0, "late_polls": 0, "expected": expected_render_time, "observe": observe, "errors": 0}
+            self.jobs[job_id] = job
+            heapq.heappush(self.queue, (now + self.interval(job, now), job_id))
+            if job_id in self.early:
+                self.complete_notified(job_id, self.early.pop(job_id))
+
+    def __len__(self):
+        return len(self.jobs)
+
+    def expected_render_time(self, job):
+        if job["expected"] is not None:
+            return job["expected"]
+        return self.render_time
+
+    def interval(self, job, now):
+        age = now - job["added"]
+        expected = self.expected_render_time(job)
+        interval = poll_interval(age, expected, job["polls"], job["late_polls"], self.min_interval, self.max_interval, self.backoff)
+        if expected is None or age >= expected:
+            job["late_polls"] += 1
+        return interval
+
+    def next_delay(self):
+        # Seconds until the next poll is due, or None if no jobs are being tracked.
+        with self.lock:
+            if not self.queue:
+                return None
+            now = time.monotonic()
+            return max(0.0, self.queue[0][0] - now, self.next_slot - now)
+
+    def poll_due(self):
+        # Polls every job whose next poll is due. Returns a list of (jobId, status) for jobs that finished or failed.
+        # The due jobs are taken off the queue under the lock, but their status requests are made without it, so a
+        # slow request does not hold up add(), notify(), wake() or the wait() of other threads. A status request that
+        # raises is logged and retried with backoff rather than ending the poll.
+        with self.lock:
+            done, self.notified = self.notified, []
+            due = []
+            now = time.monotonic()
+            while self.queue:
+                if self.queue[0][0] > now or self.next_slot > now:
+                    break
+                _, job_id = heapq.heappop(self.queue)
+                if job_id not in self.jobs:
+                    # completed by a notification
+                    continue
+                if self.max_polls_per_second:
+                    self.next_slot = max(now, self.next_slot) + 1.0 / self.max_polls_per_second
+                due.append(job_id)
+
+        for job_id in due:
+            try:
+                status = self.check_status(job_id)
+            except Exception as e:
+                # a connection error that outlasted the retries or a response that is not json fails this poll
+                # only; the job is polled again after a backoff and the other due jobs are still polled
+                print("Status request for job {} failed ({}), retrying".format(job_id, e))
+                with self.lock:
+                    job = self.jobs.get(job_id)
+                    if job is not None:
+                        now = time.monotonic()
+                        self.total_poll_errors += 1
+                        job["errors"] += 1
+                        delay = max(self.interval(job, now), min(self.max_interval, self.min_interval * self.backoff ** job["errors"]))
+                        heapq.heappush(self.queue, (now + delay, job_id))
+                continue
+
+            with self.lock:
+                job = self.jobs.get(job_id)
+                if job is None:
+                    # completed by a notification or removed while its status was requested
+                    continue
+                now = time.monotonic()
+                job["polls"] += 1
+                job["errors"] = 0
+                self.total_polls += 1
+                if status.get("status") in ("finished", "failed"):
+                    self.finish(job_id, status, polled=now)
+                    done.append((job_id, status))
+                else:
+                    job["last_pending"] = now
+                    heapq.heappush(self.queue, (now + self.interval(job, now), job_id))
+        return done
+
+    def notify(self, job_id, status):
+        # Completes job_id with a 'finished' or 'failed' status received from a notification.
+        with self.lock:
+            self.total_notified += 1
+            if job_id in self.jobs:
+                self.complete_notified(job_id, status)
+            else:
+                self.early[job_id] = status
+                while len(self.early) > self.max_early:
+                    # jobs of other clients sharing the callback, or notified twice
+                    del self.early[next(iter(self.early))]
+
+    def complete_notified(self, job_id, status):
+        self.finish(job_id, status)
+        self.notified.append((job_id, status))
+        self.changed.notify_all()
+
+    def wake(self, *args):
+        # Ends the current sleep() early, eg. when a download finishes.
+        with self.lock:
+            self.woken = True
+            self.changed.notify_all()
+
+    def sleep(self, timeout):
+        # Waits up to timeout seconds (forever if None) or until a notification arrives or wake() is called.
+        with self.lock:
+            if not self.woken and not self.notified:
+                self.changed.wait(timeout)
+            self.woken = False
+
+    def finish(self, job_id, status, polled=None):
+        # polled is the time of the status response that showed the job finished, None for a notification
+        job = self.jobs.pop(job_id)
+        if status["status"] == "finished":
+            now = time.monotonic()
+            if polled is None:
+                render_time = now - job["added"]
+            else:
+                # the job finished between the last response that showed it pending and this one; taking the
+                # midpoint rather than the time it was seen keeps late polls from inflating the estimate, which
+                # would delay the polls of the next jobs further
+                render_time = (job["last_pending"] + polled) / 2 - job["added"]
+            if self.render_time is None:
+                self.render_time = render_time
+            else:
+                self.render_time += self.render_time_weight * (render_time - self.render_time)
+            if job["observe"] is not None:
+                job["observe"](render_time)
+
+        self.total_jobs += 1
+        self.max_polls = max(self.max_polls, job["polls"])
+        if self.stats_hook:
+            self.stats_hook(job_id, job["polls"], status)
+
+    def hand_back(self, job_id, status):
+        # Passes a status returned by poll_due() for a job the caller does not track to the wait() call that does.
+        with self.lock:
+            self.completed[job_id] = status
+            self.changed.notify_all()
+
+    def remove(self, job_id):
+        # Stops tracking a job without waiting for it to complete.
+        with self.lock:
+            self.jobs.pop(job_id, None)
+            self.completed.pop(job_id, None)
+
+    def wait(self, job_id, expected_render_time=None, deadline=None):
+        # Blocks until job_id finishes or fails and returns its final status.
+        # With a deadline (see hedging.Deadline) it stops tracking the job and returns None once the deadline has passed.
+        # Safe to call from several threads at once; whichever thread is polling serves all of them.
+        with self.lock:
+            if job_id not in self.jobs and job_id not in self.completed:
+                self.add(job_id, expected_render_time)
+        while True:
+            done = self.poll_due()
+            with self.lock:
+                for done_id, status in done:
+                    self.completed[done_id] = status
+                if done:
+                    # wake the other threads waiting for one of these jobs
+                    self.changed.notify_all()
+                if job_id in self.completed:
+                    return self.completed.pop(job_id)
+                delay = self.next_delay()
+                if delay is None:
+                    delay = self.min_interval
+                if deadline is not None:
+                    if deadline.expired():
+                        self.remove(job_id)
+                        return None
+                    delay = min(delay, deadline.remaining())
+                self.changed.wait(delay)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "jobs_completed": self.total_jobs,
+                "jobs_in_flight": len(self.jobs),
+                "polls": self.total_polls,
+                "notifications": self.total_notified,
+                "poll_errors": self.total_poll_errors,
+                "polls_per_job": self.total_polls / self.total_jobs if self.total_jobs else 0.0,
+                "max_polls_per_job": self.max_polls,
+                "expected_render_time": self.render_time,
+            }
@@ -0,0 +1,85 @@
+from .client import SyncAiClient, get_tts_params
+
+
+def build_job(text, language, target_rig, actor=None, camera=None, tts_voice=None, tts_speed=None, background_rgb=None, audio_url=None, audio_file=None, emotion="", emotion_level=1, frame_width=None, frame_height=None):
+    # Builds the job dictionary sent to the generate endpoint for a video request.
+    if audio_url and audio_file:
+        raise Exception("Only one of audio_file or audio_url should be supplied.")
+
+    is_ssml = False
+    if "<speak>" in text:
+        is_ssml = True
+
+    # set emotion and level
+    emotion_obj = None
+    if emotion:
+        emotion_obj = {
+            "level": emotion_level,
+            "expression": emotion
+        }
+
+    # set background color
+    background_color = None
+    if background_rgb:
+        red, green, blue = background_rgb.split(",")
+        background_color = {
+            "red": int(red),
+            "green": int(green),
+            "blue": int(blue),
+        }
+
+    output = {
+        "type": "video",
+        "width": frame_width,
+        "height": frame_height,
+        "background_color": background_color
+    }
+
+    job = {
+        "target_rig": target_rig,
+        "text": text,
+        "language": language,
+        "tts_params": get_tts_params(tts_voice, tts_speed),
+        "output": output,
+        "is_ssml": is_ssml,
+        "wait_time": None,
+    }
+
+    if actor:
+        job["actor"] = actor
+
+    if camera is not None:
+        job["camera"] = camera
+
+    if emotion_obj:
+        job["emotion"] = emotion_obj
+
+    if audio_url and audio_file:
+        raise Exception("Both audio_url and audio_path are given. Only one can be used.")
+    elif audio_url:
+        job["audio_url"] = audio_url
+
+    return job
+
+
+class SyncAiVideoClient(SyncAiClient):
+    """
+    Client for video generation, see SyncAiClient for the shared batch, polling and download machinery.
+
+    Batch input samples for generate_and_download_from_file look like
+        {"language": "en-US", "text": "I am powered by Emotech's revolutionary A.I. technology", "camera": 0, "actor": "caprica", "output_file": "/path/to/my_video.mp4"}
+        {"language": "ar", "actor": "laura", "text": "...", "camera": 7, "background_rgb": "150,120,180", "emotion": "sad", "emotion_level": 0.5, "output_file": "/path/to/my_video2.mp4"}
+    The target rig is always metahumans for generating video content.
+    """
+
+    default_url = "https://lipsync-ai.api.emotechlab.com/lipsync"
+    default_output_type = "video"
+    valid_fields = ['language', 'actor', 'text', 'camera', 'background_rgb', 'sentences_file', 'tts_voice', 'tts_speed', 'target_rig', 'audio_url', 'audio_file', 'emotion', 'emotion_level', 'token', 'frame_height', 'frame_width', 'output_dir', 'output_file']
+    fixed_fields = {"target_rig": "metahumans"}
+    build_job = staticmethod(build_job)
+
+    def generate(self, text, language, target_rig, actor=None, camera=None, tts_voice=None, tts_speed=None, background_rgb=None, audio_url=None, audio_file=None, emotion="", emotion_level=1, frame_width=None, frame_height=None, display=False, deadline=None):
+        # Sends a request to generate a video.
+        # deadline (a Deadline or seconds) is the time budget of the job, used by download_content as well
+        job = build_job(text, language, target_rig, actor=actor, camera=camera, tts_voice=tts_voice, tts_speed=tts_speed, background_rgb=background_rgb, audio_url=audio_url, audio_file=audio_file, emotion=emotion, emotion_level=emotion_level, frame_width=frame_width, frame_height=frame_height)
+        return self.submit(job, audio_file=audio_file, display=display, deadline=deadline)
@@ -0,0 +1,73 @@
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "Benchmarks"))
+
+from mock_server import MockSyncAiState, start_server
+
+
+@pytest.fixture
+def mock_api():
+    # Starts a mock Sync-AI API with the given MockSyncAiState options and returns (state, url).
+    servers = []
+
+    def start(**options):
+        options.setdefault("render_distribution", "constant")
+        options.setdefault("render_mean", 0.1)
+        options.setdefault("seed", 0)
+        state = MockSyncAiState(**options)
+        server = start_server(state)
+        servers.append(server)
+        return state, f"http://127.0.0.1:{server.server_address[1]}/lipsync/"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def scripted_api():
+    # Starts a server that answers the n-th request with replies[n] = (delay in seconds, status code) and
+    # returns (requests received, url).
+    servers = []
+
+    def start(replies):
+        received = []
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def reply(self):
+                self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                received.append(self.command)
+                delay, code = replies[min(len(received), len(replies)) - 1]
+                time.sleep(delay)
+                body = json.dumps({"jobId": "job{}".format(len(received)), "status": "processing"}).encode("utf-8")
+                self.send_response(code)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_GET = do_POST = reply
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return received, f"http://127.0.0.1:{server.server_address[1]}/lipsync/"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,75 @@
+import csv
+import numpy as np
+import pytest
+from syncai.animation_curves import AnimationCurves, convert_csv
+
+
+def write_csv(path, header, rows):
+    with open(path, "w", newline="") as fp:
+        csv.writer(fp).writerows([header] + rows)
+    return str(path)
+
+
+def ramp(frames=5, fps=10):
+    times = np.arange(frames) / fps
+    return AnimationCurves(["JawOpen", "Smile"], times, np.stack([times, 1 - times], axis=1), fps)
+
+
+def test_from_csv_reads_timecodes_and_skips_text_columns(tmp_path):
+    path = write_csv(tmp_path / "curves.csv", ["Timecode", "JawOpen", "Label", "Smile"], [
+        ["00:00:00:00", "0.0", "a", "1"],
+        ["00:00:00:30", "0.5", "b", "1"],
+        ["00:00:01:00", "1.0", "c", "0"],
+    ])
+    curves = AnimationCurves.from_csv(path, fps=60)
+    assert curves.channels == ["JawOpen", "Smile"]
+    assert curves.times.tolist() == [0.0, 0.5, 1.0]
+    assert curves.channel("JawOpen").tolist() == [0.0, 0.5, 1.0]
+    assert curves.duration == 1.0
+
+
+def test_resample_interpolates_every_channel():
+    curves = ramp().resample(20)
+    assert len(curves) == 9
+    assert curves.fps == 20
+    np.testing.assert_allclose(curves.times, np.arange(9) / 20)
+    np.testing.assert_allclose(curves.channel("JawOpen"), curves.times, atol=1e-6)
+    np.testing.assert_allclose(curves.channel("Smile"), 1 - curves.times, atol=1e-6)
+
+
+def test_reduce_keyframes_keeps_only_the_corners():
+    times = np.arange(11) / 10
+    jaw = np.minimum(times, 0.5)
+    curves = AnimationCurves(["JawOpen"], times, jaw[:, None]).reduce_keyframes(1e-4)
+    assert curves.times.tolist() == [0.0, 0.5, 1.0]
+    assert curves.fps is None
+    np.testing.assert_allclose(AnimationCurves(["JawOpen"], curves.times, curves.values).sample(times)[:, 0], jaw, atol=1e-4)
+
+
+def test_reduce_keyframes_checks_every_channel():
+    times = np.arange(5) / 10
+    values = np.array([[0.0, 0.0], [0.1, 0.0], [0.2, 0.1], [0.3, 0.0], [0.4, 0.0]])
+    assert len(AnimationCurves(["JawOpen"], times, values[:, :1]).reduce_keyframes(0.05)) == 2
+    assert AnimationCurves(["JawOpen", "Smile"], times, values).reduce_keyframes(0.05).times.tolist() == [0.0, 0.1, 0.2, 0.3, 0.4]
+    assert AnimationCurves(["JawOpen", "Smile"], times, values).reduce_keyframes(0.2).times.tolist() == [0.0, 0.4]
+
+
+def test_binary_round_trip_is_memory_mapped(tmp_path):
+    curves = ramp(frames=7)
+    path = str(tmp_path / "curves.crv")
+    curves.save(path)
+    loaded = AnimationCurves.load(path)
+    assert loaded.channels == curves.channels
+    assert loaded.fps == curves.fps
+    np.testing.assert_array_equal(loaded.times, curves.times)
+    np.testing.assert_array_equal(loaded.values, curves.values)
+    assert not loaded.values.flags.writeable
+    with pytest.raises(Exception, match="No animation curves"):
+        AnimationCurves.from_buffer(b"\0" * 128)
+
+
+def test_convert_csv(tmp_path):
+    path = write_csv(tmp_path / "curves.csv", ["time", "JawOpen"], [[str(t / 10), str(t / 10)] for t in range(11)])
+    curves = convert_csv(path, str(tmp_path / "curves.crv"), resample_fps=20, tolerance=1e-3)
+    assert curves.times.tolist() == [0.0, 1.0]
+    assert AnimationCurves.load(str(tmp_path / "curves.crv")).times.tolist() == [0.0, 1.0]
@@ -0,0 +1,74 @@
+import asyncio
+import os
+import pytest
+from mock_server import CONTENT_PERIOD
+from syncai.async_client import AsyncSyncAiAnimationClient, AsyncSyncAiVideoClient
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_concurrent_jobs_are_generated_and_downloaded(mock_api, tmp_path):
+    state, url = mock_api(file_size=100 * 1024, render_mean=0.2)
+
+    async def main():
+        async with AsyncSyncAiVideoClient("test", url=url, min_poll_interval=0.05) as client:
+            return await asyncio.gather(*(
+                client.generate_and_download(str(tmp_path / f"{i}.mp4"), text=f"Hello {i}", language="en-US", target_rig="metahumans", actor="caprica")
+                for i in range(20)
+            )), client.render_time
+
+    responses, render_time = run(main())
+    assert all("jobId" in response for response in responses)
+    assert state.counts["generate"] == 20
+    assert render_time == pytest.approx(0.2, abs=0.15)
+    for i in range(20):
+        with open(tmp_path / f"{i}.mp4", "rb") as fp:
+            assert fp.read() == bytes(i % CONTENT_PERIOD for i in range(100 * 1024))
+    assert sorted(os.listdir(tmp_path)) == sorted(f"{i}.mp4" for i in range(20))
+
+
+def test_failed_job_returns_its_status(mock_api, tmp_path):
+    _, url = mock_api(failure_rate=1.0)
+
+    async def main():
+        async with AsyncSyncAiAnimationClient("test", url=url, min_poll_interval=0.05) as client:
+            return await client.generate_and_download(str(tmp_path / "out.csv"), text="Hello", language="en-US", target_rig="metahumans", actor="caprica")
+
+    response, status = run(main())
+    assert status["status"] == "failed"
+    assert os.listdir(tmp_path) == []
+
+
+def test_generate_is_retried_on_429(mock_api):
+    state, url = mock_api(generate_rate_limit=1)
+
+    async def main():
+        async with AsyncSyncAiVideoClient("test", url=url, backoff_factor=0.01) as client:
+            return [await client.generate("Hello", "en-US", "metahumans", actor="caprica") for _ in range(2)]
+
+    assert all("jobId" in response for response in run(main()))
+    assert state.counts["throttled"] >= 1
+
+
+def test_generate_is_not_retried_after_a_server_error(scripted_api):
+    received, url = scripted_api([(0, 503), (0, 200)])
+
+    async def main():
+        async with AsyncSyncAiVideoClient("test", url=url, backoff_factor=0.01) as client:
+            return await client.generate("Hello", "en-US", "metahumans", actor="caprica")
+
+    assert run(main()) == {"error": "curl request failed"}
+    assert received == ["POST"]
+
+
+def test_status_is_retried_on_server_error(scripted_api):
+    received, url = scripted_api([(0, 503), (0, 200)])
+
+    async def main():
+        async with AsyncSyncAiVideoClient("test", url=url, backoff_factor=0.01) as client:
+            return await client.check_status("job")
+
+    assert run(main())["status"] == "processing"
+    assert received == ["GET", "GET"]
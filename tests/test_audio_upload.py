@@ -0,0 +1,110 @@
+import os
+import wave
+import numpy as np
+import pytest
+from syncai.audio_upload import AudioPreprocessor, MultipartStream, preprocess_wav, read_wav_header
+from syncai.video import SyncAiVideoClient
+
+
+def write_wav(path, seconds=1.0, rate=44100, channels=2, frequency=440.0):
+    t = np.arange(int(seconds * rate)) / rate
+    tone = (0.5 * np.sin(2 * np.pi * frequency * t) * 2 ** 15).astype("<i2")
+    with wave.open(str(path), "wb") as fp:
+        fp.setnchannels(channels)
+        fp.setsampwidth(2)
+        fp.setframerate(rate)
+        fp.writeframes(np.repeat(tone[:, None], channels, axis=1).tobytes())
+    return str(path)
+
+
+def test_multipart_stream_reads_files_from_disk(tmp_path):
+    audio_file = tmp_path / "audio.wav"
+    audio_file.write_bytes(bytes(range(256)) * 1000)
+    with MultipartStream([("audio", "audio.wav", str(audio_file)), ("job", "job", b'{"text": "Hello"}')], boundary="b", block_size=1000) as stream:
+        expected = (b'--b\r\nContent-Disposition: form-data; name="audio"; filename="audio.wav"\r\n\r\n' + audio_file.read_bytes() + b"\r\n"
+                    b'--b\r\nContent-Disposition: form-data; name="job"; filename="job"\r\n\r\n{"text": "Hello"}\r\n--b--\r\n')
+        assert len(stream) == len(expected)
+        assert b"".join(stream) == expected
+        assert all(len(block) <= 1000 for block in stream)
+        # rewound by urllib3 before a retry
+        stream.seek(0)
+        assert stream.read(10) == expected[:10]
+        stream.seek(-5, os.SEEK_END)
+        assert stream.read() == expected[-5:]
+
+
+def test_multipart_stream_is_sent_with_a_content_length(scripted_api, tmp_path):
+    import requests
+    audio_file = tmp_path / "audio.wav"
+    audio_file.write_bytes(b"\1" * 100000)
+    received, url = scripted_api([(0, 200)])
+    with MultipartStream([("audio", "audio.wav", str(audio_file))]) as stream:
+        resp = requests.post(url + "generate", data=stream, headers={"Content-Type": stream.content_type})
+        assert resp.request.headers["Content-Length"] == str(len(stream))
+        assert "Transfer-Encoding" not in resp.request.headers
+    assert received == ["POST"]
+
+
+def test_preprocess_wav_downmixes_and_resamples(tmp_path):
+    source = write_wav(tmp_path / "in.wav", rate=44100, channels=2)
+    target = str(tmp_path / "out.wav")
+    assert preprocess_wav(source, target, sample_rate=16000) == target
+    format_tag, channels, rate, width, offset, length = read_wav_header(target)
+    assert (format_tag, channels, rate, width) == (1, 1, 16000, 2)
+    assert length == 16000 * 2
+    with wave.open(target, "rb") as fp:
+        samples = np.frombuffer(fp.readframes(fp.getnframes()), dtype="<i2") / 2 ** 15
+    # the tone passes the low-pass filter at its original level
+    assert np.abs(samples[1000:-1000]).max() == pytest.approx(0.5, abs=0.02)
+
+
+def test_preprocess_wav_leaves_small_and_other_files_alone(tmp_path):
+    small = write_wav(tmp_path / "small.wav", rate=16000, channels=1)
+    assert preprocess_wav(small, str(tmp_path / "out.wav")) is None
+    other = tmp_path / "audio.mp3"
+    other.write_bytes(b"ID3" + b"\0" * 1000)
+    assert preprocess_wav(str(other), str(tmp_path / "out.wav")) is None
+    assert not os.path.exists(tmp_path / "out.wav")
+
+
+def test_converted_files_are_removed_once_released(tmp_path):
+    source = write_wav(tmp_path / "in.wav")
+    preprocessor = AudioPreprocessor(sample_rate=16000, workers=1, output_dir=str(tmp_path / "converted"))
+    try:
+        converted, size = preprocessor.prepare(source)
+        assert size == os.path.getsize(source)
+        assert preprocessor.prepare(source)[0] == converted
+        preprocessor.release(source)
+        assert os.path.exists(converted)
+        preprocessor.release(source)
+        assert preprocessor.futures == {}
+        assert not os.path.exists(converted)
+    finally:
+        preprocessor.close()
+
+
+def test_close_cancels_queued_conversions(tmp_path):
+    sources = [write_wav(tmp_path / f"{i}.wav", seconds=2.0 + i) for i in range(4)]
+    preprocessor = AudioPreprocessor(sample_rate=16000, workers=1)
+    futures = [preprocessor.submit(source) for source in sources]
+    preprocessor.close()
+    assert any(future.cancelled() for future in futures)
+    assert all(future.done() for future in futures)
+    assert not os.path.exists(preprocessor.output_dir)
+
+
+def test_batch_uploads_converted_audio(mock_api, tmp_path):
+    _, url = mock_api(file_size=100)
+    source = write_wav(tmp_path / "in.wav")
+    client = SyncAiVideoClient(token="test", url=url, min_poll_interval=0.05, audio_sample_rate=16000, audio_workers=1)
+    jobs = [{"language": "en-US", "text": f"clip {i}", "audio_file": source, "output_file": str(tmp_path / f"{i}.mp4")} for i in range(3)]
+    try:
+        summary = client.run_batch(jobs, concurrency=2)
+        assert summary["submitted"] == summary["downloaded"] == 3
+        metrics = client.metrics.summary()
+        assert metrics["upload_bytes"]["max"] < os.path.getsize(source) / 4
+        assert metrics["upload_bytes_saved"] > 0
+        assert client.audio.futures == {}
+        assert os.listdir(client.audio.output_dir) == []
+    finally:
+        client.close()
@@ -0,0 +1,111 @@
+import json
+import os
+import pytest
+from syncai.batch_journal import BatchJournal
+from syncai.batch_shards import merge_results
+from syncai.video import SyncAiVideoClient
+
+
+def make_client(url, **options):
+    return SyncAiVideoClient(token="test", url=url, min_poll_interval=0.05, **options)
+
+
+def make_jobs(output_dir, texts):
+    return [{"language": "en-US", "text": text, "actor": "caprica", "output_file": os.path.join(output_dir, f"{i}.mp4")} for i, text in enumerate(texts)]
+
+
+def write_input(path, jobs):
+    with open(path, "w") as fp:
+        for job in jobs:
+            fp.write(json.dumps(job) + "\n")
+    return str(path)
+
+
+@pytest.mark.parametrize("concurrency", [1, 4])
+def test_identical_jobs_are_generated_once(mock_api, tmp_path, concurrency):
+    state, url = mock_api(file_size=1000)
+    client = make_client(url)
+    jobs = make_jobs(tmp_path, ["same"] * 4 + ["other"])
+
+    summary = client.run_batch(jobs, concurrency=concurrency)
+    client.close()
+
+    assert state.counts["generate"] == 2
+    assert summary["downloaded"] == 5
+    assert summary["duplicate"] == 3
+    for job in jobs:
+        assert os.path.getsize(job["output_file"]) == 1000
+
+
+def test_failed_jobs_do_not_leak_cache_keys(mock_api, tmp_path):
+    _, url = mock_api(failure_rate=1.0)
+    client = make_client(url, cache_dir=str(tmp_path / "cache"))
+
+    summary = client.run_batch(make_jobs(tmp_path, ["a", "b", "c"]), concurrency=2)
+    client.close()
+
+    assert summary["failed"] == 3
+    assert client.job_keys == {}
+    assert client.deadlines == {}
+
+
+def test_results_file_is_written_from_the_journal(mock_api, tmp_path):
+    _, url = mock_api(file_size=100)
+    input_file = write_input(tmp_path / "inputs.jsonl", make_jobs(tmp_path, ["a", "b", "a"]))
+    client = make_client(url)
+
+    summary = client.generate_and_download_from_file(input_file, concurrency=2)
+    client.close()
+
+    assert summary["downloaded"] == 3 and summary["duplicate"] == 1
+
+    with open(tmp_path / "inputs_results.json") as fp:
+        results = json.load(fp)
+    assert sorted(results) == ["0", "1", "2"]
+    assert results["2"] == results["0"]
+    assert BatchJournal(str(tmp_path / "inputs_journal.jsonl"), read_only=True).completed()
+
+
+def test_merge_waits_for_every_shard_and_leaves_journals_alone(mock_api, tmp_path):
+    _, url = mock_api(file_size=100)
+    input_file = write_input(tmp_path / "inputs.jsonl", make_jobs(tmp_path, [f"text {i}" for i in range(10)]))
+    client = make_client(url)
+    client.generate_and_download_from_file(input_file, concurrency=4, shard_index=0, shard_count=2)
+
+    with pytest.raises(Exception, match="have not finished"):
+        merge_results(input_file, 2)
+    journal_file = tmp_path / "inputs_shard0of2_journal.jsonl"
+    journal = journal_file.read_bytes()
+    report = merge_results(input_file, 2, partial=True)
+    assert journal_file.read_bytes() == journal
+    assert report["pending_shards"] == [1]
+    assert report["merged"] + len(report["missing"]) == 10
+
+    client.generate_and_download_from_file(input_file, concurrency=4, shard_index=1, shard_count=2)
+    client.close()
+    report = merge_results(input_file, 2)
+    assert report["merged"] == 10
+    assert report["missing"] == [] and report["duplicated"] == [] and report["pending_shards"] == []
+
+
+def test_generate_timeouts_fail_only_their_job(mock_api, tmp_path):
+    state, url = mock_api(file_size=100, generate_stall_rate=0.4, stall_seconds=2.0, seed=1)
+    client = make_client(url, read_timeout=1.0)
+
+    summary = client.run_batch(make_jobs(tmp_path, [f"text {i}" for i in range(5)]), concurrency=2)
+    client.close()
+
+    assert 1 <= state.counts["stalled"] < 5
+    assert summary["generate_failed"] == state.counts["stalled"]
+    assert summary["downloaded"] == 5 - state.counts["stalled"]
+
+
+def test_job_deadline_does_not_include_throttling(mock_api, tmp_path):
+    # at one submission every 2 seconds the second job waits longer than its deadline to be submitted
+    _, url = mock_api(file_size=100)
+    client = make_client(url, max_submissions_per_second=0.5)
+
+    summary = client.run_batch(make_jobs(tmp_path, ["a", "b"]), job_deadline=1.0)
+    client.close()
+
+    assert summary["downloaded"] == 2
@@ -0,0 +1,112 @@
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import pytest
+import syncai.animation
+import syncai.video
+from syncai.cli import build_parser, main
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def write_input(path, jobs):
+    with open(path, "w") as fp:
+        for job in jobs:
+            fp.write(json.dumps(job) + "\n")
+    return str(path)
+
+
+def video_jobs(output_dir, count):
+    return [{"language": "en-US", "text": f"text {i}", "actor": "caprica", "output_file": os.path.join(output_dir, f"{i}.mp4")} for i in range(count)]
+
+
+def load_script(path):
+    spec = importlib.util.spec_from_file_location(os.path.splitext(os.path.basename(path))[0], path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_batch_and_daemon_arguments_are_parsed():
+    args = build_parser().parse_args(["animation", "batch", "--token", "t", "--input_file", "in.jsonl", "--concurrency", "4", "--archive_file", "curves"])
+    assert args.client == "animation" and args.command == "batch"
+    assert args.concurrency == 4 and args.archive_file == "curves" and args.shard_count == 1 and args.job_deadline is None
+
+    args = build_parser().parse_args(["video", "daemon", "--token", "t"])
+    assert args.socket is None and args.port is None and args.host == "127.0.0.1" and args.root == "." and args.concurrency == 8
+
+    with pytest.raises(SystemExit):
+        build_parser().parse_args(["video", "batch", "--token", "t", "--input_file", "in.jsonl", "--archive_file", "curves"])
+    with pytest.raises(SystemExit):
+        build_parser().parse_args(["video", "validate"])
+
+
+def test_validate_reports_invalid_jobs(tmp_path, capsys):
+    jobs = video_jobs(tmp_path, 2)
+    assert main(["video", "validate", "--input_file", write_input(tmp_path / "valid.jsonl", jobs)]) == 0
+    assert "2 of 2 jobs are valid" in capsys.readouterr().out
+
+    jobs.append({"language": "en-US", "text": "missing audio", "audio_file": str(tmp_path / "missing.wav"), "output_file": str(tmp_path / "2.mp4")})
+    assert main(["video", "validate", "--input_file", write_input(tmp_path / "invalid.jsonl", jobs)]) == 1
+    out = capsys.readouterr().out
+    assert "Input sample 2" in out and "2 of 3 jobs are valid" in out
+
+    assert main(["video", "validate", "--input_file", str(tmp_path / "nothing.jsonl")]) == 1
+    assert "Cannot read" in capsys.readouterr().out
+
+
+def test_batch_runs_against_the_api_and_prints_the_summary(mock_api, tmp_path, monkeypatch, capsys):
+    _, url = mock_api(file_size=100)
+    monkeypatch.setattr(syncai.video.SyncAiVideoClient, "default_url", url)
+    jobs = video_jobs(tmp_path, 3)
+
+    assert main(["video", "batch", "--token", "t", "--input_file", write_input(tmp_path / "inputs.jsonl", jobs), "--concurrency", "2"]) == 0
+
+    assert "'downloaded': 3" in capsys.readouterr().out
+    for job in jobs:
+        assert os.path.getsize(job["output_file"]) == 100
+
+
+def test_merge_of_unfinished_shards_needs_partial(mock_api, tmp_path, monkeypatch, capsys):
+    _, url = mock_api(file_size=10)
+    monkeypatch.setattr(syncai.video.SyncAiVideoClient, "default_url", url)
+    input_file = write_input(tmp_path / "inputs.jsonl", video_jobs(tmp_path, 4))
+    assert main(["video", "batch", "--token", "t", "--input_file", input_file, "--shard_index", "0", "--shard_count", "2"]) == 0
+    capsys.readouterr()
+
+    assert main(["merge", "--input_file", input_file, "--shard_count", "2"]) == 1
+    assert "have not finished" in capsys.readouterr().out
+    assert not os.path.exists(tmp_path / "inputs_results.json")
+
+    assert main(["merge", "--input_file", input_file, "--shard_count", "2", "--partial"]) == 1
+    out = capsys.readouterr().out
+    assert "Shards that have not finished, left out of the merge: [1]" in out and "Jobs with no result" in out
+
+    assert main(["video", "batch", "--token", "t", "--input_file", input_file, "--shard_index", "1", "--shard_count", "2"]) == 0
+    assert main(["merge", "--input_file", input_file, "--shard_count", "2"]) == 0
+    assert "Merged 4 of 4 jobs" in capsys.readouterr().out
+
+
+def test_legacy_client_modules_reexport_the_package():
+    video_client = load_script(os.path.join(ROOT, "VideoGeneration", "video_client.py"))
+    assert video_client.SyncAiVideoClient is syncai.video.SyncAiVideoClient
+    assert video_client.build_job is syncai.video.build_job
+
+    animation_client = load_script(os.path.join(ROOT, "AnimationCurveGeneration", "animation_client.py"))
+    assert animation_client.SyncAiAnimationClient is syncai.animation.SyncAiAnimationClient
+    assert animation_client.file_extension_from_output_type is syncai.animation.file_extension_from_output_type
+
+
+@pytest.mark.parametrize("script, option", [
+    ("VideoGeneration/single_request.py", "--camera"),
+    ("VideoGeneration/multiple_requests_from_file.py", "--concurrency"),
+    ("AnimationCurveGeneration/single_request.py", "--segmented"),
+    ("AnimationCurveGeneration/multiple_requests_from_file.py", "--archive_file"),
+])
+def test_legacy_scripts_run_their_command(script, option):
+    # run from another directory, as the scripts are, to check they find the package themselves
+    result = subprocess.run([sys.executable, os.path.join(ROOT, script), "--help"], cwd=os.path.dirname(ROOT), capture_output=True, text=True)
+    assert result.returncode == 0
+    assert option in result.stdout
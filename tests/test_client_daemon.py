@@ -0,0 +1,108 @@
+import http.client
+import json
+import os
+import stat
+import pytest
+from syncai.client_daemon import ClientDaemon
+from syncai.daemon_client import DaemonClient
+from syncai.video import SyncAiVideoClient
+
+
+@pytest.fixture
+def daemon(mock_api, tmp_path):
+    # a daemon serving tmp_path / "root" on a Unix socket, returns (mock state, daemon, client options)
+    state, url = mock_api(file_size=1000)
+    root = tmp_path / "root"
+    root.mkdir()
+    client_daemon = ClientDaemon(SyncAiVideoClient(token="test", url=url, min_poll_interval=0.05), concurrency=4, root=str(root))
+    options = {"socket_path": str(tmp_path / "d.sock"), "token_file": str(tmp_path / "run" / "d.token")}
+    client_daemon.serve(**options)
+    yield state, client_daemon, options
+    client_daemon.close()
+
+
+def job(output_file, text="Hello"):
+    return {"text": text, "language": "en-US", "actor": "caprica", "output_file": output_file}
+
+
+def test_identical_jobs_share_one_generate_request(daemon, tmp_path):
+    state, client_daemon, options = daemon
+    with DaemonClient(**options) as client:
+        records = [client.submit(**job(f"{i}.mp4")) for i in range(3)]
+        records = [client.wait(record["id"], timeout=10) for record in records]
+        assert all(record["state"] == "finished" for record in records)
+        assert records[1]["duplicate_of"] == records[0]["id"]
+        assert client.stats()["jobs"]["deduplicated"] == 2
+    assert state.counts["generate"] == 1
+    for i in range(3):
+        assert os.path.getsize(tmp_path / "root" / f"{i}.mp4") == 1000
+
+
+def test_socket_and_token_file_are_private(daemon):
+    _, client_daemon, options = daemon
+    assert stat.S_IMODE(os.stat(options["socket_path"]).st_mode) == 0o600
+    assert stat.S_IMODE(os.stat(options["token_file"]).st_mode) == 0o600
+    assert stat.S_IMODE(os.stat(os.path.dirname(options["token_file"])).st_mode) == 0o700
+    with open(options["token_file"]) as fp:
+        assert fp.read() == client_daemon.token
+
+
+def test_files_outside_the_root_are_refused(daemon, tmp_path):
+    _, _, options = daemon
+    outside = tmp_path / "outside.mp4"
+    outside.write_bytes(b"keep")
+    os.symlink(str(outside), str(tmp_path / "root" / "link.mp4"))
+    with DaemonClient(**options) as client:
+        for output_file in (str(outside), "../outside.mp4", "link.mp4"):
+            with pytest.raises(Exception, match="outside the daemon's root directory"):
+                client.submit(**job(output_file))
+        with pytest.raises(Exception, match="audio_file"):
+            client.submit(**job("audio.mp4"), audio_file="/etc/passwd")
+    assert outside.read_bytes() == b"keep"
+
+
+@pytest.fixture
+def tcp_daemon(mock_api, tmp_path):
+    _, url = mock_api()
+    client_daemon = ClientDaemon(SyncAiVideoClient(token="test", url=url), root=str(tmp_path))
+    server = client_daemon.serve(port=0, token_file=str(tmp_path / "d.token"))
+    yield client_daemon, server.server_address[1]
+    client_daemon.close()
+
+
+def request(port, method, path, body=None, headers=None):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    connection.request(method, path, body=body, headers=headers or {})
+    resp = connection.getresponse()
+    response = json.loads(resp.read())
+    connection.close()
+    return resp.status, response
+
+
+def test_requests_without_the_token_are_refused(tcp_daemon):
+    client_daemon, port = tcp_daemon
+    body = json.dumps(job("out.mp4"))
+    assert request(port, "POST", "/jobs", body, {"Content-Type": "application/json"})[0] == 401
+    assert request(port, "GET", "/stats", headers={"Authorization": "Bearer wrong"})[0] == 401
+    assert request(port, "GET", "/stats", headers={"Authorization": "Bearer " + client_daemon.token})[0] == 200
+
+
+def test_requests_from_web_pages_are_refused(tcp_daemon, tmp_path):
+    # a page can send a text/plain POST without a preflight, and browsers add an Origin header to it
+    client_daemon, port = tcp_daemon
+    authorization = {"Authorization": "Bearer " + client_daemon.token}
+    body = json.dumps(job("out.mp4"))
+    assert request(port, "POST", "/jobs", body, {**authorization, "Content-Type": "text/plain", "Origin": "http://evil.example"})[0] == 403
+    assert request(port, "POST", "/jobs", body, {**authorization, "Content-Type": "text/plain"})[0] == 415
+    assert request(port, "GET", "/stats", headers={**authorization, "Origin": "http://evil.example"})[0] == 403
+    assert client_daemon.records == {}
+
+
+def test_bad_wait_is_answered_with_400(tcp_daemon):
+    client_daemon, port = tcp_daemon
+    with DaemonClient(url=f"http://127.0.0.1:{port}", token=client_daemon.token) as client:
+        record = client.submit(**job("out.mp4"))
+        for wait in ("soon", "nan", "-1"):
+            status, response = request(port, "GET", f"/jobs/{record['id']}?wait={wait}", headers={"Authorization": "Bearer " + client_daemon.token})
+            assert status == 400 and "wait" in response["error"]
+        assert client.wait(record["id"], timeout=10)["state"] == "finished"
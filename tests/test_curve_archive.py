@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+from syncai.animation_curves import ALIGNMENT, AnimationCurves
+from syncai.curve_archive import CurveArchive, CurveArchiveWriter
+
+
+def clip(frames, value):
+    times = np.arange(frames) / 60
+    return AnimationCurves(["JawOpen", "Smile"], times, np.full((frames, 2), value), 60)
+
+
+def test_clips_are_found_by_job_id_hash_and_name(tmp_path):
+    path = str(tmp_path / "archive")
+    with CurveArchiveWriter(path) as writer:
+        first = writer.add(clip(3, 0.25), job_id="job1", job_hash="hash1", name="a.csv")
+        writer.add(clip(5, 0.5), job_id="job2", job_hash="hash2", name="b.csv")
+        # a duplicate job shares the stored clip
+        writer.link(first, job_hash="hash1", name="c.csv")
+        assert writer.find("c.csv") == first + 2
+        assert writer.find("missing.csv") is None
+
+    archive = CurveArchive(path)
+    assert len(archive) == 3
+    assert archive.names() == ["a.csv", "b.csv", "c.csv"]
+    assert archive.get(job_id="job2").values.tolist() == [[0.5, 0.5]] * 5
+    assert archive.get(job_hash="hash1").values.tolist() == [[0.25, 0.25]] * 3
+    assert archive.get(name="c.csv").times.tolist() == clip(3, 0).times.tolist()
+    assert archive.get(name="missing.csv") is None
+    with pytest.raises(Exception, match="must be given"):
+        archive.get()
+    archive.close()
+
+
+def test_clips_are_aligned(tmp_path):
+    path = str(tmp_path / "archive")
+    with CurveArchiveWriter(path) as writer:
+        for frames in (1, 2, 3):
+            writer.add(clip(frames, 1.0), name=str(frames))
+        offsets = [row[0] for row in writer.index.execute("SELECT offset FROM clips")]
+    assert offsets[0] == 0
+    assert all(offset % ALIGNMENT == 0 for offset in offsets)
+
+
+def test_reader_sees_clips_appended_after_it_mapped_the_archive(tmp_path):
+    path = str(tmp_path / "archive")
+    writer = CurveArchiveWriter(path)
+    writer.add(clip(2, 0.1), name="first")
+    archive = CurveArchive(path)
+    assert len(archive.get(name="first")) == 2
+
+    # a second writer, as from another process, appends to the same archive
+    with CurveArchiveWriter(path) as other:
+        other.add(clip(400, 0.2), name="second")
+    writer.add(clip(3, 0.3), name="third")
+    writer.close()
+
+    assert len(archive.get(name="second")) == 400
+    assert archive.get(name="third").values[0].tolist() == pytest.approx([0.3, 0.3])
+    assert archive.get(name="first").values[0].tolist() == pytest.approx([0.1, 0.1])
+    archive.close()
+
+
+def test_add_csv(tmp_path):
+    csv_file = tmp_path / "curves.csv"
+    csv_file.write_text("time,JawOpen\n0.0,0.0\n0.5,1.0\n")
+    path = str(tmp_path / "archive")
+    with CurveArchiveWriter(path) as writer:
+        writer.add_csv(str(csv_file), job_id="job", name="curves.csv")
+    assert CurveArchive(path).get(job_id="job").channel("JawOpen").tolist() == [0.0, 1.0]
@@ -0,0 +1,83 @@
+import csv
+import pytest
+from syncai.curve_segments import TAG, format_timecode, merge_curves, parse_timecode, split_text
+
+
+def write_curve(path, header, rows):
+    with open(path, "w", newline="") as fp:
+        csv.writer(fp).writerows([header] + rows)
+    return str(path)
+
+
+def read_rows(path):
+    with open(path, newline="") as fp:
+        return list(csv.reader(fp))
+
+
+def test_plain_text_is_split_into_whole_sentences():
+    text = "First sentence here. Second one! Third? Fourth."
+    assert split_text(text, max_segment_chars=20) == ["First sentence here.", "Second one! Third?", "Fourth."]
+    assert split_text(text) == [text]
+
+
+def test_ssml_is_not_cut_inside_an_element():
+    text = "<speak><emo:express-as type='happy'>One. Two. Three.</emo:express-as> Four. Five.</speak>"
+    segments = split_text(text, max_segment_chars=5)
+    assert segments == ["<speak><emo:express-as type='happy'>One. Two. Three.</emo:express-as> Four.</speak>", "<speak>Five.</speak>"]
+
+
+def test_break_after_a_closed_sentence_stays_with_it():
+    text = "<speak>Hello there. <break time='1s'/> How are you doing today?</speak>"
+    assert split_text(text, max_segment_chars=10) == ["<speak>Hello there. <break time='1s'/></speak>", "<speak>How are you doing today?</speak>"]
+
+
+@pytest.mark.parametrize("text", [
+    "<speak><break time='1s'/>Hello there. How are you? <break time='2s'/></speak>",
+    "<speak>" + "A long sentence. " * 30 + "<break time='1s'/> <break time='1s'/> Done.</speak>",
+    "<speak>Hello <break time='1s'/><break time='1s'/> there. How are you?</speak>",
+])
+def test_no_segment_is_left_without_text(text):
+    for max_segment_chars in (5, 10, 300):
+        segments = split_text(text, max_segment_chars=max_segment_chars)
+        assert all(TAG.sub("", segment).strip() for segment in segments)
+        assert " ".join(TAG.sub("", segment) for segment in segments).split() == TAG.sub("", text).split()
+
+
+def test_timecodes_round_trip():
+    assert parse_timecode("00:01:02:30", 60) == (62 * 60 + 30)
+    assert format_timecode(62 * 60 + 30, 60, "00:00:00:00") == "00:01:02:30"
+    assert format_timecode(62 * 60 + 30.5, 60, "00:00:00:00.000") == "00:01:02:30.500"
+
+
+def test_merge_offsets_timecodes_and_blends_the_seam(tmp_path):
+    header = ["Timecode", "JawOpen"]
+    first = write_curve(tmp_path / "0.csv", header, [["00:00:00:00", "0.0"], ["00:00:00:01", "0.0"], ["00:00:00:02", "0.0"]])
+    second = write_curve(tmp_path / "1.csv", header, [["00:00:00:00", "1.0"], ["00:00:00:01", "1.0"], ["00:00:00:02", "1.0"]])
+    output_file = str(tmp_path / "merged.csv")
+
+    merge_curves([first, second], output_file, fps=60, blend_frames=1)
+    rows = read_rows(output_file)
+    assert rows[0] == header
+    assert [row[0] for row in rows[1:]] == [f"00:00:00:{frame:02d}" for frame in range(6)]
+    assert [float(row[1]) for row in rows[1:]] == [0.0, 0.0, 0.0, 0.5, 1.0, 1.0]
+
+
+def test_merge_offsets_times_in_seconds(tmp_path):
+    header = ["time", "JawOpen", "Label"]
+    first = write_curve(tmp_path / "0.csv", header, [["0.0", "0", "a"], ["0.5", "2", "a"]])
+    second = write_curve(tmp_path / "1.csv", header, [["0.0", "4", "b"], ["0.5", "4", "b"]])
+    output_file = str(tmp_path / "merged.csv")
+
+    merge_curves([first, second], output_file, blend_frames=1)
+    rows = read_rows(output_file)[1:]
+    assert [float(row[0]) for row in rows] == [0.0, 0.5, 1.0, 1.5]
+    # integer curves stay integers and text columns are not blended
+    assert [row[1] for row in rows] == ["0", "2", "3", "4"]
+    assert [row[2] for row in rows] == ["a", "a", "b", "b"]
+
+
+def test_merge_refuses_segments_with_different_columns(tmp_path):
+    first = write_curve(tmp_path / "0.csv", ["time", "JawOpen"], [["0.0", "0"]])
+    second = write_curve(tmp_path / "1.csv", ["time", "MouthClose"], [["0.0", "0"]])
+    with pytest.raises(Exception, match="different columns"):
+        merge_curves([first, second], str(tmp_path / "merged.csv"))
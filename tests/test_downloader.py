@@ -0,0 +1,88 @@
+import os
+import pytest
+from mock_server import file_content
+from syncai.downloader import Downloader
+from syncai.hedging import Deadline, DeadlineExceeded
+from syncai.http_session import PooledSession
+
+SIZE = 1024 * 1024
+
+
+def expected_content(size=SIZE):
+    return b"".join(file_content(start, min(64 * 1024, size - start)) for start in range(0, size, 64 * 1024))
+
+
+def file_url(url, name="job.bin"):
+    return url.replace("/lipsync/", "/files/") + name
+
+
+def test_interrupted_download_resumes_from_part_file(mock_api, tmp_path):
+    _, url = mock_api(file_size=SIZE, bandwidth=2 * SIZE)
+    save_file = str(tmp_path / "out.bin")
+    downloader = Downloader(PooledSession(), chunk_size=16 * 1024)
+
+    with pytest.raises(DeadlineExceeded):
+        downloader.download(file_url(url), save_file, Deadline(0.2))
+    partial = os.path.getsize(save_file + ".part")
+    assert 0 < partial < SIZE
+    assert not os.path.exists(save_file)
+
+    before = downloader.bytes_downloaded
+    assert downloader.download(file_url(url), save_file) == SIZE
+    assert downloader.bytes_downloaded - before == SIZE - partial
+    with open(save_file, "rb") as fp:
+        assert fp.read() == expected_content()
+    assert sorted(os.listdir(tmp_path)) == ["out.bin"]
+
+
+def test_part_file_of_other_content_is_not_appended_to(mock_api, tmp_path):
+    _, url = mock_api(file_size=SIZE)
+    save_file = str(tmp_path / "out.bin")
+    with open(save_file + ".part", "wb") as fp:
+        fp.write(b"x" * 1000)
+    with open(save_file + ".part.validator", "w") as fp:
+        fp.write('"some other version"')
+
+    assert Downloader(PooledSession()).download(file_url(url), save_file) == SIZE
+    with open(save_file, "rb") as fp:
+        assert fp.read() == expected_content()
+
+
+def test_part_file_without_validator_is_downloaded_again(mock_api, tmp_path):
+    _, url = mock_api(file_size=SIZE)
+    save_file = str(tmp_path / "out.bin")
+    with open(save_file + ".part", "wb") as fp:
+        fp.write(b"x" * 1000)
+
+    Downloader(PooledSession()).download(file_url(url), save_file)
+    with open(save_file, "rb") as fp:
+        assert fp.read() == expected_content()
+
+
+def test_part_file_longer_than_content_is_not_taken_as_complete(mock_api, tmp_path):
+    # the server answers 416 to a range starting past the end of the file
+    _, url = mock_api(file_size=SIZE)
+    save_file = str(tmp_path / "out.bin")
+    with open(save_file + ".part", "wb") as fp:
+        fp.write(b"x" * (SIZE + 10))
+    with open(save_file + ".part.validator", "w") as fp:
+        fp.write(f'"job-{SIZE}"')
+
+    assert Downloader(PooledSession()).download(file_url(url), save_file) == SIZE
+    with open(save_file, "rb") as fp:
+        assert fp.read() == expected_content()
+
+
+def test_failed_parallel_download_leaves_no_part_file(mock_api, tmp_path):
+    size = 4 * SIZE
+    _, url = mock_api(file_size=size, bandwidth=2 * SIZE)
+    save_file = str(tmp_path / "out.bin")
+    downloader = Downloader(PooledSession(), chunk_size=16 * 1024, parallel_parts=4, parallel_threshold=1)
+
+    with pytest.raises(DeadlineExceeded):
+        downloader.download(file_url(url), save_file, Deadline(0.2))
+    assert os.listdir(tmp_path) == []
+
+    assert downloader.download(file_url(url), save_file) == size
+    with open(save_file, "rb") as fp:
+        assert fp.read() == expected_content(size)
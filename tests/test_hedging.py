@@ -0,0 +1,111 @@
+import threading
+import time
+import pytest
+from syncai.hedging import Deadline, DeadlineExceeded, Hedger, as_deadline, call_timeout
+from syncai.video import SyncAiVideoClient
+
+
+def test_deadline_caps_timeouts_at_the_remaining_budget():
+    deadline = Deadline(2.0)
+    connect, read = deadline.timeout((5.0, 30.0))
+    assert connect == pytest.approx(2.0, abs=0.1) and read == pytest.approx(2.0, abs=0.1)
+    assert deadline.timeout((0.5, None))[0] == 0.5
+    assert call_timeout(None, (5.0, 30.0)) == {}
+    assert as_deadline(None) is None and as_deadline(deadline) is deadline
+    assert as_deadline(3).seconds == 3
+
+
+def test_expired_deadline_starts_no_call():
+    deadline = Deadline(0.0)
+    assert deadline.expired()
+    with pytest.raises(DeadlineExceeded):
+        call_timeout(deadline, (5.0, 30.0))
+
+
+def counted(seconds):
+    # a call that takes seconds[n - 1] seconds (the last entry once they run out) on its n-th call and returns n
+    calls = []
+    lock = threading.Lock()
+
+    def call():
+        with lock:
+            calls.append(None)
+            number = len(calls)
+        time.sleep(seconds[min(number, len(seconds)) - 1])
+        return number
+
+    return call, calls
+
+
+def warm_up(hedger, endpoint="status", seconds=0.001):
+    for _ in range(hedger.min_samples):
+        hedger.observe(endpoint, seconds)
+
+
+def test_slow_call_is_hedged_and_the_first_answer_wins():
+    hedger = Hedger(min_samples=5, min_delay=0.05, workers=4)
+    warm_up(hedger)
+    call, calls = counted([1.0, 0.001])
+    started = time.monotonic()
+    assert hedger.call("status", call) == 2
+    assert time.monotonic() - started < 0.5
+    stats = hedger.stats()
+    assert stats["hedgeable_requests"] == stats["hedged_requests"] == stats["hedge_wins"] == 1
+    assert stats["delays"]["status"] == 0.05
+    hedger.close()
+
+
+def test_calls_are_not_hedged_without_enough_samples():
+    hedger = Hedger(min_samples=5)
+    call, calls = counted([0.1])
+    assert hedger.call("status", call) == 1
+    assert len(calls) == 1
+    assert hedger.stats().get("hedged_requests", 0) == 0
+    hedger.close()
+
+
+def test_hedged_call_gives_up_at_the_deadline():
+    hedger = Hedger(min_samples=5, min_delay=0.05)
+    warm_up(hedger)
+    call, calls = counted([2.0])
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        hedger.call("status", call, Deadline(0.3))
+    assert time.monotonic() - started < 1.0
+    assert len(calls) == 2
+    hedger.close()
+
+
+def test_hedged_call_raises_only_once_both_calls_failed():
+    hedger = Hedger(min_samples=5, min_delay=0.05)
+    warm_up(hedger)
+    attempts = []
+
+    def call():
+        attempts.append(None)
+        if len(attempts) == 1:
+            time.sleep(0.2)
+            raise ConnectionError("first")
+        return "second"
+
+    assert hedger.call("status", call) == "second"
+    hedger.close()
+
+
+def test_stalled_status_requests_are_hedged(mock_api, tmp_path):
+    # every tenth status, download-URL and file request stalls for 5 seconds
+    state, url = mock_api(file_size=100, stall_rate=0.1, stall_seconds=5.0, seed=3)
+    client = SyncAiVideoClient(token="test", url=url, min_poll_interval=0.02, hedge_percentile=95)
+    for endpoint in ("status", "download", "file"):
+        warm_up(client.hedger, endpoint, 0.005)
+    jobs = [{"language": "en-US", "text": f"text {i}", "actor": "caprica", "output_file": str(tmp_path / f"{i}.mp4")} for i in range(10)]
+
+    started = time.monotonic()
+    summary = client.run_batch(jobs, concurrency=10)
+    elapsed = time.monotonic() - started
+    client.close()
+
+    assert summary["downloaded"] == 10
+    assert state.counts["stalled"] >= 1
+    assert elapsed < 5
+    assert client.hedger.stats()["hedged_requests"] >= state.counts["stalled"]
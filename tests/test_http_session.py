@@ -0,0 +1,42 @@
+import time
+import pytest
+import requests
+from syncai.http_session import PooledSession
+from syncai.video import SyncAiVideoClient
+
+
+def generate(url, **options):
+    client = SyncAiVideoClient(token="test", url=url, **options)
+    try:
+        return client.generate("Hello", "en-US", "metahumans", actor="caprica")
+    finally:
+        client.close()
+
+
+def test_generate_is_not_retried_after_a_read_timeout(scripted_api):
+    received, url = scripted_api([(1.5, 200), (0, 200)])
+    with pytest.raises(requests.Timeout):
+        generate(url, read_timeout=1.0)
+    time.sleep(0.6)
+    assert received == ["POST"]
+
+
+def test_generate_is_not_retried_after_a_server_error(scripted_api):
+    received, url = scripted_api([(0, 503), (0, 200)])
+    assert generate(url) == {"error": "curl request failed"}
+    assert received == ["POST"]
+
+
+def test_generate_is_retried_on_429(mock_api):
+    state, url = mock_api(generate_rate_limit=1)
+    responses = [generate(url) for _ in range(2)]
+    assert all("jobId" in response for response in responses)
+    assert state.counts["throttled"] >= 1
+    assert state.counts["generate"] == 2 + state.counts["throttled"]
+
+
+def test_get_is_retried_on_server_error(scripted_api):
+    received, url = scripted_api([(0, 503), (0, 200)])
+    session = PooledSession(backoff_factor=0.01)
+    assert session.get(url + "status").status_code == 200
+    assert received == ["GET", "GET"]
@@ -0,0 +1,42 @@
+import pytest
+from syncai.job_scheduler import CHARACTERS_PER_SECOND, RenderTimeEstimator, schedule_jobs
+
+
+def job(seconds, **fields):
+    # a csv job with `seconds` of speech
+    return dict(text="x" * int(seconds * CHARACTERS_PER_SECOND), output_type="csv", **fields)
+
+
+def estimator_of(observations):
+    estimator = RenderTimeEstimator(default_output_type="csv")
+    for seconds, render_seconds in observations:
+        estimator.observe(job(seconds), render_seconds)
+    return estimator
+
+
+def test_fit_recovers_intercept_and_slope():
+    estimator = estimator_of([(seconds, 1.0 + 0.5 * seconds) for seconds in (1, 4, 10, 20)])
+    assert estimator.estimate(job(2)) == pytest.approx(2.0)
+    assert estimator.estimate(job(40)) == pytest.approx(21.0)
+
+
+def test_jobs_of_the_same_length_are_estimated_at_their_mean():
+    # with no spread in length the slope is unknown, which used to put all of the cost on it
+    estimator = estimator_of([(2.0 + 0.01 * (i % 3), 0.5) for i in range(40)])
+    assert estimator.estimate(job(2.0)) == pytest.approx(0.5, rel=0.05)
+    assert estimator.estimate(job(20.0)) < 10
+
+
+def test_fit_is_constrained_to_non_negative_coefficients():
+    decreasing = estimator_of([(seconds, 5.0 - 0.1 * seconds) for seconds in (1, 4, 10, 20)])
+    assert decreasing.estimate(job(2)) == pytest.approx((4.9 + 4.6 + 4.0 + 3.0) / 4)
+
+    steep = estimator_of([(seconds, 2.0 * seconds - 1.0) for seconds in (2, 4, 10, 20)])
+    assert steep.estimate(job(0)) == 0.0
+    assert steep.estimate(job(10)) > 0
+
+
+def test_schedule_orders_by_priority_then_due_by_then_estimate():
+    estimator = estimator_of([(seconds, seconds) for seconds in (1, 4, 10, 20)])
+    jobs = [job(10), job(1), job(20, due_by=5), job(30, priority=1), job(2, due_by=1)]
+    assert [i for i, _ in schedule_jobs(list(enumerate(jobs)), estimator)] == [3, 4, 2, 1, 0]
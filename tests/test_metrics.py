@@ -0,0 +1,66 @@
+import json
+import os
+from syncai.metrics import ClientMetrics, Histogram
+from syncai.video import SyncAiVideoClient
+
+
+def test_histogram_quantiles_are_bucket_bounds():
+    histogram = Histogram("seconds", "", (1, 2, 5))
+    for value in (0.5, 0.5, 1.5, 4.0, 10.0):
+        histogram.observe(value)
+    assert histogram.counts == [2, 1, 1, 1]
+    assert histogram.quantile(0.4) == 1
+    assert histogram.quantile(0.8) == 5
+    assert histogram.quantile(1.0) == 10.0
+    assert histogram.summary()["mean"] == 16.5 / 5
+
+
+def test_job_events_are_broken_down_and_forwarded():
+    events = []
+    metrics = ClientMetrics(listeners=[lambda event, job_id, fields: events.append((event, job_id))])
+    metrics.submitted("a", 0.2)
+    metrics.status("a", "processing", 0.01)
+    metrics.status("a", "finished", 0.01)
+    metrics.downloaded("a", 1000, 0.5)
+    metrics.submitted("b", 0.2)
+    metrics.notified("b", "failed")
+
+    summary = metrics.summary()
+    assert summary["jobs_submitted"] == 2
+    assert summary["jobs_finished"] == 1 and summary["jobs_failed"] == 1 and summary["jobs_downloaded"] == 1
+    assert summary["notifications"] == 1
+    assert summary["jobs_in_flight"] == 0
+    assert summary["polls_per_job"]["count"] == 2 and summary["polls_per_job"]["sum"] == 2
+    assert summary["render_seconds"]["count"] == 1
+    assert summary["download_bytes_per_second"]["max"] == 2000
+    assert events == [("submitted", "a"), ("status", "a"), ("status", "a"), ("downloaded", "a"), ("submitted", "b"), ("notified", "b")]
+
+
+def test_export_writes_prometheus_or_json(tmp_path):
+    metrics = ClientMetrics()
+    metrics.submitted("a", 0.3)
+    metrics.set_gauge("window", 4)
+
+    metrics.export(str(tmp_path / "metrics.prom"))
+    text = (tmp_path / "metrics.prom").read_text()
+    assert "syncai_jobs_submitted_total 1" in text
+    assert "syncai_window 4" in text
+    assert 'syncai_submit_seconds_bucket{le="0.5"} 1' in text
+    assert 'syncai_submit_seconds_bucket{le="+Inf"} 1' in text
+
+    metrics.export(str(tmp_path / "metrics.json"))
+    with open(tmp_path / "metrics.json") as fp:
+        assert json.load(fp)["submit_seconds"]["count"] == 1
+
+
+def test_batch_records_every_job(mock_api, tmp_path):
+    _, url = mock_api(file_size=1000)
+    client = SyncAiVideoClient(token="test", url=url, min_poll_interval=0.05)
+    jobs = [{"language": "en-US", "text": f"text {i}", "actor": "caprica", "output_file": os.path.join(tmp_path, f"{i}.mp4")} for i in range(3)]
+    client.run_batch(jobs, concurrency=3)
+    client.close()
+
+    summary = client.metrics.summary()
+    assert summary["jobs_submitted"] == summary["jobs_finished"] == summary["jobs_downloaded"] == 3
+    assert summary["download_bytes"]["sum"] == 3000
+    assert summary["jobs_in_flight"] == 0
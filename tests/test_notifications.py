@@ -0,0 +1,81 @@
+import os
+import threading
+import time
+import pytest
+import requests
+from syncai.notifications import CallbackTransport, LocalTransport
+from syncai.video import SyncAiVideoClient
+
+
+@pytest.fixture
+def transport():
+    notified = []
+    transport = CallbackTransport()
+    transport.start(lambda job_id, status: notified.append((job_id, status["status"])))
+    yield transport, notified
+    transport.close()
+
+
+def test_callback_delivers_job_completions(transport):
+    transport, notified = transport
+    assert requests.post(transport.callback_url, json={"jobId": "a", "status": "finished"}).status_code == 204
+    # other statuses are accepted so the API does not retry them, but do not complete the job
+    assert requests.post(transport.callback_url, json={"jobId": "b", "status": "processing"}).status_code == 204
+    assert notified == [("a", "finished")]
+    assert transport.received == 1
+
+
+def test_callback_rejects_other_requests(transport):
+    transport, notified = transport
+    base = transport.callback_url.rsplit("/", 1)[0]
+    assert requests.post(base + "/guessed", json={"jobId": "a", "status": "finished"}).status_code == 404
+    assert requests.post(transport.callback_url, data=b"not json").status_code == 400
+    assert notified == []
+
+
+def test_public_url_replaces_the_listening_address():
+    transport = CallbackTransport(public_url="https://example.com/hooks/")
+    assert transport.callback_url is None
+    transport.start(lambda job_id, status: None)
+    try:
+        assert transport.callback_url == "https://example.com/hooks" + transport.path
+    finally:
+        transport.close()
+
+
+def test_batch_completes_from_notifications(mock_api, tmp_path):
+    state, url = mock_api(file_size=100, render_mean=0.2)
+    client = SyncAiVideoClient(token="test", url=url, notifications=CallbackTransport(), fallback_poll_interval=60.0)
+    jobs = [{"language": "en-US", "text": f"text {i}", "actor": "caprica", "output_file": os.path.join(tmp_path, f"{i}.mp4")} for i in range(4)]
+    started = time.monotonic()
+    summary = client.run_batch(jobs, concurrency=4)
+    client.close()
+
+    assert summary["downloaded"] == 4
+    assert time.monotonic() - started < 10
+    assert state.counts["callback"] == 4
+    assert client.metrics.summary()["notifications"] == 4
+    # the fallback polls are a minute apart
+    assert state.counts["status"] == 0
+
+
+def test_local_transport_wakes_a_waiting_download(mock_api, tmp_path):
+    _, url = mock_api(file_size=100, render_mean=0.0)
+    transport = LocalTransport()
+    client = SyncAiVideoClient(token="test", url=url, notifications=transport, fallback_poll_interval=60.0)
+    try:
+        job_id = client.generate("Hello", "en-US", "metahumans", actor="caprica")["jobId"]
+        # a notification that arrives before the job is waited for is kept until it is
+        early_id = client.generate("Other", "en-US", "metahumans", actor="caprica")["jobId"]
+        assert transport.deliver({"jobId": early_id, "status": "finished"})
+        assert client.download_content(early_id, str(tmp_path / "early.mp4")) is None
+
+        threading.Timer(0.2, transport.deliver, ({"jobId": job_id, "status": "finished"},)).start()
+        started = time.monotonic()
+        assert client.download_content(job_id, str(tmp_path / "out.mp4")) is None
+        assert time.monotonic() - started < 5
+        assert not transport.deliver({"jobId": job_id, "status": "processing"})
+        assert transport.received == 2
+    finally:
+        client.close()
+    assert transport.notify is None
@@ -0,0 +1,85 @@
+import time
+import pytest
+from syncai.http_session import PooledSession
+from syncai.metrics import ClientMetrics
+from syncai.rate_control import AimdController, TokenBucket, parse_retry_after
+
+
+def test_errors_halve_the_window_once_per_cooldown():
+    metrics = ClientMetrics()
+    controller = AimdController(initial_window=16, cooldown=60, metrics=metrics)
+    controller.record("status", [503], 0.01)
+    controller.record("status", [429], 0.01)
+    controller.record("status", [], 0.01, error=True)
+    assert controller.window(100) == 8
+    summary = metrics.summary()
+    assert (summary["server_errors"], summary["throttle_events"], summary["connection_errors"]) == (1, 1, 1)
+
+
+def test_healthy_calls_grow_the_window_back_up_to_the_cap():
+    controller = AimdController(initial_window=2)
+    for _ in range(100):
+        controller.record("status", [200], 0.01)
+    assert 10 < controller.window(100) < 20
+    assert controller.window(4) == 4
+
+
+def test_window_never_drops_below_min_window():
+    controller = AimdController(initial_window=4, min_window=2, cooldown=0)
+    for _ in range(10):
+        controller.record("status", [503], 0.01)
+    assert controller.window(10) == 2
+
+
+def test_latency_rise_shrinks_the_window():
+    controller = AimdController(initial_window=8, cooldown=60, latency_slack=0.0)
+    for _ in range(5):
+        controller.record("status", [200], 0.01)
+    for _ in range(20):
+        controller.record("status", [200], 0.5)
+    assert controller.window(100) < 8
+
+
+def test_latency_is_kept_per_endpoint():
+    controller = AimdController(initial_window=8, cooldown=60, latency_slack=0.0)
+    for _ in range(20):
+        controller.record("status", [200], 0.01)
+        controller.record("download", [200], 1.0)
+    assert controller.window(100) > 8
+
+
+def test_retry_after_pauses_calls():
+    controller = AimdController()
+    controller.record("generate", [429], 0.01, retry_after=0.2)
+    started = time.monotonic()
+    controller.wait()
+    assert time.monotonic() - started == pytest.approx(0.2, abs=0.1)
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+def test_token_bucket_limits_the_rate_after_its_burst():
+    bucket = TokenBucket(rate=20, burst=5)
+    started = time.monotonic()
+    for _ in range(15):
+        bucket.acquire()
+    # 5 from the burst, the other 10 at 20 per second
+    assert time.monotonic() - started == pytest.approx(0.5, abs=0.15)
+
+
+def test_uploads_are_left_out_of_the_latency_signal(scripted_api):
+    # a batch mixing text jobs with large audio uploads, whose generate requests take as long as the upload
+    received, url = scripted_api([(0, 200)] * 5 + [(0.6, 200)] * 5)
+    controller = AimdController(initial_window=8, cooldown=0)
+    session = PooledSession(controller=controller)
+    for _ in range(5):
+        session.post(url + "generate", json={"text": "Hello"})
+    for _ in range(5):
+        session.post(url + "generate", data=b"audio" * 1000)
+    assert controller.window(100) > 8
+    assert controller.latency == {}
@@ -0,0 +1,68 @@
+import threading
+import time
+import pytest
+from syncai.status_poller import StatusPoller
+
+
+def test_status_requests_do_not_hold_the_poller_lock():
+    started = threading.Event()
+    release = threading.Event()
+
+    def check_status(job_id):
+        started.set()
+        release.wait(5)
+        return {"status": "finished"}
+
+    poller = StatusPoller(check_status, min_interval=0.01)
+    poller.add("slow")
+    time.sleep(0.02)
+    polling = threading.Thread(target=poller.poll_due)
+    polling.start()
+    assert started.wait(5)
+
+    added = threading.Thread(target=poller.add, args=("other",))
+    added.start()
+    added.join(1)
+    assert not added.is_alive()
+    release.set()
+    polling.join(5)
+    assert len(poller) == 1
+
+
+def test_late_polls_do_not_inflate_the_render_time():
+    # the job finishes straight away but is only polled 0.25 seconds later
+    observed = []
+    poller = StatusPoller(lambda job_id: {"status": "finished"}, min_interval=0.2)
+    poller.add("job", observe=observed.append)
+    time.sleep(0.25)
+    assert poller.poll_due() == [("job", {"status": "finished"})]
+    # the job was last seen pending when it was added, so it is taken to have finished halfway to the poll
+    assert observed[0] == pytest.approx(0.125, abs=0.05)
+    assert poller.render_time == observed[0]
+
+
+def test_first_polls_are_bounded_by_min_interval():
+    poller = StatusPoller(lambda job_id: {"status": "processing"}, min_interval=0.5, max_interval=30.0)
+    poller.add("job", expected_render_time=300.0)
+    assert poller.next_delay() <= 0.5
+
+
+def test_failed_status_request_is_retried_with_backoff():
+    # a connection error or a 502 that is not json fails that poll only, the other jobs are still polled
+    calls = []
+
+    def check_status(job_id):
+        calls.append(job_id)
+        if job_id == "broken" and calls.count("broken") < 3:
+            raise ValueError("Expecting value: line 1 column 1 (char 0)")
+        return {"status": "finished"}
+
+    poller = StatusPoller(check_status, min_interval=0.05, max_interval=1.0, backoff=2.0)
+    poller.add("broken")
+    poller.add("healthy")
+    time.sleep(0.06)
+    assert poller.poll_due() == [("healthy", {"status": "finished"})]
+    assert 0.05 < poller.next_delay() <= 0.1
+    assert poller.wait("broken") == {"status": "finished"}
+    assert calls.count("broken") == 3
+    assert poller.stats()["poll_errors"] == 2